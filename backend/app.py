@@ -1,23 +1,38 @@
 from flask import Flask
-from src.routes import auth_bp, profile_bp, sleep_bp, hydrate_bp, health_bp, diet_bp, xp_bp, quest_bp, focus_bp
+from src.routes import auth_bp, profile_bp, sleep_bp, hydrate_bp, health_bp, diet_bp, xp_bp, quest_bp, focus_bp, dashboard_bp, history_bp
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from src.utils import (METRICS_ENABLED, TRACE_SAMPLE_RATE, TRACE_REPEAT_THRESHOLD, DEBUG, track_requests, trace_requests,
+                       memoize_user_versions)
 import os
 
-app = Flask(__name__)
-CORS(app) # Enable CORS for all routes
-app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY")
-jwt = JWTManager(app)
+def create_app() -> Flask:
+    """Tạo và cấu hình Flask app (dùng cho dev server, gunicorn qua wsgi.py và test)"""
+    app = Flask(__name__)
+    CORS(app) # Enable CORS for all routes
+    app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY")
+    JWTManager(app)
+    memoize_user_versions(app) # Mỗi request chỉ đọc phiên bản dữ liệu của 1 user 1 lần (ETag, cache)
+    if METRICS_ENABLED:
+        track_requests(app) # Số request và độ trễ theo route, xem tại /health/metrics
+        # Trace các truy vấn của 1 phần request: cảnh báo N+1, header Server-Timing khi DEBUG
+        trace_requests(app, TRACE_SAMPLE_RATE, TRACE_REPEAT_THRESHOLD, server_timing=DEBUG)
 
-app.register_blueprint(health_bp, url_prefix="/health")
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(profile_bp, url_prefix="/profile")
-app.register_blueprint(sleep_bp, url_prefix="/sleep")
-app.register_blueprint(hydrate_bp, url_prefix="/hydrate")
-app.register_blueprint(diet_bp, url_prefix="/diet")
-app.register_blueprint(xp_bp, url_prefix="/xp")
-app.register_blueprint(quest_bp, url_prefix="/quest")
-app.register_blueprint(focus_bp, url_prefix="/focus")
+    app.register_blueprint(health_bp, url_prefix="/health")
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(profile_bp, url_prefix="/profile")
+    app.register_blueprint(sleep_bp, url_prefix="/sleep")
+    app.register_blueprint(hydrate_bp, url_prefix="/hydrate")
+    app.register_blueprint(diet_bp, url_prefix="/diet")
+    app.register_blueprint(xp_bp, url_prefix="/xp")
+    app.register_blueprint(quest_bp, url_prefix="/quest")
+    app.register_blueprint(focus_bp, url_prefix="/focus")
+    app.register_blueprint(dashboard_bp, url_prefix="/dashboard")
+    app.register_blueprint(history_bp, url_prefix="/history")
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=os.environ.get("DEBUG", False), host="0.0.0.0", port=os.environ.get("PORT", 5000))
\ No newline at end of file
+    # Dev server, production dùng gunicorn: gunicorn -c gunicorn.conf.py wsgi:app.
+    # App chỉ được tạo ở đây: import create_app (wsgi.py, asgi.py, test) không tạo thêm app thứ hai
+    app = create_app()
+    app.run(debug=os.environ.get("DEBUG", False), host="0.0.0.0", port=os.environ.get("PORT", 5000))
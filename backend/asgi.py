@@ -0,0 +1,107 @@
+# Entry point ASGI: gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker asgi:app
+# Các endpoint nóng (dashboard, quest, log hôm nay, habit, xp) chạy async trên Quart với AsyncClient của Supabase;
+# mọi endpoint còn lại do app Flask (create_app) xử lý, chạy trên thread pool (a2wsgi).
+import os
+import time
+from a2wsgi import WSGIMiddleware
+from quart import Quart, g, request
+from werkzeug.exceptions import HTTPException
+from app import create_app
+from src.routes.async_routes import (health_bp, hydrate_bp, diet_bp, focus_bp, sleep_bp, xp_bp, quest_bp,
+                                     dashboard_bp)
+from src.services.async_services import init_async_services
+from src.utils import (METRICS_ENABLED, TRACE_SAMPLE_RATE, TRACE_REPEAT_THRESHOLD, DEBUG, metrics, start_trace,
+                       end_trace, current_trace, warn_repeated, start_version_memo, end_version_memo)
+from src.utils.metrics import UNMATCHED_ROUTE
+
+def create_async_app(flask_app) -> Quart:
+    """Tạo Quart app chứa các route async (cùng prefix với app Flask). JWT được kiểm tra bằng
+    flask_jwt_extended của ``flask_app`` (xem async_routes.jwt_required)"""
+    app = Quart(__name__)
+    app.config["FLASK_APP"] = flask_app
+    app.register_blueprint(health_bp, url_prefix="/health")
+    app.register_blueprint(sleep_bp, url_prefix="/sleep")
+    app.register_blueprint(hydrate_bp, url_prefix="/hydrate")
+    app.register_blueprint(diet_bp, url_prefix="/diet")
+    app.register_blueprint(xp_bp, url_prefix="/xp")
+    app.register_blueprint(quest_bp, url_prefix="/quest")
+    app.register_blueprint(focus_bp, url_prefix="/focus")
+    app.register_blueprint(dashboard_bp, url_prefix="/dashboard")
+
+    @app.before_serving
+    async def startup():
+        # AsyncClient phải được tạo trong event loop của worker
+        await init_async_services()
+
+    if METRICS_ENABLED:
+        # Như track_requests và trace_requests của app Flask (các request chuyển sang Flask do app Flask tự đo)
+        @app.before_request
+        async def start_request_timer():
+            route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+            g.metrics_request = (route, request.method, time.perf_counter())
+            metrics.request_started(route, request.method)
+            g.query_trace_token = start_trace(route, TRACE_SAMPLE_RATE)
+
+        @app.after_request
+        async def record_request(response):
+            started = g.pop("metrics_request", None)
+            if started:
+                route, method, started_at = started
+                metrics.request_finished(route, method, response.status_code, time.perf_counter() - started_at)
+            trace = current_trace()
+            if trace is not None and g.get("query_trace_token") is not None:
+                warn_repeated(trace, request.method, TRACE_REPEAT_THRESHOLD)
+                if DEBUG:
+                    response.headers["Server-Timing"] = trace.server_timing()
+            return response
+
+        @app.teardown_request
+        async def end_query_trace(exc):
+            end_trace(g.pop("query_trace_token", None))
+
+    @app.before_request
+    async def start_user_version_memo():
+        # Như memoize_user_versions của app Flask: mỗi request chỉ đọc phiên bản của 1 user 1 lần
+        g.version_memo_token = start_version_memo()
+
+    @app.teardown_request
+    async def end_user_version_memo(exc):
+        end_version_memo(g.pop("version_memo_token", None))
+
+    @app.after_request
+    async def add_cors_headers(response):
+        # Như CORS(app) của app Flask (preflight OPTIONS do app Flask trả lời)
+        origin = request.headers.get("Origin")
+        if origin:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.vary.add("Origin")
+        return response
+
+    return app
+
+class HybridApp:
+    """ASGI app: request khớp route của Quart app thì chạy async, còn lại chuyển cho app Flask"""
+    def __init__(self, async_app: Quart, wsgi_app):
+        self.async_app = async_app
+        # Số thread chạy request Flask, như WEB_THREADS của worker gthread
+        self.wsgi_app = WSGIMiddleware(wsgi_app, workers=int(os.getenv("WEB_THREADS", "4")))
+        self.async_routes = async_app.url_map.bind("localhost")
+
+    def _is_async(self, scope) -> bool:
+        if scope["method"] == "OPTIONS":
+            return False
+        try:
+            self.async_routes.match(scope["path"], method=scope["method"])
+            return True
+        except HTTPException:  # NotFound, MethodNotAllowed, RequestRedirect
+            return False
+
+    async def __call__(self, scope, receive, send):
+        # lifespan (startup/shutdown) luôn do Quart xử lý
+        if scope["type"] == "http" and not self._is_async(scope):
+            await self.wsgi_app(scope, receive, send)
+        else:
+            await self.async_app(scope, receive, send)
+
+flask_app = create_app()
+app = HybridApp(create_async_app(flask_app), flask_app)
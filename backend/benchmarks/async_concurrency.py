@@ -0,0 +1,61 @@
+"""Concurrency per worker: the sync app (wsgi, gthread) versus the async app (asgi, uvicorn).
+
+Runs ONE gunicorn worker of each kind on the in-memory stub (benchmarks.stub_wsgi /
+benchmarks.stub_asgi, same data and the same injected latency per PostgREST call) and
+drives GET ``--path`` with an increasing number of keep-alive clients. A gthread worker
+serves at most ``--threads`` requests at a time; the uvicorn worker awaits every
+PostgREST call on one event loop, so it keeps scaling with the number of clients.
+
+Usage (from backend/):
+    python -m benchmarks.async_concurrency [--duration 8] [--concurrency 4 16 64]
+        [--latency 0.02] [--threads 4] [--path /dashboard/today]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.server_throughput import PORT, load, percentile, wait_until_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per PostgREST call")
+    parser.add_argument("--threads", type=int, default=4, help="threads of the gthread worker")
+    parser.add_argument("--path", default="/dashboard/today")
+    args = parser.parse_args()
+
+    spool_dir = tempfile.mkdtemp(prefix="bench-spool-")
+    env = dict(os.environ, STUB_LATENCY=str(args.latency), WEB_WORKERS="1", WEB_THREADS=str(args.threads),
+               WEB_ACCESS_LOG="", WEB_MAX_REQUESTS="0", TASK_SPOOL_DIR=spool_dir)
+    os.environ.update(STUB_LATENCY=str(args.latency))
+    from benchmarks.stub_wsgi import make_token
+    token = make_token()
+
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{PORT}"]
+    servers = {
+        f"sync gthread x{args.threads}": gunicorn + ["benchmarks.stub_wsgi:app"],
+        "async uvicorn": gunicorn + ["-k", "uvicorn_worker.UvicornWorker", "benchmarks.stub_asgi:app"],
+    }
+    print(f"GET {args.path}, 1 worker, {args.duration:.0f}s per run, {args.latency * 1000:.0f} ms per PostgREST call")
+    print(f"{'server':>18} {'clients':>8} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'errors':>7}")
+    for label, command in servers.items():
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(PORT)
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = load(PORT, args.path, token, concurrency, args.duration)
+                latencies.sort()
+                print(f"{label:>18} {concurrency:>8} {len(latencies) / elapsed:>8.1f} "
+                      f"{percentile(latencies, 0.50) * 1000:>9.1f} {percentile(latencies, 0.95) * 1000:>9.1f} {errors:>7}")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
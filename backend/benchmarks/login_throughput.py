@@ -0,0 +1,113 @@
+"""Login throughput (AuthService.login_user) versus the size of the bcrypt process pool.
+
+Fires a burst of concurrent logins against the in-memory backend (src/utils/memory_backend.py) while another
+thread keeps sending cheap requests (hydrate log updates) and records their latency,
+for each BCRYPT_POOL_SIZE given (0 = bcrypt on the request thread). Every pool size
+runs in its own subprocess, since the pool is configured from the environment at import.
+
+Usage (from backend/):
+    python -m benchmarks.login_throughput [--pool-sizes 0 1 2 4] [--logins 40] [--concurrency 16] [--rounds 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_burst(logins: int, concurrency: int):
+    """Runs in the child process: BCRYPT_* are already set in the environment."""
+    os.environ.setdefault("DATA_BACKEND", "memory")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    from src.utils.memory_backend import MemoryClient
+    from src import services
+    from src.services import auth_service, hydrate_service
+    from src.utils import ServiceError, hash_password, generate_salt, task_queue
+
+    client = MemoryClient()
+    for name in services.__all__:
+        getattr(services, name).client = client
+    task_queue.enabled = False  # side effects (streak, quest progress) run inline, no spool on disk
+
+    # One hash shared by every user: only the logins themselves are measured
+    password_hash = hash_password("password123", generate_salt())
+    emails = [f"{uuid.uuid4().hex}@example.com" for _ in range(logins)]
+    client.table("users").insert([{"id": str(uuid.uuid4()), "email": email, "password": password_hash}
+                                  for email in emails]).execute()
+    cheap_user = str(uuid.uuid4())
+    client.table("xp_rewards").insert({"user_id": cheap_user}).execute()
+    log_id = client.table("hydrate_logs").insert({"user_id": cheap_user, "water_goal": 2000.0, "cup_size": 1.0,
+                                                  "consumed_water": 0.0, "date": "2000-01-01"}).execute().data[0]["id"]
+
+    rejected = 0
+    rejected_lock = threading.Lock()
+
+    def login(email):
+        nonlocal rejected
+        try:
+            auth_service.login_user(email, "password123")
+        except ServiceError as e:
+            if e.status_code != 503:
+                raise
+            with rejected_lock:
+                rejected += 1
+
+    cheap_latencies = []
+    stop = threading.Event()
+
+    def cheap_requests():
+        while not stop.is_set():
+            started = time.perf_counter()
+            hydrate_service.update_hydrate_log(cheap_user, log_id)
+            cheap_latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    cheap_thread = threading.Thread(target=cheap_requests)
+    cheap_thread.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(login, emails))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    cheap_thread.join()
+
+    latencies = sorted(cheap_latencies)
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(f"{(logins - rejected) / elapsed:.2f} {rejected} {statistics.median(latencies) * 1000:.2f} {p95 * 1000:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS used for the run")
+    parser.add_argument("--queue-max", type=int, default=64, help="BCRYPT_QUEUE_MAX used for the run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_burst(args.logins, args.concurrency)
+        return
+
+    print(f"cpus={os.cpu_count()} rounds={args.rounds} logins={args.logins} concurrency={args.concurrency}")
+    print(f"{'pool size':>9} {'logins/s':>9} {'rejected':>9} {'cheap p50 (ms)':>15} {'cheap p95 (ms)':>15}")
+    for pool_size in args.pool_sizes:
+        env = dict(os.environ, BCRYPT_POOL_SIZE=str(pool_size), BCRYPT_ROUNDS=str(args.rounds),
+                   BCRYPT_QUEUE_MAX=str(args.queue_max))
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.login_throughput", "--child",
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        throughput, rejected, p50, p95 = output[-4:]
+        label = "inline" if pool_size == 0 else str(pool_size)
+        print(f"{label:>9} {throughput:>9} {rejected:>9} {p50:>15} {p95:>15}")
+
+
+if __name__ == "__main__":
+    main()
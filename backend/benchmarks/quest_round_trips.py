@@ -0,0 +1,88 @@
+"""Round trips and wall-clock time of GET /quest (QuestService.get_quests_with_progress).
+
+Runs the service against the in-memory backend (src/utils/memory_backend.py) for a growing number of active
+quests, once on the first app open of the day (progress rows get created) and once
+on a repeat open (progress rows already exist and the quest definitions are cached),
+and prints the number of PostgREST calls each request needed.
+
+Usage (from backend/):
+    python -m benchmarks.quest_round_trips [--latency 0.03] [--quests 7 20 50]
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+# No Supabase project needed: the services start on the in-memory backend
+os.environ.setdefault("DATA_BACKEND", "memory")
+
+from src.utils.memory_backend import MemoryClient  # noqa: E402
+from src.services import quest_service, xp_reward_service  # noqa: E402
+from src.utils import local_today  # noqa: E402
+
+TRIGGERS = ["hydrate_goal", "tasks_completed", "checkin", "log_meal", "focus_time"]
+
+
+def seed(client: MemoryClient, quest_count: int, user_id: str = None) -> str:
+    user_id = user_id or str(uuid.uuid4())
+    today = local_today().isoformat()
+    client.table("users").insert({"id": user_id, "email": f"{user_id}@bench.local", "password": "x"}).execute()
+    client.table("xp_rewards").insert({"user_id": user_id, "last_checkin_date": today}).execute()
+    client.table("hydrate_logs").insert({"user_id": user_id, "water_goal": 2000, "cup_size": 250,
+                                         "consumed_water": 750, "date": today}).execute()
+    client.table("focus_logs").insert({"user_id": user_id, "focus_done": 15, "date": today}).execute()
+    quests = [{
+        "title": f"Daily quest {i}",
+        "type": "daily",
+        "trigger_type": TRIGGERS[i % len(TRIGGERS)],
+        "target_progress": 1500,
+        "reward_type": "coins",
+        "reward_amount": 10,
+        "is_active": True,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    } for i in range(quest_count - 1)]
+    quests.append({
+        "title": "Monthly Master",
+        "type": "monthly",
+        "trigger_type": "monthly_daily_quests",
+        "target_progress": 40,
+        "reward_type": "diamonds",
+        "reward_amount": 40,
+        "is_active": True,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+    client.table("quests").insert(quests).execute()
+    return user_id
+
+
+def measure(client: MemoryClient, user_id: str):
+    client.reset_counters()
+    started = time.perf_counter()
+    quests = quest_service.get_quests_with_progress(user_id)
+    elapsed = time.perf_counter() - started
+    return len(quests), client.round_trips, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.03, help="simulated seconds per PostgREST call")
+    parser.add_argument("--quests", type=int, nargs="+", default=[7, 20, 50])
+    args = parser.parse_args()
+
+    print(f"{'quests':>6} {'open':>7} {'round trips':>12} {'time (ms)':>10}")
+    for quest_count in args.quests:
+        client = MemoryClient()
+        quest_service.client = client
+        xp_reward_service.client = client
+        quest_service.invalidate_quest_cache()  # quest definitions are cached per process
+        user_id = seed(client, quest_count)
+        client.latency = args.latency
+        for label in ("first", "repeat"):
+            returned, round_trips, elapsed = measure(client, user_id)
+            assert returned == quest_count
+            print(f"{quest_count:>6} {label:>7} {round_trips:>12} {elapsed * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Round trips and wall-clock time of POST /auth/register (AuthService.register_user).
+
+Compares the previous provisioning, one insert per table sent one after the other, with
+the single provision_user() call (database/012_provision_user.sql), both against the
+in-memory backend (src/utils/memory_backend.py) with an injected per-call latency. Both paths hash the password
+with bcrypt; that cost is measured on its own and shown separately.
+
+Usage (from backend/):
+    python -m benchmarks.register_round_trips [--latency 0.03] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+# No Supabase project needed: the services start on the in-memory backend
+os.environ.setdefault("DATA_BACKEND", "memory")
+
+from src.utils.memory_backend import MemoryClient  # noqa: E402
+from src.models import UserCreate, ProfileCreate  # noqa: E402
+from src.services import auth_service  # noqa: E402
+from src.utils import hash_password, generate_salt, local_today  # noqa: E402
+
+
+def seed(client: MemoryClient):
+    client.table("quests").insert([
+        {"title": "Drink up 1500ml", "type": "daily", "trigger_type": "hydrate_goal", "target_progress": 1500,
+         "reward_type": "coins", "reward_amount": 30},
+        {"title": "Check-in Today", "type": "daily", "trigger_type": "checkin", "target_progress": 1,
+         "reward_type": "coins", "reward_amount": 10},
+        {"title": "Monthly Master", "type": "monthly", "trigger_type": "monthly_daily_quests", "target_progress": 40,
+         "reward_type": "diamonds", "reward_amount": 40},
+    ]).execute()
+
+
+def sequential_register(client: MemoryClient, user_data: UserCreate):
+    """The provisioning register_user did before provision_user: every table is a separate call."""
+    user_data.id = str(uuid.uuid4())
+    user_data.password = hash_password(user_data.password, generate_salt())
+    today = local_today()
+    user_id = user_data.id
+
+    client.table("users").insert(user_data.model_dump()).execute()
+    client.table("profiles").insert(ProfileCreate(user_id=user_id).model_dump()).execute()
+    client.table("sleep_habits").insert({"user_id": user_id, "sleep_time": "23:00:00", "wakeup_time": "07:00:00"}).execute()
+    client.table("hydrate_habits").insert({"user_id": user_id, "water_goal": 2000.0, "cup_size": 250.0, "reminder_time": []}).execute()
+    client.table("diet_habits").insert({"user_id": user_id, "calories_goal": 2000.0, "reminder_time": []}).execute()
+    client.table("focus_habits").insert({"user_id": user_id, "focus_goal": 60}).execute()
+    client.table("sleep_logs").insert([
+        {"user_id": user_id, "task_type": "sleep", "scheduled_time": f"{today}T23:00:00+07:00"},
+        {"user_id": user_id, "task_type": "wakeup", "scheduled_time": f"{today + timedelta(days=1)}T07:00:00+07:00"},
+    ]).execute()
+    client.table("hydrate_logs").insert({"user_id": user_id, "water_goal": 2000.0, "cup_size": 250.0,
+                                         "consumed_water": 0.0, "date": str(today)}).execute()
+    client.table("diet_logs").insert({"user_id": user_id, "calories_goal": 2000.0, "dishes": [],
+                                      "consumed_calories": 0.0, "date": str(today)}).execute()
+    client.table("focus_logs").insert({"user_id": user_id, "focus_done": 0, "date": str(today)}).execute()
+    quests = client.table("quests").select("*").eq("is_active", True).execute().data
+    client.table("user_quest_progress").insert([{
+        "user_id": user_id,
+        "quest_id": quest["id"],
+        "period_start_date": (today if quest["type"] == "daily" else today.replace(day=1)).isoformat(),
+        "current_progress": 0,
+    } for quest in quests]).execute()
+
+
+def measure(client: MemoryClient, register, runs: int):
+    timings, round_trips = [], 0
+    for _ in range(runs):
+        user = UserCreate(email=f"{uuid.uuid4().hex}@example.com", password="password123")
+        client.reset_counters()
+        started = time.perf_counter()
+        register(user)
+        timings.append(time.perf_counter() - started)
+        round_trips = client.round_trips
+    return round_trips, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.03, help="simulated seconds per PostgREST call")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    client = MemoryClient()
+    seed(client)
+    client.latency = args.latency
+    auth_service.client = client
+
+    hash_password("password123", generate_salt())  # starts the bcrypt process pool
+    started = time.perf_counter()
+    hash_password("password123", generate_salt())
+    bcrypt_time = time.perf_counter() - started
+
+    rows = [
+        ("sequential", *measure(client, lambda user: sequential_register(client, user), args.runs)),
+        ("provision_user", *measure(client, auth_service.register_user, args.runs)),
+    ]
+    print(f"bcrypt hash: {bcrypt_time * 1000:.1f} ms (included in both totals)")
+    print(f"{'path':>15} {'round trips':>12} {'total (ms)':>11} {'without bcrypt (ms)':>20}")
+    for label, round_trips, elapsed in rows:
+        print(f"{label:>15} {round_trips:>12} {elapsed * 1000:>11.1f} {(elapsed - bcrypt_time) * 1000:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""The app on the memory backend, in the state it is in right after the 00:00 (UTC+7) rollover.
+
+Seeds LOADTEST_USERS users (loadtest-<n>@example.com / LOADTEST_PASSWORD) that were
+provisioned yesterday: their quest progress rows only exist for yesterday's period, and
+today's logs exist because the rollover jobs (database/00*_cron_*.sql) already created them.
+The first GET /quest of each user therefore creates its progress rows for today, as in the
+spike. Every PostgREST call waits LOADTEST_LATENCY seconds.
+
+Served by gunicorn with preload_app, so each worker starts from the same seeded data (the
+workers do not share writes). Used by benchmarks.rollover_spike.
+"""
+import os
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("DATA_BACKEND", "memory")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+from app import create_app  # noqa: E402
+from src.models import ProfileCreate  # noqa: E402
+from src.utils import supabase, hash_password, generate_salt, local_today  # noqa: E402
+
+USERS = int(os.getenv("LOADTEST_USERS", "200"))
+PASSWORD = os.getenv("LOADTEST_PASSWORD", "password123")
+
+
+def user_email(n: int) -> str:
+    return f"loadtest-{n}@example.com"
+
+
+def seed(client, users: int):
+    today = local_today()
+    yesterday = today - timedelta(days=1)
+    password_hash = hash_password(PASSWORD, generate_salt())  # One hash for every user: seeding stays fast
+    habits = {
+        "sleep": {"sleep_time": "22:00:00", "wakeup_time": "06:00:00", "reminder_time": []},
+        "hydrate": {"water_goal": 2000.0, "cup_size": 250.0, "reminder_time": []},
+        "diet": {"calories_goal": 2000.0, "reminder_time": []},
+        "focus": {"focus_goal": 30, "reminder_time": []},
+    }
+    for n in range(users):
+        user_id = str(uuid.UUID(int=n + 1))
+        client.rpc("provision_user", {
+            "p_user": {"id": user_id, "email": user_email(n), "password": password_hash},
+            "p_profile": ProfileCreate(username=f"loadtest{n}").model_dump(exclude={"user_id"}),
+            "p_habits": habits,
+            "p_today": yesterday.isoformat(),
+        }).execute()
+        client.table("xp_rewards").insert({"user_id": user_id, "last_checkin_date": yesterday.isoformat()}).execute()
+        # Today's logs, created by the rollover jobs at 00:00
+        client.table("sleep_logs").insert([
+            {"user_id": user_id, "task_type": "sleep", "scheduled_time": f"{today} 22:00:00"},
+            {"user_id": user_id, "task_type": "wakeup", "scheduled_time": f"{today + timedelta(days=1)} 06:00:00"},
+        ]).execute()
+        client.table("hydrate_logs").insert({"user_id": user_id, "water_goal": 2000.0, "cup_size": 250.0,
+                                             "consumed_water": 0.0, "date": today.isoformat()}).execute()
+        client.table("diet_logs").insert({"user_id": user_id, "calories_goal": 2000.0, "dishes": [],
+                                          "consumed_calories": 0.0, "date": today.isoformat()}).execute()
+        client.table("focus_logs").insert({"user_id": user_id, "focus_done": 0, "date": today.isoformat()}).execute()
+
+
+seed(supabase, USERS)
+supabase.reset_counters()
+supabase.latency = float(os.getenv("LOADTEST_LATENCY", "0.02"))
+
+app = create_app()
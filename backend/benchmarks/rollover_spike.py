@@ -0,0 +1,243 @@
+"""Load test of the traffic spike right after the daily rollover (00:00 UTC+7 = 17:00 UTC).
+
+Starts gunicorn (gunicorn.conf.py) on benchmarks.rollover_app: the memory backend with a
+per-call latency, seeded with ``--users`` users whose quest progress only exists for
+yesterday. Each virtual user then opens the app once, arriving in a burst that decays over
+``--ramp`` seconds, and runs this script:
+
+    POST /auth/login
+    GET  /dashboard/today
+    GET  /quest                          (creates today's progress rows)
+    PUT  /hydrate/logs/<id>/update       x --taps
+    PUT  /xp/checkin
+    GET  /quest
+    POST /quest/<id>/claim               (the check-in quest)
+    GET  /dashboard/today
+
+Prints requests/s and p50/p95/p99 per route and writes them to a JSON file
+(benchmarks/results/ by default). ``--compare OLD.json`` prints the change against an
+earlier run.
+
+Usage (from backend/):
+    python -m benchmarks.rollover_spike [--users 200] [--ramp 10] [--concurrency 64]
+        [--latency 0.02] [--workers 2] [--threads 4] [--taps 3] [--bcrypt-rounds 10]
+        [--label NAME] [--out FILE] [--compare OLD.json]
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.server_throughput import PORT, percentile, wait_until_up
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Expected status codes per route; anything else counts as an error. A claim can be refused with
+# 400 when the check-in quest progress (updated in the background) is not there yet.
+EXPECTED = defaultdict(lambda: {200}, {"POST /quest/<id>/claim": {200, 400}, "PUT /xp/checkin": {200, 400}})
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route: str, status: int, seconds: float):
+        with self._lock:
+            if status in EXPECTED[route]:
+                self.latencies[route].append(seconds)
+            else:
+                self.errors[route] += 1
+
+
+class VirtualUser:
+    def __init__(self, n: int, recorder: Recorder, password: str):
+        self.email = f"loadtest-{n}@example.com"
+        self.password = password
+        self.recorder = recorder
+        self.conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+        self.token = None
+
+    def request(self, method: str, path: str, route: str, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+            payload, status = b"", 0
+        self.recorder.record(route, status, time.perf_counter() - started)
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+    def run(self, taps: int):
+        try:
+            status, body = self.request("POST", "/auth/login", "POST /auth/login",
+                                        {"email": self.email, "password": self.password})
+            if status != 200:
+                return
+            self.token = body["token"]
+            _, dashboard = self.request("GET", "/dashboard/today", "GET /dashboard/today")
+            _, quests = self.request("GET", "/quest", "GET /quest")
+            hydrate_logs = (dashboard or {}).get("hydrate_logs") or []
+            for _ in range(taps if hydrate_logs else 0):
+                self.request("PUT", f"/hydrate/logs/{hydrate_logs[0]['id']}/update", "PUT /hydrate/logs/<id>/update")
+            self.request("PUT", "/xp/checkin", "PUT /xp/checkin")
+            _, quests = self.request("GET", "/quest", "GET /quest")
+            checkin = next((q for q in (quests or []) if q.get("trigger_type") == "checkin"), None)
+            if checkin:
+                self.request("POST", f"/quest/{checkin['id']}/claim", "POST /quest/<id>/claim")
+            self.request("GET", "/dashboard/today", "GET /dashboard/today")
+        finally:
+            self.conn.close()
+
+
+def arrival_times(users: int, ramp: float, seed: int):
+    """Arrival offsets (seconds) of a burst: most users in the first seconds, fewer until ``ramp``."""
+    rng = random.Random(seed)
+    scale = ramp / 4
+    return sorted(min(-scale * math.log(1 - rng.random()), ramp) for _ in range(users))
+
+
+def run_spike(args, recorder: Recorder) -> float:
+    offsets = arrival_times(args.users, args.ramp, args.seed)
+    started = time.perf_counter()
+
+    def start_user(n, offset):
+        delay = offset - (time.perf_counter() - started)
+        if delay > 0:
+            time.sleep(delay)
+        VirtualUser(n, recorder, args.password).run(args.taps)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for n, offset in enumerate(offsets):
+            pool.submit(start_user, n, offset)
+    return time.perf_counter() - started
+
+
+def summarize(recorder: Recorder, elapsed: float):
+    routes = {}
+    for route in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = sorted(recorder.latencies[route])
+        routes[route] = {
+            "count": len(latencies),
+            "errors": recorder.errors[route],
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+    everything = sorted(value for values in recorder.latencies.values() for value in values)
+    total = {
+        "count": len(everything),
+        "errors": sum(recorder.errors.values()),
+        "rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 0.50) * 1000,
+        "p95_ms": percentile(everything, 0.95) * 1000,
+        "p99_ms": percentile(everything, 0.99) * 1000,
+    }
+    return routes, total
+
+
+def print_table(routes, total):
+    print(f"{'route':>32} {'count':>6} {'errors':>6} {'req/s':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for route, stats in list(routes.items()) + [("all", total)]:
+        print(f"{route:>32} {stats['count']:>6} {stats['errors']:>6} {stats['rps']:>7.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+
+def print_comparison(result, baseline):
+    print(f"\nChange against {baseline['started_at']} ({baseline.get('label') or 'baseline'}):")
+    print(f"{'route':>32} {'req/s':>14} {'p50 (ms)':>16} {'p95 (ms)':>16} {'p99 (ms)':>16}")
+    old_routes = dict(baseline["routes"], all=baseline["total"])
+    for route, stats in list(result["routes"].items()) + [("all", result["total"])]:
+        old = old_routes.get(route)
+        if old is None:
+            continue
+        cells = []
+        for key, width in (("rps", 14), ("p50_ms", 16), ("p95_ms", 16), ("p99_ms", 16)):
+            change = (stats[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{stats[key]:.1f} ({change:+.0f}%)".rjust(width))
+        print(f"{route:>32} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which the users arrive")
+    parser.add_argument("--concurrency", type=int, default=64, help="users running their script at the same time")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per PostgREST call")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--taps", type=int, default=3, help="hydrate taps per user")
+    parser.add_argument("--seed", type=int, default=7, help="random seed of the arrival times")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--bcrypt-rounds", type=int, help="bcrypt cost of the seeded passwords (default: BCRYPT_ROUNDS)")
+    parser.add_argument("--label", default="", help="stored with the results, e.g. a commit or branch name")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/rollover-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOADTEST_USERS=str(args.users), LOADTEST_LATENCY=str(args.latency),
+               LOADTEST_PASSWORD=args.password, WEB_WORKERS=str(args.workers), WEB_THREADS=str(args.threads),
+               WEB_ACCESS_LOG="", WEB_MAX_REQUESTS="0", TASK_SPOOL_DIR=tempfile.mkdtemp(prefix="bench-spool-"))
+    if args.bcrypt_rounds:
+        env["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{PORT}",
+               "benchmarks.rollover_app:app"]
+    started_at = datetime.now().isoformat(timespec="seconds")
+    recorder = Recorder()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(PORT, timeout=120)
+        elapsed = run_spike(args, recorder)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+    routes, total = summarize(recorder, elapsed)
+    print(f"{args.users} users over {args.ramp:.0f}s, {args.concurrency} at a time, gunicorn {args.workers}x{args.threads}, "
+          f"{args.latency * 1000:.0f} ms per PostgREST call: {elapsed:.1f}s")
+    print_table(routes, total)
+
+    result = {
+        "started_at": started_at,
+        "label": args.label,
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "compare", "password")},
+        "elapsed_s": elapsed,
+        "routes": routes,
+        "total": total,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"rollover-{started_at.replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Time of the daily rollover (rollover.py) per chunk size and parallelism.
+
+Seeds LOADTEST_USERS users the way benchmarks.rollover_app does, removes the rows the
+rollover creates (today's logs and quest progress) and runs RolloverService from scratch
+for each configuration, with ``--latency`` seconds per PostgREST call. The per-chunk
+throughput lines of the service are silenced; the table shows the whole run.
+
+Usage (from backend/):
+    python -m benchmarks.rollover_worker [--users 2000] [--chunk-sizes 100 500] [--parallelism 1 4] [--latency 0.02]
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--parallelism", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    os.environ["LOADTEST_USERS"] = str(args.users)
+    os.environ["LOADTEST_LATENCY"] = "0"
+    from benchmarks.rollover_app import supabase  # noqa: E402  (seeds the users on import)
+    from src.services import rollover_service  # noqa: E402
+    from src.utils import local_today  # noqa: E402
+
+    today = local_today()
+    print(f"{'chunk':>6} {'parallel':>8} {'seconds':>8} {'users/s':>8} {'round trips':>12}")
+    for chunk_size in args.chunk_sizes:
+        for parallelism in args.parallelism:
+            supabase.latency = 0
+            for table in ("hydrate_logs", "diet_logs", "focus_logs"):
+                supabase.table(table).delete().eq("date", today.isoformat()).execute()
+            supabase.table("sleep_logs").delete().gte("scheduled_time", f"{today} 00:00:00").execute()
+            supabase.table("user_quest_progress").delete().eq("period_start_date", today.isoformat()).execute()
+            supabase.latency = args.latency
+            supabase.reset_counters()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run = rollover_service.run(chunk_size=chunk_size, parallelism=parallelism, restart=True)
+            seconds = time.perf_counter() - started
+            print(f"{chunk_size:>6} {parallelism:>8} {seconds:>8.2f} {run['users_done'] / seconds:>8.0f} "
+                  f"{supabase.round_trips:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Time and size of serialising the GET /quest payload, per encoder.
+
+Builds the quests-with-progress list for a growing number of quests (as
+QuestService.get_quests_with_progress returns it) and times, per response:
+
+- jsonify:  ``[q.model_dump(mode="json") ...]`` then Flask's ``jsonify`` (the routes before)
+- pydantic: ``respond()`` JSON path, pydantic's serializer straight to bytes
+- orjson:   ``orjson.dumps`` of the dumped dicts (plain-data path of ``respond()``)
+- msgpack:  ``respond()`` with ``Accept: application/msgpack``
+
+Usage (from backend/):
+    python -m benchmarks.serialization [--quests 7 50 200] [--repeat 2000]
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+# No Supabase project needed: the services start on the in-memory backend
+os.environ.setdefault("DATA_BACKEND", "memory")
+
+from flask import Flask, jsonify  # noqa: E402
+from src.models import QuestWithProgressResponse, UserQuestProgressResponse  # noqa: E402
+from src.utils import serialization  # noqa: E402
+from src.utils.serialization import encode_json, encode_msgpack  # noqa: E402
+from benchmarks.quest_round_trips import TRIGGERS  # noqa: E402
+
+
+def quests_payload(count: int):
+    now = datetime.now(timezone.utc)
+    user_id = str(uuid.uuid4())
+    quests = []
+    for i in range(count):
+        quest_id = str(uuid.uuid4())
+        quests.append(QuestWithProgressResponse(
+            id=quest_id,
+            title=f"Daily quest {i}",
+            description="Drink 1.5 l of water today",
+            type="daily",
+            trigger_type=TRIGGERS[i % len(TRIGGERS)],
+            target_progress=1500,
+            reward_type="coins",
+            reward_amount=10,
+            created_at=now,
+            user_progress=UserQuestProgressResponse(id=str(uuid.uuid4()), user_id=user_id, quest_id=quest_id,
+                                                    current_progress=750, period_start_date=now.date(),
+                                                    last_updated=now),
+        ))
+    return quests
+
+
+def timed(fn, repeat: int):
+    body = fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quests", type=int, nargs="+", default=[7, 50, 200])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    encoders = {
+        "jsonify": lambda quests: jsonify([q.model_dump(mode="json") for q in quests]).get_data(),
+        "pydantic": encode_json,
+    }
+    if serialization.orjson is not None:
+        encoders["orjson"] = lambda quests: serialization.orjson.dumps([q.model_dump(mode="json") for q in quests])
+    if serialization.msgpack is not None:
+        encoders["msgpack"] = encode_msgpack
+
+    print(f"{'quests':>7} {'encoder':>9} {'us/response':>12} {'bytes':>8} {'speedup':>8}")
+    with app.app_context():
+        for count in args.quests:
+            quests = quests_payload(count)
+            baseline = None
+            for name, encoder in encoders.items():
+                micros, size = timed(lambda: encoder(quests), max(args.repeat // count, 20))
+                baseline = baseline or micros
+                print(f"{count:>7} {name:>9} {micros:>12.1f} {size:>8} {baseline / micros:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Throughput of the development server (app.run) versus gunicorn (gunicorn.conf.py).
+
+Starts each server on benchmarks.stub_wsgi (in-memory data with an injected per-call
+latency), keeps ``--concurrency`` keep-alive clients sending GET ``--path`` for
+``--duration`` seconds and prints requests/s and latency percentiles.
+
+Usage (from backend/):
+    python -m benchmarks.server_throughput [--duration 10] [--concurrency 32] [--latency 0.02]
+        [--workers 4] [--threads 4] [--path /dashboard/today]
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PORT = 5051
+
+
+def wait_until_up(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def load(port: int, path: str, token: str, concurrency: int, duration: float):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        nonlocal errors
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Authorization": f"Bearer {token}"})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+                    continue
+                local.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per PostgREST call")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--path", default="/dashboard/today")
+    args = parser.parse_args()
+
+    spool_dir = tempfile.mkdtemp(prefix="bench-spool-")
+    env = dict(os.environ, STUB_LATENCY=str(args.latency), WEB_WORKERS=str(args.workers),
+               WEB_THREADS=str(args.threads), WEB_ACCESS_LOG="", TASK_SPOOL_DIR=spool_dir)
+    os.environ.update(STUB_LATENCY=str(args.latency))
+    from benchmarks.stub_wsgi import make_token
+    token = make_token()
+
+    servers = {
+        "app.run": [sys.executable, "-m", "benchmarks.stub_wsgi", "--port", str(PORT)],
+        f"gunicorn {args.workers}x{args.threads}": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                                                   "--bind", f"127.0.0.1:{PORT}", "benchmarks.stub_wsgi:app"],
+    }
+    print(f"GET {args.path}, {args.concurrency} clients, {args.duration:.0f}s, {args.latency * 1000:.0f} ms per PostgREST call")
+    print(f"{'server':>14} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    for label, command in servers.items():
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(PORT)
+            latencies, errors, elapsed = load(PORT, args.path, token, args.concurrency, args.duration)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+        latencies.sort()
+        print(f"{label:>14} {len(latencies) / elapsed:>8.1f} {percentile(latencies, 0.50) * 1000:>9.1f} "
+              f"{percentile(latencies, 0.95) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
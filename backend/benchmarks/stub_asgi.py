@@ -0,0 +1,15 @@
+"""The ASGI app (asgi.py) wired to the same in-memory data as benchmarks.stub_wsgi.
+
+The async services get an AsyncMemoryClient over the MemoryClient of stub_wsgi, so both apps
+see the same rows and the same STUB_LATENCY per PostgREST call (awaited instead of slept).
+Serve it with ``gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker benchmarks.stub_asgi:app``.
+"""
+from src.utils.memory_backend import AsyncMemoryClient
+from benchmarks.stub_wsgi import client, make_token, USER_ID  # noqa: F401
+from src.services.async_services import ASYNC_CLIENT_SERVICES
+
+async_client = AsyncMemoryClient(client)
+for service in ASYNC_CLIENT_SERVICES:
+    service.client = async_client
+
+from asgi import app  # noqa: E402
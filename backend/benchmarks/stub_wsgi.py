@@ -0,0 +1,41 @@
+"""The app wired to an in-memory MemoryClient, for benchmarks that need a running server.
+
+Every service uses one MemoryClient with STUB_LATENCY seconds per PostgREST call, seeded
+with a fixed user (USER_ID) and STUB_QUESTS active quests. Served either by Flask's
+development server (``python -m benchmarks.stub_wsgi --port 5001``, what app.py runs)
+or by gunicorn (``gunicorn -c gunicorn.conf.py benchmarks.stub_wsgi:app``).
+"""
+import argparse
+import os
+
+# No Supabase project needed: the services start on the in-memory backend
+os.environ.setdefault("DATA_BACKEND", "memory")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from benchmarks.quest_round_trips import seed  # noqa: E402
+from src.utils.memory_backend import MemoryClient  # noqa: E402
+from src import services  # noqa: E402
+
+USER_ID = "00000000-0000-4000-8000-000000000001"
+
+client = MemoryClient()
+for name in services.__all__:
+    getattr(services, name).client = client
+seed(client, int(os.getenv("STUB_QUESTS", "7")), user_id=USER_ID)
+client.latency = float(os.getenv("STUB_LATENCY", "0.02"))
+
+app = create_app()
+
+
+def make_token() -> str:
+    with app.app_context():
+        return create_access_token(identity=USER_ID)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args()
+    app.run(host="127.0.0.1", port=args.port)
@@ -0,0 +1,60 @@
+-- Cập nhật log trong 1 câu lệnh (1 round trip, không mất lượt khi nhiều request chạy song song)
+-- Gọi từ backend qua supabase.rpc(...). Trả về dòng log sau khi cập nhật, hoặc rỗng nếu log
+-- không tồn tại / không thuộc về user.
+
+-- Hydrate: cộng thêm 1 cốc (cup_size) và tính lại completed
+CREATE OR REPLACE FUNCTION increment_hydrate_log(p_log_id UUID, p_user_id UUID)
+RETURNS SETOF hydrate_logs AS $$
+    UPDATE hydrate_logs
+    SET consumed_water = consumed_water + cup_size,
+        completed = (consumed_water + cup_size) >= water_goal
+    WHERE id = p_log_id
+      AND user_id = p_user_id
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Focus: cộng thêm p_minutes, completed so với focus_goal trong focus_habits
+CREATE OR REPLACE FUNCTION increment_focus_log(p_log_id UUID, p_user_id UUID, p_minutes INT)
+RETURNS SETOF focus_logs AS $$
+    UPDATE focus_logs fl
+    SET focus_done = fl.focus_done + p_minutes,
+        completed = (fl.focus_done + p_minutes) >= fh.focus_goal
+    FROM focus_habits fh
+    WHERE fl.id = p_log_id
+      AND fl.user_id = p_user_id
+      AND fh.user_id = fl.user_id
+    RETURNING fl.*;
+$$ LANGUAGE sql;
+
+-- Diet: nối thêm các món ăn và tính lại tổng calories từ toàn bộ danh sách món
+CREATE OR REPLACE FUNCTION append_diet_dishes(p_log_id UUID, p_user_id UUID, p_dishes JSONB)
+RETURNS SETOF diet_logs AS $$
+DECLARE
+    new_dishes JSONB;
+    new_consumed FLOAT;
+BEGIN
+    -- Khóa dòng log để các request song song nối món lần lượt
+    SELECT COALESCE(dishes, '[]'::JSONB) || COALESCE(p_dishes, '[]'::JSONB)
+    INTO new_dishes
+    FROM diet_logs
+    WHERE id = p_log_id
+      AND user_id = p_user_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    SELECT COALESCE(SUM((d ->> 'calories')::FLOAT), 0)
+    INTO new_consumed
+    FROM jsonb_array_elements(new_dishes) AS d;
+
+    RETURN QUERY
+    UPDATE diet_logs
+    SET dishes = new_dishes,
+        consumed_calories = new_consumed,
+        completed = new_consumed >= calories_goal
+    WHERE id = p_log_id
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql;
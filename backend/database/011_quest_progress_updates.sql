@@ -0,0 +1,50 @@
+-- Cập nhật quest progress theo trigger (gọi từ QuestService.update_quest_progress qua supabase.rpc)
+-- Chỉ đụng tới các quest đang hoạt động có trigger_type tương ứng, trong kỳ hiện tại (ngày/tháng).
+--   p_value     : đặt progress bằng giá trị này (vd. tổng ml nước hôm nay)
+--   p_increment : cộng thêm vào progress hiện tại (khi p_value là NULL)
+-- Progress được giới hạn bởi target (checkin/log_meal tối đa là 1), chỉ tăng chứ không giảm và
+-- không đổi sau khi đã nhận thưởng, nên các lần gọi song song hoặc đến trễ vẫn an toàn.
+CREATE OR REPLACE FUNCTION apply_quest_progress(
+    p_user_id UUID,
+    p_trigger_type TEXT,
+    p_daily_start DATE,
+    p_monthly_start DATE,
+    p_increment INT DEFAULT 1,
+    p_value INT DEFAULT NULL
+)
+RETURNS SETOF user_quest_progress AS $$
+BEGIN
+    -- Tạo progress của kỳ hiện tại nếu chưa có
+    INSERT INTO user_quest_progress (user_id, quest_id, period_start_date, current_progress)
+    SELECT
+        p_user_id,
+        q.id,
+        CASE WHEN q.type = 'daily' THEN p_daily_start ELSE p_monthly_start END,
+        0
+    FROM quests q
+    WHERE q.is_active
+      AND q.trigger_type = p_trigger_type
+    ON CONFLICT (user_id, quest_id, period_start_date) DO NOTHING;
+
+    -- Cập nhật có điều kiện: chưa nhận thưởng và giá trị mới lớn hơn giá trị hiện tại
+    RETURN QUERY
+    UPDATE user_quest_progress p
+    SET current_progress = LEAST(
+            COALESCE(p_value, p.current_progress + p_increment),
+            CASE WHEN q.trigger_type IN ('checkin', 'log_meal') THEN 1 ELSE q.target_progress END
+        ),
+        last_updated = now()
+    FROM quests q
+    WHERE p.quest_id = q.id
+      AND q.is_active
+      AND q.trigger_type = p_trigger_type
+      AND p.user_id = p_user_id
+      AND p.period_start_date = CASE WHEN q.type = 'daily' THEN p_daily_start ELSE p_monthly_start END
+      AND p.claimed_at IS NULL
+      AND LEAST(
+            COALESCE(p_value, p.current_progress + p_increment),
+            CASE WHEN q.trigger_type IN ('checkin', 'log_meal') THEN 1 ELSE q.target_progress END
+        ) > p.current_progress
+    RETURNING p.*;
+END;
+$$ LANGUAGE plpgsql;
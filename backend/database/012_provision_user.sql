@@ -0,0 +1,88 @@
+-- Tạo tài khoản mới trong 1 lần gọi (gọi từ AuthService.register_user qua supabase.rpc)
+-- Gồm: users, profiles, 4 habit mặc định, log của hôm nay cho từng habit và user_quest_progress
+-- của kỳ hiện tại cho mọi quest đang hoạt động. Hàm chạy trong 1 transaction: lỗi ở bất kỳ bước
+-- nào (email trùng, không có quest, ...) sẽ rollback toàn bộ, không để lại tài khoản dở dang.
+--   p_user    : {id, email, password (đã hash), role}
+--   p_profile : {username, gender, weight, height, age}
+--   p_habits  : {sleep: {sleep_time, wakeup_time}, hydrate: {water_goal, cup_size, reminder_time},
+--                diet: {calories_goal, reminder_time}, focus: {focus_goal}}
+--   p_today   : ngày hiện tại theo giờ địa phương (kỳ daily), kỳ monthly bắt đầu từ ngày 1 của tháng
+CREATE OR REPLACE FUNCTION provision_user(
+    p_user JSONB,
+    p_profile JSONB,
+    p_habits JSONB,
+    p_today DATE
+)
+RETURNS SETOF users AS $$
+DECLARE
+    v_user_id UUID := (p_user ->> 'id')::UUID;
+BEGIN
+    INSERT INTO users (id, email, password, role)
+    VALUES (v_user_id, p_user ->> 'email', p_user ->> 'password', COALESCE(p_user ->> 'role', 'user'));
+
+    INSERT INTO profiles (user_id, username, gender, weight, height, age)
+    VALUES (
+        v_user_id,
+        p_profile ->> 'username',
+        p_profile ->> 'gender',
+        (p_profile ->> 'weight')::FLOAT,
+        (p_profile ->> 'height')::FLOAT,
+        (p_profile ->> 'age')::INT
+    );
+
+    -- Habit mặc định
+    INSERT INTO sleep_habits (user_id, sleep_time, wakeup_time)
+    VALUES (v_user_id, (p_habits #>> '{sleep,sleep_time}')::TIME, (p_habits #>> '{sleep,wakeup_time}')::TIME);
+
+    INSERT INTO hydrate_habits (user_id, water_goal, cup_size, reminder_time)
+    VALUES (
+        v_user_id,
+        (p_habits #>> '{hydrate,water_goal}')::FLOAT,
+        (p_habits #>> '{hydrate,cup_size}')::FLOAT,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(p_habits #> '{hydrate,reminder_time}', '[]'::JSONB))::TIME)
+    );
+
+    INSERT INTO diet_habits (user_id, calories_goal, reminder_time)
+    VALUES (
+        v_user_id,
+        (p_habits #>> '{diet,calories_goal}')::FLOAT,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(p_habits #> '{diet,reminder_time}', '[]'::JSONB))::TIME)
+    );
+
+    INSERT INTO focus_habits (user_id, focus_goal)
+    VALUES (v_user_id, (p_habits #>> '{focus,focus_goal}')::INT);
+
+    -- Log của hôm nay, lấy từ các habit vừa tạo
+    INSERT INTO sleep_logs (user_id, task_type, scheduled_time)
+    SELECT v_user_id, 'sleep', p_today + sh.sleep_time FROM sleep_habits sh WHERE sh.user_id = v_user_id
+    UNION ALL
+    SELECT v_user_id, 'wakeup', p_today + sh.wakeup_time FROM sleep_habits sh WHERE sh.user_id = v_user_id;
+
+    INSERT INTO hydrate_logs (user_id, water_goal, cup_size, consumed_water, date, completed)
+    SELECT v_user_id, hh.water_goal, hh.cup_size, 0, p_today, FALSE
+    FROM hydrate_habits hh WHERE hh.user_id = v_user_id;
+
+    INSERT INTO diet_logs (user_id, calories_goal, dishes, consumed_calories, date, completed)
+    SELECT v_user_id, dh.calories_goal, '[]'::JSONB, 0, p_today, FALSE
+    FROM diet_habits dh WHERE dh.user_id = v_user_id;
+
+    INSERT INTO focus_logs (user_id, focus_done, date, completed)
+    VALUES (v_user_id, 0, p_today, FALSE);
+
+    -- Progress của kỳ hiện tại cho mọi quest đang hoạt động
+    INSERT INTO user_quest_progress (user_id, quest_id, period_start_date, current_progress)
+    SELECT
+        v_user_id,
+        q.id,
+        CASE WHEN q.type = 'daily' THEN p_today ELSE date_trunc('month', p_today)::DATE END,
+        0
+    FROM quests q
+    WHERE q.is_active;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'No quests available';
+    END IF;
+
+    RETURN QUERY SELECT * FROM users WHERE id = v_user_id;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,7 @@
+-- Index cho /history/<domain>: lọc theo user và khoảng thời gian, sắp xếp theo (thời gian, id).
+-- Trang sau bắt đầu từ cursor (thời gian, id) nên mỗi trang chỉ đọc đúng số dòng cần, dù đã đi sâu bao nhiêu trang.
+
+CREATE INDEX IF NOT EXISTS idx_hydrate_logs_user_date ON hydrate_logs (user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_diet_logs_user_date ON diet_logs (user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_focus_logs_user_date ON focus_logs (user_id, date, id);
+CREATE INDEX IF NOT EXISTS idx_sleep_logs_user_time ON sleep_logs (user_id, scheduled_time, id);
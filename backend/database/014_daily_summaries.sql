@@ -0,0 +1,262 @@
+-- Tổng hợp log mỗi ngày thành 1 dòng / user / ngày trước khi cron xóa log cũ.
+-- Lịch sử dài ngày (/history/summary) và thống kê (/history/stats) đọc từ bảng này thay vì log gốc.
+
+CREATE TABLE IF NOT EXISTS daily_summaries (
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    -- Hydrate
+    water_goal FLOAT,
+    consumed_water FLOAT,
+    hydrate_completed BOOLEAN,
+    -- Diet
+    calories_goal FLOAT,
+    consumed_calories FLOAT,
+    meals INT,
+    diet_completed BOOLEAN,
+    -- Sleep: số task (sleep/wakeup) của ngày và số task đã hoàn thành
+    sleep_tasks INT,
+    sleep_tasks_completed INT,
+    -- Focus
+    focus_done INT, -- in minutes
+    focus_completed BOOLEAN,
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (user_id, date)
+);
+
+-- Ngày cuối cùng đã tổng hợp xong: lần chạy sau tiếp tục từ ngày kế tiếp
+CREATE TABLE IF NOT EXISTS rollup_checkpoints (
+    name TEXT PRIMARY KEY,
+    last_date DATE NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Tổng hợp 1 ngày. Chạy lại bao nhiêu lần cũng cho cùng kết quả (upsert theo (user_id, date)),
+-- mỗi domain chỉ ghi các cột của nó. Trả về số dòng đã ghi.
+CREATE OR REPLACE FUNCTION rollup_daily_summaries(p_day DATE)
+RETURNS INT AS $$
+DECLARE
+    folded INT := 0;
+    written INT;
+BEGIN
+    INSERT INTO daily_summaries (user_id, date, water_goal, consumed_water, hydrate_completed)
+    SELECT user_id, p_day, MAX(water_goal), SUM(consumed_water), bool_or(COALESCE(completed, FALSE))
+    FROM hydrate_logs
+    WHERE date = p_day
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        water_goal = EXCLUDED.water_goal,
+        consumed_water = EXCLUDED.consumed_water,
+        hydrate_completed = EXCLUDED.hydrate_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, calories_goal, consumed_calories, meals, diet_completed)
+    SELECT user_id, p_day, MAX(calories_goal), SUM(consumed_calories), SUM(jsonb_array_length(dishes)),
+           bool_or(COALESCE(completed, FALSE))
+    FROM diet_logs
+    WHERE date = p_day
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        calories_goal = EXCLUDED.calories_goal,
+        consumed_calories = EXCLUDED.consumed_calories,
+        meals = EXCLUDED.meals,
+        diet_completed = EXCLUDED.diet_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, sleep_tasks, sleep_tasks_completed)
+    SELECT user_id, p_day, COUNT(*), COUNT(*) FILTER (WHERE completed)
+    FROM sleep_logs
+    WHERE scheduled_time >= p_day
+      AND scheduled_time < p_day + 1
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        sleep_tasks = EXCLUDED.sleep_tasks,
+        sleep_tasks_completed = EXCLUDED.sleep_tasks_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, focus_done, focus_completed)
+    SELECT user_id, p_day, SUM(focus_done), bool_or(COALESCE(completed, FALSE))
+    FROM focus_logs
+    WHERE date = p_day
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        focus_done = EXCLUDED.focus_done,
+        focus_completed = EXCLUDED.focus_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tổng hợp mọi ngày chưa tổng hợp cho đến p_until (gồm cả p_until), tiếp tục từ checkpoint.
+-- Chạy trong transaction của lời gọi: nếu lỗi, checkpoint không đổi và log chưa bị xóa,
+-- lần chạy sau làm lại từ cùng chỗ. Trả về ngày đã tổng hợp đến.
+CREATE OR REPLACE FUNCTION rollup_pending_days(p_until DATE)
+RETURNS DATE AS $$
+DECLARE
+    last_done DATE;
+    day DATE;
+BEGIN
+    -- 4 cron job gọi cùng lúc 00:00: chỉ 1 lần chạy làm việc, các lần sau thấy checkpoint đã đến p_until
+    PERFORM pg_advisory_xact_lock(hashtext('rollup_daily_summaries'));
+
+    SELECT last_date INTO last_done FROM rollup_checkpoints WHERE name = 'daily_summaries';
+    IF last_done IS NULL THEN
+        -- Lần đầu: bắt đầu từ ngày log cũ nhất còn lại
+        SELECT MIN(first_day) - 1 INTO last_done FROM (
+            SELECT MIN(date) AS first_day FROM hydrate_logs
+            UNION ALL SELECT MIN(date) FROM diet_logs
+            UNION ALL SELECT MIN(date) FROM focus_logs
+            UNION ALL SELECT MIN(scheduled_time)::date FROM sleep_logs
+        ) first_days;
+    END IF;
+    IF last_done IS NULL OR last_done >= p_until THEN
+        last_done := GREATEST(last_done, p_until);
+    ELSE
+        day := last_done + 1;
+        WHILE day <= p_until LOOP
+            PERFORM rollup_daily_summaries(day);
+            day := day + 1;
+        END LOOP;
+        last_done := p_until;
+    END IF;
+
+    INSERT INTO rollup_checkpoints (name, last_date)
+    VALUES ('daily_summaries', last_done)
+    ON CONFLICT (name) DO UPDATE SET last_date = EXCLUDED.last_date, updated_at = now();
+    RETURN last_done;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Các hàm cron (004 - 009) tổng hợp các ngày trước trước khi xóa log của chúng
+CREATE OR REPLACE FUNCTION generate_daily_sleep_logs()
+RETURNS VOID AS $$
+DECLARE
+    today DATE := (CURRENT_TIMESTAMP AT TIME ZONE 'Asia/Ho_Chi_Minh')::DATE;
+BEGIN
+    PERFORM rollup_pending_days(today - 1);
+
+    -- Xóa sleep logs của các ngày trước hôm nay
+    DELETE FROM sleep_logs
+    WHERE scheduled_time::date < today;
+
+    -- Chèn log ngủ nếu hôm nay chưa có log 'sleep'
+    INSERT INTO sleep_logs (user_id, task_type, scheduled_time)
+    SELECT
+        sh.user_id,
+        'sleep',
+        (today || ' ' || sh.sleep_time)::timestamp
+    FROM sleep_habits sh
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sleep_logs sl
+        WHERE sl.user_id = sh.user_id
+          AND sl.task_type = 'sleep'
+          AND sl.scheduled_time::date = today
+    );
+
+    -- Chèn log thức dậy nếu hôm nay chưa có log 'wakeup'
+    INSERT INTO sleep_logs (user_id, task_type, scheduled_time)
+    SELECT
+        sh.user_id,
+        'wakeup',
+        (today || ' ' || sh.wakeup_time)::timestamp
+    FROM sleep_habits sh
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sleep_logs sl
+        WHERE sl.user_id = sh.user_id
+          AND sl.task_type = 'wakeup'
+          AND sl.scheduled_time::date = today
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION generate_daily_hydrate_logs()
+RETURNS VOID AS $$
+DECLARE
+    today DATE := (CURRENT_TIMESTAMP AT TIME ZONE 'Asia/Ho_Chi_Minh')::DATE;
+BEGIN
+    PERFORM rollup_pending_days(today - 1);
+
+    -- Xóa hydrate logs của các ngày trước hôm nay
+    DELETE FROM hydrate_logs WHERE date < today;
+
+    -- Chèn hydrate log mới nếu hôm nay chưa có
+    INSERT INTO hydrate_logs (user_id, water_goal, cup_size, consumed_water, date, completed)
+    SELECT
+        hh.user_id,
+        hh.water_goal,
+        hh.cup_size,
+        0,
+        today,
+        FALSE
+    FROM hydrate_habits hh
+    WHERE NOT EXISTS (
+        SELECT 1 FROM hydrate_logs hl
+        WHERE hl.user_id = hh.user_id
+          AND hl.date = today
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION generate_daily_diet_logs()
+RETURNS VOID AS $$
+DECLARE
+    today DATE := (CURRENT_TIMESTAMP AT TIME ZONE 'Asia/Ho_Chi_Minh')::DATE;
+BEGIN
+    PERFORM rollup_pending_days(today - 1);
+
+    -- Xóa diet logs của các ngày trước hôm nay
+    DELETE FROM diet_logs WHERE date < today;
+
+    -- Chèn diet log mới nếu hôm nay chưa có
+    INSERT INTO diet_logs (user_id, calories_goal, dishes, consumed_calories, date, completed)
+    SELECT
+        dh.user_id,
+        dh.calories_goal,
+        '[]'::JSONB,
+        0,
+        today,
+        FALSE
+    FROM diet_habits dh
+    WHERE NOT EXISTS (
+        SELECT 1 FROM diet_logs dl
+        WHERE dl.user_id = dh.user_id
+          AND dl.date = today
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION generate_daily_focus_logs()
+RETURNS VOID AS $$
+DECLARE
+    today DATE := (CURRENT_TIMESTAMP AT TIME ZONE 'Asia/Ho_Chi_Minh')::DATE;
+BEGIN
+    PERFORM rollup_pending_days(today - 1);
+
+    -- Xóa các focus_logs của các ngày trước hôm nay
+    DELETE FROM focus_logs WHERE date < today;
+
+    -- Thêm log mới nếu hôm nay chưa có
+    INSERT INTO focus_logs (user_id, focus_done, date, completed)
+    SELECT
+        fh.user_id,
+        0,
+        today,
+        FALSE
+    FROM focus_habits fh
+    WHERE NOT EXISTS (
+        SELECT 1 FROM focus_logs fl
+        WHERE fl.user_id = fh.user_id
+          AND fl.date = today
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tổng hợp lại 1 ngày bằng tay (vd. sau khi sửa dữ liệu): SELECT rollup_daily_summaries('2025-05-01');
@@ -0,0 +1,38 @@
+-- Rollover hằng ngày chạy bằng worker Python (rollover.py) thay cho các cron job 004 - 009:
+-- xử lý user theo từng chunk (khoảng user_id), mỗi chunk là vài câu lệnh ngắn thay vì 1 transaction lớn.
+
+-- Mỗi user chỉ có 1 log / ngày: log hôm nay được tạo bằng upsert (ON CONFLICT DO NOTHING),
+-- không cần NOT EXISTS. Xóa các log trùng (giữ 1 dòng) trước khi tạo unique index.
+DELETE FROM hydrate_logs a USING hydrate_logs b
+WHERE a.user_id = b.user_id AND a.date = b.date AND a.id > b.id;
+DELETE FROM diet_logs a USING diet_logs b
+WHERE a.user_id = b.user_id AND a.date = b.date AND a.id > b.id;
+DELETE FROM focus_logs a USING focus_logs b
+WHERE a.user_id = b.user_id AND a.date = b.date AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_hydrate_logs_user_date ON hydrate_logs (user_id, date);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_diet_logs_user_date ON diet_logs (user_id, date);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_focus_logs_user_date ON focus_logs (user_id, date);
+
+-- Tiến độ của lần rollover mỗi ngày: user_id cuối cùng đã xong (chunk tiếp theo bắt đầu sau nó),
+-- và lease để chỉ 1 worker chạy 1 ngày tại 1 thời điểm. Worker chết giữa chừng thì lease hết hạn
+-- sau ROLLOVER_LEASE_SECONDS, lần chạy sau tiếp tục từ last_user_id.
+CREATE TABLE IF NOT EXISTS rollover_runs (
+    day DATE PRIMARY KEY,
+    last_user_id UUID,
+    users_done INT NOT NULL DEFAULT 0,
+    chunks_done INT NOT NULL DEFAULT 0,
+    rows_written INT NOT NULL DEFAULT 0,
+    started_at TIMESTAMPTZ DEFAULT now(),
+    finished_at TIMESTAMPTZ,
+    lease_owner TEXT,
+    lease_until TIMESTAMPTZ
+);
+
+-- Tắt các cron job cũ: worker Python chạy lúc 00:00 UTC+7 (17:00 UTC), xem README
+SELECT cron.unschedule(jobname) FROM cron.job
+WHERE jobname IN ('daily_sleep_log_job', 'daily_hydrate_log_job', 'daily_diet_log_job',
+                  'daily_focus_log_job', 'reset_user_quest_progress_daily');
+
+-- Bật lại nếu cần quay về cron (hàm generate_daily_* vẫn còn):
+-- SELECT cron.schedule('daily_hydrate_log_job', '0 17 * * *', $$ SELECT generate_daily_hydrate_logs(); $$);
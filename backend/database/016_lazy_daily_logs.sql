@@ -0,0 +1,15 @@
+-- Log hôm nay được tạo khi user dùng domain lần đầu trong ngày (src/services/daily_logs.py), không tạo
+-- trước cho mọi user lúc 00:00: upsert ON CONFLICT DO NOTHING theo (user_id, date).
+-- hydrate_logs, diet_logs, focus_logs đã có unique (user_id, date) từ 015_rollover_runs.sql.
+
+-- sleep_logs chỉ có scheduled_time: thêm cột date sinh từ nó để upsert theo (user_id, task_type, date)
+ALTER TABLE sleep_logs ADD COLUMN IF NOT EXISTS date DATE GENERATED ALWAYS AS (scheduled_time::date) STORED;
+
+-- Xóa log trùng (giữ 1 dòng, ưu tiên dòng đã hoàn thành) trước khi tạo unique index
+DELETE FROM sleep_logs a USING sleep_logs b
+WHERE a.user_id = b.user_id
+  AND a.task_type = b.task_type
+  AND a.date = b.date
+  AND (COALESCE(a.completed, FALSE), a.id) < (COALESCE(b.completed, FALSE), b.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_sleep_logs_user_task_date ON sleep_logs (user_id, task_type, date);
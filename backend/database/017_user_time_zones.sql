@@ -0,0 +1,259 @@
+-- Múi giờ của từng user: "hôm nay", kỳ quest (ngày / tháng) và rollover tính theo múi giờ của user
+-- thay vì UTC+7 cho mọi người. Rollover (rollover.py --due) chạy riêng cho từng múi giờ lúc 00:00 giờ
+-- địa phương của múi giờ đó, nên tải được trải ra trong ngày thay vì dồn vào cùng 1 giây.
+
+-- Tên múi giờ IANA (vd. 'Asia/Ho_Chi_Minh'), được kiểm tra ở backend (zoneinfo) trước khi ghi
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS time_zone TEXT NOT NULL DEFAULT 'Asia/Ho_Chi_Minh';
+-- Chunk của rollover: user của 1 múi giờ theo thứ tự user_id
+CREATE INDEX IF NOT EXISTS idx_profiles_time_zone_user ON profiles (time_zone, user_id);
+
+-- Mỗi (ngày, múi giờ) là 1 lần rollover riêng với tiến độ và lease riêng
+ALTER TABLE rollover_runs ADD COLUMN IF NOT EXISTS time_zone TEXT NOT NULL DEFAULT 'Asia/Ho_Chi_Minh';
+ALTER TABLE rollover_runs DROP CONSTRAINT IF EXISTS rollover_runs_pkey;
+ALTER TABLE rollover_runs ADD PRIMARY KEY (day, time_zone);
+
+-- Các múi giờ đang có user (rollover.py --due chạy rollover cho những múi giờ đã qua nửa đêm)
+CREATE OR REPLACE FUNCTION rollover_time_zones()
+RETURNS TABLE (time_zone TEXT, users BIGINT) AS $$
+    SELECT p.time_zone, COUNT(*) FROM profiles p GROUP BY p.time_zone ORDER BY p.time_zone;
+$$ LANGUAGE sql STABLE;
+
+-- Xóa log của các ngày trước và progress của các tháng trước cho 1 chunk của rollover: các user
+-- của p_time_zone trong khoảng (p_after, p_last]. User của múi giờ khác trong cùng khoảng id không bị
+-- đụng tới (với họ p_today có thể vẫn là ngày mai). Trả về số dòng đã xóa.
+CREATE OR REPLACE FUNCTION purge_rollover_chunk(
+    p_time_zone TEXT,
+    p_after UUID,
+    p_last UUID,
+    p_today DATE,
+    p_month_start DATE
+)
+RETURNS INT AS $$
+DECLARE
+    chunk_users UUID[] := ARRAY(
+        SELECT user_id FROM profiles
+        WHERE time_zone = p_time_zone
+          AND (p_after IS NULL OR user_id > p_after)
+          AND user_id <= p_last
+    );
+    purged INT := 0;
+    deleted INT;
+BEGIN
+    DELETE FROM hydrate_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM diet_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM focus_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM sleep_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM user_quest_progress
+    WHERE user_id = ANY(chunk_users) AND period_start_date < p_month_start;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+
+    RETURN purged;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tổng hợp daily_summaries theo múi giờ: 1 ngày chỉ xong với user của 1 múi giờ khi múi giờ đó đã qua
+-- nửa đêm. p_time_zone NULL: mọi user như trước. Thay cho 2 hàm cùng tên của 014_daily_summaries.sql
+-- (xóa trước để không có 2 overload; generate_daily_*() gọi rollup_pending_days(today - 1) vẫn chạy).
+DROP FUNCTION IF EXISTS rollup_daily_summaries(DATE);
+DROP FUNCTION IF EXISTS rollup_pending_days(DATE);
+
+CREATE OR REPLACE FUNCTION rollup_daily_summaries(p_day DATE, p_time_zone TEXT DEFAULT NULL)
+RETURNS INT AS $$
+DECLARE
+    folded INT := 0;
+    written INT;
+BEGIN
+    INSERT INTO daily_summaries (user_id, date, water_goal, consumed_water, hydrate_completed)
+    SELECT user_id, p_day, MAX(water_goal), SUM(consumed_water), bool_or(COALESCE(completed, FALSE))
+    FROM hydrate_logs
+    WHERE date = p_day
+      AND (p_time_zone IS NULL OR user_id IN (SELECT user_id FROM profiles WHERE time_zone = p_time_zone))
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        water_goal = EXCLUDED.water_goal,
+        consumed_water = EXCLUDED.consumed_water,
+        hydrate_completed = EXCLUDED.hydrate_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, calories_goal, consumed_calories, meals, diet_completed)
+    SELECT user_id, p_day, MAX(calories_goal), SUM(consumed_calories), SUM(jsonb_array_length(dishes)),
+           bool_or(COALESCE(completed, FALSE))
+    FROM diet_logs
+    WHERE date = p_day
+      AND (p_time_zone IS NULL OR user_id IN (SELECT user_id FROM profiles WHERE time_zone = p_time_zone))
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        calories_goal = EXCLUDED.calories_goal,
+        consumed_calories = EXCLUDED.consumed_calories,
+        meals = EXCLUDED.meals,
+        diet_completed = EXCLUDED.diet_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, sleep_tasks, sleep_tasks_completed)
+    SELECT user_id, p_day, COUNT(*), COUNT(*) FILTER (WHERE completed)
+    FROM sleep_logs
+    WHERE date = p_day
+      AND (p_time_zone IS NULL OR user_id IN (SELECT user_id FROM profiles WHERE time_zone = p_time_zone))
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        sleep_tasks = EXCLUDED.sleep_tasks,
+        sleep_tasks_completed = EXCLUDED.sleep_tasks_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, focus_done, focus_completed)
+    SELECT user_id, p_day, SUM(focus_done), bool_or(COALESCE(completed, FALSE))
+    FROM focus_logs
+    WHERE date = p_day
+      AND (p_time_zone IS NULL OR user_id IN (SELECT user_id FROM profiles WHERE time_zone = p_time_zone))
+    GROUP BY user_id
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        focus_done = EXCLUDED.focus_done,
+        focus_completed = EXCLUDED.focus_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Như 014: tổng hợp các ngày chưa tổng hợp đến p_until, với checkpoint và lock riêng cho từng múi giờ
+CREATE OR REPLACE FUNCTION rollup_pending_days(p_until DATE, p_time_zone TEXT DEFAULT NULL)
+RETURNS DATE AS $$
+DECLARE
+    checkpoint TEXT := 'daily_summaries' || COALESCE(':' || p_time_zone, '');
+    last_done DATE;
+    day DATE;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('rollup_' || checkpoint));
+
+    SELECT last_date INTO last_done FROM rollup_checkpoints WHERE name = checkpoint;
+    IF last_done IS NULL THEN
+        -- Lần đầu: bắt đầu từ ngày log cũ nhất còn lại
+        SELECT MIN(first_day) - 1 INTO last_done FROM (
+            SELECT MIN(date) AS first_day FROM hydrate_logs
+            UNION ALL SELECT MIN(date) FROM diet_logs
+            UNION ALL SELECT MIN(date) FROM focus_logs
+            UNION ALL SELECT MIN(date) FROM sleep_logs
+        ) first_days;
+    END IF;
+    IF last_done IS NULL OR last_done >= p_until THEN
+        last_done := GREATEST(last_done, p_until);
+    ELSE
+        day := last_done + 1;
+        WHILE day <= p_until LOOP
+            PERFORM rollup_daily_summaries(day, p_time_zone);
+            day := day + 1;
+        END LOOP;
+        last_done := p_until;
+    END IF;
+
+    INSERT INTO rollup_checkpoints (name, last_date)
+    VALUES (checkpoint, last_done)
+    ON CONFLICT (name) DO UPDATE SET last_date = EXCLUDED.last_date, updated_at = now();
+    RETURN last_done;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mọi user hiện có đều ở múi giờ mặc định: checkpoint của múi giờ đó tiếp tục từ checkpoint chung
+INSERT INTO rollup_checkpoints (name, last_date)
+SELECT 'daily_summaries:Asia/Ho_Chi_Minh', last_date FROM rollup_checkpoints WHERE name = 'daily_summaries'
+ON CONFLICT (name) DO NOTHING;
+
+-- Như 012, thêm múi giờ của profile (p_profile.time_zone, không có thì dùng mặc định của cột);
+-- p_today là ngày hiện tại theo múi giờ đó
+CREATE OR REPLACE FUNCTION provision_user(
+    p_user JSONB,
+    p_profile JSONB,
+    p_habits JSONB,
+    p_today DATE
+)
+RETURNS SETOF users AS $$
+DECLARE
+    v_user_id UUID := (p_user ->> 'id')::UUID;
+BEGIN
+    INSERT INTO users (id, email, password, role)
+    VALUES (v_user_id, p_user ->> 'email', p_user ->> 'password', COALESCE(p_user ->> 'role', 'user'));
+
+    INSERT INTO profiles (user_id, username, gender, weight, height, age, time_zone)
+    VALUES (
+        v_user_id,
+        p_profile ->> 'username',
+        p_profile ->> 'gender',
+        (p_profile ->> 'weight')::FLOAT,
+        (p_profile ->> 'height')::FLOAT,
+        (p_profile ->> 'age')::INT,
+        COALESCE(p_profile ->> 'time_zone', 'Asia/Ho_Chi_Minh')
+    );
+
+    -- Habit mặc định
+    INSERT INTO sleep_habits (user_id, sleep_time, wakeup_time)
+    VALUES (v_user_id, (p_habits #>> '{sleep,sleep_time}')::TIME, (p_habits #>> '{sleep,wakeup_time}')::TIME);
+
+    INSERT INTO hydrate_habits (user_id, water_goal, cup_size, reminder_time)
+    VALUES (
+        v_user_id,
+        (p_habits #>> '{hydrate,water_goal}')::FLOAT,
+        (p_habits #>> '{hydrate,cup_size}')::FLOAT,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(p_habits #> '{hydrate,reminder_time}', '[]'::JSONB))::TIME)
+    );
+
+    INSERT INTO diet_habits (user_id, calories_goal, reminder_time)
+    VALUES (
+        v_user_id,
+        (p_habits #>> '{diet,calories_goal}')::FLOAT,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(p_habits #> '{diet,reminder_time}', '[]'::JSONB))::TIME)
+    );
+
+    INSERT INTO focus_habits (user_id, focus_goal)
+    VALUES (v_user_id, (p_habits #>> '{focus,focus_goal}')::INT);
+
+    -- Log của hôm nay, lấy từ các habit vừa tạo
+    INSERT INTO sleep_logs (user_id, task_type, scheduled_time)
+    SELECT v_user_id, 'sleep', p_today + sh.sleep_time FROM sleep_habits sh WHERE sh.user_id = v_user_id
+    UNION ALL
+    SELECT v_user_id, 'wakeup', p_today + sh.wakeup_time FROM sleep_habits sh WHERE sh.user_id = v_user_id;
+
+    INSERT INTO hydrate_logs (user_id, water_goal, cup_size, consumed_water, date, completed)
+    SELECT v_user_id, hh.water_goal, hh.cup_size, 0, p_today, FALSE
+    FROM hydrate_habits hh WHERE hh.user_id = v_user_id;
+
+    INSERT INTO diet_logs (user_id, calories_goal, dishes, consumed_calories, date, completed)
+    SELECT v_user_id, dh.calories_goal, '[]'::JSONB, 0, p_today, FALSE
+    FROM diet_habits dh WHERE dh.user_id = v_user_id;
+
+    INSERT INTO focus_logs (user_id, focus_done, date, completed)
+    VALUES (v_user_id, 0, p_today, FALSE);
+
+    -- Progress của kỳ hiện tại cho mọi quest đang hoạt động
+    INSERT INTO user_quest_progress (user_id, quest_id, period_start_date, current_progress)
+    SELECT
+        v_user_id,
+        q.id,
+        CASE WHEN q.type = 'daily' THEN p_today ELSE date_trunc('month', p_today)::DATE END,
+        0
+    FROM quests q
+    WHERE q.is_active;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'No quests available';
+    END IF;
+
+    RETURN QUERY SELECT * FROM users WHERE id = v_user_id;
+END;
+$$ LANGUAGE plpgsql;
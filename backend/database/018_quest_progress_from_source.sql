@@ -0,0 +1,115 @@
+-- Quest progress tính lại từ dữ liệu gốc thay vì chỉ tăng: khi giá trị giảm (đặt lại habit, bỏ hoàn thành
+-- task ngủ, ...) progress của quest chưa nhận thưởng cũng giảm theo, nên quest không còn "nhận được" sai.
+
+-- apply_quest_progress: p_value đặt progress bằng giá trị này kể cả khi nhỏ hơn giá trị hiện tại
+-- (p_increment vẫn chỉ cộng thêm). Dòng đã nhận thưởng không bao giờ bị đổi.
+CREATE OR REPLACE FUNCTION apply_quest_progress(
+    p_user_id UUID,
+    p_trigger_type TEXT,
+    p_daily_start DATE,
+    p_monthly_start DATE,
+    p_increment INT DEFAULT 1,
+    p_value INT DEFAULT NULL
+)
+RETURNS SETOF user_quest_progress AS $$
+BEGIN
+    -- Tạo progress của kỳ hiện tại nếu chưa có
+    INSERT INTO user_quest_progress (user_id, quest_id, period_start_date, current_progress)
+    SELECT
+        p_user_id,
+        q.id,
+        CASE WHEN q.type = 'daily' THEN p_daily_start ELSE p_monthly_start END,
+        0
+    FROM quests q
+    WHERE q.is_active
+      AND q.trigger_type = p_trigger_type
+    ON CONFLICT (user_id, quest_id, period_start_date) DO NOTHING;
+
+    RETURN QUERY
+    UPDATE user_quest_progress p
+    SET current_progress = LEAST(
+            COALESCE(p_value, p.current_progress + p_increment),
+            CASE WHEN q.trigger_type IN ('checkin', 'log_meal') THEN 1 ELSE q.target_progress END
+        ),
+        last_updated = now()
+    FROM quests q
+    WHERE p.quest_id = q.id
+      AND q.is_active
+      AND q.trigger_type = p_trigger_type
+      AND p.user_id = p_user_id
+      AND p.period_start_date = CASE WHEN q.type = 'daily' THEN p_daily_start ELSE p_monthly_start END
+      AND p.claimed_at IS NULL
+      AND LEAST(
+            COALESCE(p_value, p.current_progress + p_increment),
+            CASE WHEN q.trigger_type IN ('checkin', 'log_meal') THEN 1 ELSE q.target_progress END
+        ) <> p.current_progress
+    RETURNING p.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Đặt progress của các quest có trigger p_trigger_type bằng giá trị đọc từ dữ liệu gốc của kỳ
+-- (gọi từ QuestService.refresh_quest_progress, chạy nền sau mỗi lần ghi log / check-in / nhận thưởng).
+-- Khóa các dòng progress trước rồi mới đọc dữ liệu gốc trong câu lệnh sau (snapshot mới của READ
+-- COMMITTED): 2 lần refresh song song chạy lần lượt và lần sau luôn thấy mọi thay đổi đã commit trước
+-- nó, nên giá trị cũ không ghi đè được giá trị mới.
+CREATE OR REPLACE FUNCTION refresh_quest_progress(
+    p_user_id UUID,
+    p_trigger_type TEXT,
+    p_daily_start DATE,
+    p_monthly_start DATE
+)
+RETURNS SETOF user_quest_progress AS $$
+DECLARE
+    source_value INT;
+BEGIN
+    INSERT INTO user_quest_progress (user_id, quest_id, period_start_date, current_progress)
+    SELECT
+        p_user_id,
+        q.id,
+        CASE WHEN q.type = 'daily' THEN p_daily_start ELSE p_monthly_start END,
+        0
+    FROM quests q
+    WHERE q.is_active
+      AND q.trigger_type = p_trigger_type
+    ON CONFLICT (user_id, quest_id, period_start_date) DO NOTHING;
+
+    PERFORM 1
+    FROM user_quest_progress p
+    JOIN quests q ON q.id = p.quest_id
+    WHERE q.is_active
+      AND q.trigger_type = p_trigger_type
+      AND p.user_id = p_user_id
+      AND p.period_start_date = CASE WHEN q.type = 'daily' THEN p_daily_start ELSE p_monthly_start END
+    FOR UPDATE OF p;
+
+    source_value := CASE p_trigger_type
+        WHEN 'hydrate_goal' THEN (
+            SELECT COALESCE(MAX(consumed_water), 0)::INT FROM hydrate_logs
+            WHERE user_id = p_user_id AND date = p_daily_start)
+        WHEN 'tasks_completed' THEN (
+            SELECT COUNT(*)::INT FROM sleep_logs
+            WHERE user_id = p_user_id AND date = p_daily_start AND completed)
+        WHEN 'log_meal' THEN (
+            SELECT COUNT(*)::INT FROM diet_logs
+            WHERE user_id = p_user_id AND date = p_daily_start
+              AND dishes IS NOT NULL AND dishes NOT IN ('[]'::jsonb, '{}'::jsonb))
+        WHEN 'focus_time' THEN (
+            SELECT COALESCE(SUM(focus_done), 0)::INT FROM focus_logs
+            WHERE user_id = p_user_id AND date = p_daily_start)
+        WHEN 'checkin' THEN (
+            SELECT COUNT(*)::INT FROM xp_rewards
+            WHERE user_id = p_user_id AND last_checkin_date = p_daily_start)
+        WHEN 'monthly_daily_quests' THEN (
+            SELECT COUNT(*)::INT FROM user_quest_progress
+            WHERE user_id = p_user_id AND claimed_at IS NOT NULL
+              AND period_start_date >= p_monthly_start
+              AND period_start_date < (p_monthly_start + INTERVAL '1 month')::DATE)
+    END;
+    IF source_value IS NULL THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT * FROM apply_quest_progress(p_user_id, p_trigger_type, p_daily_start, p_monthly_start, 0, source_value);
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,69 @@
+-- Phiên bản dữ liệu theo user, lưu ngay trong Postgres nên mọi worker đều thấy (src/utils/versions.py):
+-- data_version tăng sau mỗi câu lệnh ghi vào dữ liệu của user (log, quest, XP, tổng hợp ngày, profile, habit),
+-- là một phần của ETag (src/utils/etag.py).
+-- Trigger cấp câu lệnh tăng phiên bản, nên mọi đường ghi (API, tác vụ nền, rpc, cron, rollover) đều được tính.
+-- Không có khóa ngoại tới users: dòng của user đã xóa vô hại, và câu lệnh xóa user (ON DELETE CASCADE)
+-- không phải chờ bảng này.
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id UUID PRIMARY KEY,
+    data_version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Mỗi user tăng 1 lần cho mỗi câu lệnh, theo thứ tự user_id để 2 câu lệnh song song không deadlock.
+CREATE OR REPLACE FUNCTION bump_user_versions()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_versions AS v (user_id, data_version)
+        SELECT DISTINCT user_id, 1 FROM new_rows WHERE user_id IS NOT NULL ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET data_version = v.data_version + 1;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO user_versions AS v (user_id, data_version)
+        SELECT changed.user_id, 1
+        FROM (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows) changed
+        WHERE changed.user_id IS NOT NULL
+        ORDER BY changed.user_id
+        ON CONFLICT (user_id) DO UPDATE SET data_version = v.data_version + 1;
+    ELSE
+        INSERT INTO user_versions AS v (user_id, data_version)
+        SELECT DISTINCT user_id, 1 FROM old_rows WHERE user_id IS NOT NULL ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET data_version = v.data_version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bảng có transition table chỉ nhận trigger 1 sự kiện: mỗi bảng 3 trigger (insert, update, delete)
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES
+        ('sleep_logs'),
+        ('hydrate_logs'),
+        ('diet_logs'),
+        ('focus_logs'),
+        ('user_quest_progress'),
+        ('xp_rewards'),
+        ('daily_summaries'),
+        ('profiles'),
+        ('sleep_habits'),
+        ('hydrate_habits'),
+        ('diet_habits'),
+        ('focus_habits')
+    ) AS versioned(table_name)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t.table_name || '_versions_insert', t.table_name);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION bump_user_versions()',
+                       t.table_name || '_versions_insert', t.table_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t.table_name || '_versions_update', t.table_name);
+        EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION bump_user_versions()',
+                       t.table_name || '_versions_update', t.table_name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t.table_name || '_versions_delete', t.table_name);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION bump_user_versions()',
+                       t.table_name || '_versions_delete', t.table_name);
+    END LOOP;
+END $$;
@@ -0,0 +1,111 @@
+-- Rollover không làm mất tổng hợp ngày khi user đổi múi giờ. Trước đây RolloverService.run gọi
+-- rollup_pending_days cho checkpoint của múi giờ rồi mới xóa log của chunk: log của user vừa chuyển sang
+-- múi giờ này thuộc những ngày mà checkpoint của múi giờ đã đi qua (hoặc checkpoint của múi giờ cũ chưa
+-- tới), nên không được tổng hợp và bị xóa mất. Giờ purge_rollover_chunk tổng hợp đúng các log sắp xóa
+-- của chunk vào daily_summaries ngay trước khi xóa, trong cùng transaction.
+
+-- Tổng hợp mọi log trước p_before của các user p_user_ids, 1 dòng / user / ngày (upsert như
+-- rollup_daily_summaries, chạy lại cho cùng kết quả). Trả về số dòng đã ghi.
+CREATE OR REPLACE FUNCTION fold_daily_summaries(p_user_ids UUID[], p_before DATE)
+RETURNS INT AS $$
+DECLARE
+    folded INT := 0;
+    written INT;
+BEGIN
+    INSERT INTO daily_summaries (user_id, date, water_goal, consumed_water, hydrate_completed)
+    SELECT user_id, date, MAX(water_goal), SUM(consumed_water), bool_or(COALESCE(completed, FALSE))
+    FROM hydrate_logs
+    WHERE user_id = ANY(p_user_ids) AND date < p_before
+    GROUP BY user_id, date
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        water_goal = EXCLUDED.water_goal,
+        consumed_water = EXCLUDED.consumed_water,
+        hydrate_completed = EXCLUDED.hydrate_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, calories_goal, consumed_calories, meals, diet_completed)
+    SELECT user_id, date, MAX(calories_goal), SUM(consumed_calories), SUM(jsonb_array_length(dishes)),
+           bool_or(COALESCE(completed, FALSE))
+    FROM diet_logs
+    WHERE user_id = ANY(p_user_ids) AND date < p_before
+    GROUP BY user_id, date
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        calories_goal = EXCLUDED.calories_goal,
+        consumed_calories = EXCLUDED.consumed_calories,
+        meals = EXCLUDED.meals,
+        diet_completed = EXCLUDED.diet_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, sleep_tasks, sleep_tasks_completed)
+    SELECT user_id, date, COUNT(*), COUNT(*) FILTER (WHERE completed)
+    FROM sleep_logs
+    WHERE user_id = ANY(p_user_ids) AND date < p_before
+    GROUP BY user_id, date
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        sleep_tasks = EXCLUDED.sleep_tasks,
+        sleep_tasks_completed = EXCLUDED.sleep_tasks_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    INSERT INTO daily_summaries (user_id, date, focus_done, focus_completed)
+    SELECT user_id, date, SUM(focus_done), bool_or(COALESCE(completed, FALSE))
+    FROM focus_logs
+    WHERE user_id = ANY(p_user_ids) AND date < p_before
+    GROUP BY user_id, date
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        focus_done = EXCLUDED.focus_done,
+        focus_completed = EXCLUDED.focus_completed,
+        updated_at = now();
+    GET DIAGNOSTICS written = ROW_COUNT;
+    folded := folded + written;
+
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Như 017, thêm bước tổng hợp trước khi xóa. Trả về số dòng đã xóa.
+CREATE OR REPLACE FUNCTION purge_rollover_chunk(
+    p_time_zone TEXT,
+    p_after UUID,
+    p_last UUID,
+    p_today DATE,
+    p_month_start DATE
+)
+RETURNS INT AS $$
+DECLARE
+    chunk_users UUID[] := ARRAY(
+        SELECT user_id FROM profiles
+        WHERE time_zone = p_time_zone
+          AND (p_after IS NULL OR user_id > p_after)
+          AND user_id <= p_last
+    );
+    purged INT := 0;
+    deleted INT;
+BEGIN
+    PERFORM fold_daily_summaries(chunk_users, p_today);
+
+    DELETE FROM hydrate_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM diet_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM focus_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM sleep_logs WHERE user_id = ANY(chunk_users) AND date < p_today;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+    DELETE FROM user_quest_progress
+    WHERE user_id = ANY(chunk_users) AND period_start_date < p_month_start;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    purged := purged + deleted;
+
+    RETURN purged;
+END;
+$$ LANGUAGE plpgsql;
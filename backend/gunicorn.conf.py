@@ -0,0 +1,59 @@
+# Cấu hình gunicorn cho production: gunicorn -c gunicorn.conf.py wsgi:app
+# Mọi giá trị đều đọc từ biến môi trường (WEB_*), mặc định phù hợp cho 1 container.
+import os
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Pre-fork: mỗi worker là 1 process, mỗi process có WEB_THREADS thread (phần lớn thời gian là chờ Supabase)
+workers = _env_int("WEB_WORKERS", min((os.cpu_count() or 1) * 2 + 1, 8))
+# App đọc số worker thực tế để chia các tài nguyên của cả máy (vd. pool bcrypt, src/utils/config.py)
+os.environ["WEB_WORKERS"] = str(workers)
+worker_class = os.getenv("WEB_WORKER_CLASS", "gthread")
+threads = _env_int("WEB_THREADS", 4)
+# App ASGI (asgi.py): WEB_WORKER_CLASS=uvicorn_worker.UvicornWorker và chạy asgi:app thay cho wsgi:app.
+# Mỗi worker là 1 event loop; WEB_THREADS là số thread chạy các endpoint Flask còn lại.
+
+# Load app 1 lần trong master rồi fork (khởi động nhanh, chia sẻ bộ nhớ copy-on-write).
+# Cache, hàng đợi nền và pool bcrypt được tạo lười trong từng worker nên không bị chia sẻ qua fork.
+preload_app = True
+
+# Tái tạo worker sau WEB_MAX_REQUESTS request (jitter để các worker không restart cùng lúc)
+# hoặc khi bộ nhớ vượt WEB_MAX_WORKER_MEMORY_MB (0 = tắt)
+max_requests = _env_int("WEB_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("WEB_MAX_REQUESTS_JITTER", 200)
+max_worker_memory_mb = _env_int("WEB_MAX_WORKER_MEMORY_MB", 512)
+
+# Tắt êm: worker có WEB_GRACEFUL_TIMEOUT giây để xong request đang chạy và xử lý hàng đợi nền
+timeout = _env_int("WEB_TIMEOUT", 60)
+graceful_timeout = _env_int("WEB_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("WEB_KEEPALIVE", 5)
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-") or None  # "" = tắt access log
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+
+def _rss_mb():
+    """Bộ nhớ đang dùng (RSS) của process hiện tại, tính bằng MB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Peak RSS (KB trên Linux)
+
+
+def post_request(worker, req, environ, resp):
+    # Chỉ được gọi với worker sync/gthread; worker uvicorn vẫn được tái tạo theo WEB_MAX_REQUESTS
+    if max_worker_memory_mb and _rss_mb() > max_worker_memory_mb:
+        worker.log.info("Worker %s uses %.0f MB (> %s MB), restarting", worker.pid, _rss_mb(), max_worker_memory_mb)
+        worker.alive = False  # Xong request hiện tại thì thoát, master tạo worker mới
+
+
+def worker_exit(server, worker):
+    # Chạy nốt các tác vụ nền đã nhận (phần chưa xong nằm lại trong spool và được chạy lại)
+    from src.utils import task_queue
+    task_queue.drain()
@@ -0,0 +1,41 @@
+"""Rollover hằng ngày: xóa log cũ (và tạo trước log, quest progress của ngày mới nếu ROLLOVER_PRECREATE_LOGS).
+
+Mỗi múi giờ của user được rollover lúc 00:00 giờ địa phương của nó: chạy --due định kỳ, vd. crontab của host:
+    */15 * * * * docker compose run --rm backend python rollover.py --due
+Chạy lại sau khi bị dừng giữa chừng sẽ tiếp tục từ chunk chưa xong (xem RolloverService).
+
+Usage (from backend/):
+    python rollover.py --due [--chunk-size 500] [--parallelism 4]
+    python rollover.py [--zone Asia/Ho_Chi_Minh] [--day 2025-05-01] [--chunk-size 500] [--parallelism 4] [--restart]
+"""
+import argparse
+import sys
+from datetime import date
+
+from src.services import rollover_service
+from src.utils import ServiceError
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--due", action="store_true", help="mọi múi giờ đã qua nửa đêm mà hôm nay chưa rollover")
+    parser.add_argument("--zone", help="múi giờ cần rollover (mặc định DEFAULT_TIME_ZONE)")
+    parser.add_argument("--day", type=date.fromisoformat, help="ngày cần rollover (mặc định hôm nay ở múi giờ đó)")
+    parser.add_argument("--chunk-size", type=int, help="số user mỗi chunk (ROLLOVER_CHUNK_SIZE)")
+    parser.add_argument("--parallelism", type=int, help="số chunk chạy song song (ROLLOVER_PARALLELISM)")
+    parser.add_argument("--restart", action="store_true", help="làm lại từ đầu thay vì tiếp tục từ checkpoint")
+    args = parser.parse_args()
+    if args.due and (args.zone or args.day or args.restart):
+        parser.error("--due cannot be combined with --zone, --day or --restart")
+    try:
+        if args.due:
+            rollover_service.run_due(args.chunk_size, args.parallelism)
+        else:
+            rollover_service.run(args.day, args.chunk_size, args.parallelism, args.restart, time_zone=args.zone)
+    except ServiceError as e:
+        print(f"Rollover failed: {e.message}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
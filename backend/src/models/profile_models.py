@@ -1,11 +1,22 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from typing import Optional
+
+def check_time_zone(value: Optional[str]) -> Optional[str]:
+    """None (giữ nguyên / múi giờ mặc định) hoặc tên múi giờ IANA, vd. "Asia/Ho_Chi_Minh" """
+    from ..utils.timezones import is_valid_time_zone  # import muộn: utils.security import models
+    if value is not None and not is_valid_time_zone(value):
+        raise ValueError("Unknown time zone")
+    return value
+
 class ProfileBase(BaseModel):
     username: Optional[str] = Field(default="Human", min_length=3, max_length=50)
     gender: Optional[str] = Field(default="female", pattern="^(male|female)$")
     weight: Optional[float] = Field(default=50, gt=0)
     height: Optional[float] = Field(default=160, gt=0)
     age: Optional[int] = Field(default=20, ge=1, le=100)
+    time_zone: Optional[str] = None  # "hôm nay" và rollover của user tính theo múi giờ này
+
+    _valid_time_zone = field_validator("time_zone")(check_time_zone)
 
 class ProfileCreate(ProfileBase):
     user_id: Optional[str] = None # uuid.UUID
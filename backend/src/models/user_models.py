@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field, ConfigDict # pydantic: data validation, transformation, serialization
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator # pydantic: data validation, transformation, serialization
 from typing import Optional
 from datetime import datetime
+from .profile_models import check_time_zone
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -9,6 +10,9 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     id: Optional[str] = None
     password: str  # Hash password trước khi lưu
+    time_zone: Optional[str] = None  # Múi giờ của profile, không có thì dùng DEFAULT_TIME_ZONE
+
+    _valid_time_zone = field_validator("time_zone")(check_time_zone)
 class UserResponse(UserBase):
     id: str # uuid.UUID
     reset_token: Optional[str] = None
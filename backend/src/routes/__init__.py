@@ -7,5 +7,7 @@ from .diet_routes import diet_bp
 from .xp_reward_routes import xp_bp
 from .quest_routes import quest_bp
 from .focus_routes import focus_bp
+from .dashboard_routes import dashboard_bp
+from .history_routes import history_bp
 
-__all__ = ["health_bp", "auth_bp", "profile_bp", "sleep_bp", "hydrate_bp", "diet_bp", "xp_bp", "quest_bp", "focus_bp"]
\ No newline at end of file
+__all__ = ["health_bp", "auth_bp", "profile_bp", "sleep_bp", "hydrate_bp", "diet_bp", "xp_bp", "quest_bp", "focus_bp", "dashboard_bp", "history_bp"]
\ No newline at end of file
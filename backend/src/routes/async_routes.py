@@ -0,0 +1,202 @@
+"""Quart routes của app ASGI (asgi.py), dùng các service trong services/async_services.py.
+
+Cùng URL, cùng định dạng response và lỗi với các route Flask tương ứng; các endpoint không có ở
+đây vẫn do app Flask xử lý.
+"""
+from functools import wraps
+import flask_jwt_extended
+from flask_jwt_extended.exceptions import InvalidHeaderError, NoAuthorizationError, WrongTokenError
+from quart import Blueprint, Response, current_app, jsonify, make_response, request, g
+from ..services.async_services import (async_hydrate_service, async_diet_service, async_focus_service,
+                                       async_sleep_service, async_xp_reward_service, async_quest_service,
+                                       async_dashboard_service, user_today)
+from ..utils import ServiceError, DEBUG, user_versions, encoded, arun
+from ..utils.etag import make_etag, PRIVATE_REVALIDATE
+
+def jwt_required(fn):
+    """Như flask_jwt_extended.jwt_required() của app Flask (create_async_app(flask_app)): giải mã token bằng
+    decode_token trong app context của app Flask nên cùng cấu hình JWT, cùng callback và cùng response lỗi.
+    User id lấy bằng get_jwt_identity()"""
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        flask_app = current_app.config["FLASK_APP"]
+        with flask_app.app_context():
+            try:
+                g.jwt_identity = _decode_identity(flask_app.config)
+            except Exception as e:
+                # Lỗi token (thiếu, hết hạn, sai chữ ký, refresh token, ...) do error handler của JWTManager trả lời
+                handler = flask_app._find_error_handler(e, [])
+                if handler is None:
+                    raise
+                error_response = flask_app.make_response(handler(e))
+                return Response(error_response.get_data(), status=error_response.status_code,
+                                content_type=error_response.content_type)
+        return await fn(*args, **kwargs)
+    return wrapper
+
+def _decode_identity(config):
+    """User id trong access token của header Authorization, kiểm tra như verify_jwt_in_request()"""
+    header_name, header_type = config["JWT_HEADER_NAME"], config["JWT_HEADER_TYPE"]
+    auth_header = request.headers.get(header_name, "").strip()
+    if not auth_header:
+        raise NoAuthorizationError(f"Missing {header_name} Header")
+    parts = auth_header.split()
+    if parts[0] != header_type:
+        raise NoAuthorizationError(f"Missing '{header_type}' type in '{header_name}' header. "
+                                   f"Expected '{header_name}: {header_type} <JWT>'")
+    if len(parts) != 2:
+        raise InvalidHeaderError(f"Bad {header_name} header. Expected '{header_name}: {header_type} <JWT>'")
+    decoded = flask_jwt_extended.decode_token(parts[1])
+    if decoded.get("type") == "refresh":
+        raise WrongTokenError("Only non-refresh tokens are allowed")
+    return decoded[config["JWT_IDENTITY_CLAIM"]]
+
+def get_jwt_identity():
+    return g.jwt_identity
+
+async def _quest_definitions_version():
+    return await async_quest_service.definitions_version()
+
+def conditional_get(extra=None, versioned=True):
+    """Như utils.etag.conditional_get của route Flask: cùng ETag (phiên bản dữ liệu của user) và 304.
+    ``extra`` là coroutine function trả về dấu phiên bản của dữ liệu chung (định nghĩa quest);
+    ``versioned=False``: ETag là hash của body, không đọc phiên bản (view đọc từ cache)"""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version = await arun(user_versions.data_version_flow(async_quest_service.client, user_id)) \
+                if versioned else None
+            etag = None
+            if version is not None:
+                marker = await extra() if extra else ""
+                today = await user_today(user_id)
+                etag = make_etag(user_id, version, today, request.full_path, f"{request.headers.get('Accept', '')}|{marker}")
+                if etag in request.if_none_match:
+                    return _cacheable(current_app.response_class("", status=304), etag)
+
+            response = await make_response(await fn(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if etag is None:
+                await response.add_etag()
+                response = await response.make_conditional(request)
+                return _cacheable(response)
+            return _cacheable(response, etag)
+        return wrapper
+    return decorator
+
+def _cacheable(response, etag=None):
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = PRIVATE_REVALIDATE
+    response.vary.update(("Authorization", "Accept"))
+    return response
+
+def respond(payload, status=200):
+    """Như utils.respond của route Flask: JSON (hoặc MessagePack theo Accept), model pydantic ghi thẳng ra bytes"""
+    body, mimetype = encoded(payload, request.accept_mimetypes)
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
+
+async def _respond(coro):
+    """Chạy service và trả response giống các route sync"""
+    try:
+        return respond(await coro)
+    except ServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": str(e) if DEBUG else "Internal server error"}), 500
+
+health_bp = Blueprint("async_health", __name__)
+
+@health_bp.route("", methods=["GET"])
+async def health_check():
+    return jsonify({"status": "ok"}), 200
+
+def _habit_blueprint(domain, service):
+    """GET /habit và GET /logs/today của 1 domain"""
+    bp = Blueprint(f"async_{domain}", __name__)
+
+    @bp.route("/habit", methods=["GET"])
+    @jwt_required
+    @conditional_get(versioned=False)  # habit đọc từ habit_cache: không tốn truy vấn nào khi trúng cache
+    async def get_habit():
+        return await _respond(service.get_habit(get_jwt_identity()))
+
+    @bp.route("/logs/today", methods=["GET"])
+    @jwt_required
+    @conditional_get()
+    async def get_logs_today():
+        return await _respond(service.get_logs_today(get_jwt_identity()))
+
+    return bp
+
+hydrate_bp = _habit_blueprint("hydrate", async_hydrate_service)
+diet_bp = _habit_blueprint("diet", async_diet_service)
+focus_bp = _habit_blueprint("focus", async_focus_service)
+sleep_bp = _habit_blueprint("sleep", async_sleep_service)
+
+@hydrate_bp.route("/logs/<log_id>/update", methods=["PUT"])
+@jwt_required
+async def update_hydrate_log(log_id):
+    """Cập nhật lượng nước đã uống bằng cách tăng thêm cup_size"""
+    return await _respond(async_hydrate_service.update_log(get_jwt_identity(), log_id))
+
+@diet_bp.route("/logs/<log_id>/update", methods=["PUT"])
+@jwt_required
+async def update_diet_log(log_id):
+    """Cập nhật nhật ký ăn uống bằng cách thêm món ăn"""
+    data = await request.get_json()
+    return await _respond(async_diet_service.update_log(get_jwt_identity(), log_id, data))
+
+@focus_bp.route("/logs/<log_id>/update", methods=["PUT"])
+@jwt_required
+async def update_focus_log(log_id):
+    data = await request.get_json()
+    minutes = data.get("minutes")
+
+    if minutes is None or not isinstance(minutes, int) or minutes <= 0:
+        return jsonify({"error": "Invalid minutes"}), 400
+
+    return await _respond(async_focus_service.update_log(get_jwt_identity(), log_id, minutes))
+
+@sleep_bp.route("/logs/<log_id>/complete", methods=["PUT"])
+@jwt_required
+async def complete_sleep_log(log_id):
+    return await _respond(async_sleep_service.update_log(get_jwt_identity(), log_id))
+
+xp_bp = Blueprint("async_xp", __name__)
+
+@xp_bp.route("", methods=["GET"])
+@jwt_required
+@conditional_get()
+async def get_xp_rewards():
+    return await _respond(async_xp_reward_service.get_rewards(get_jwt_identity()))
+
+quest_bp = Blueprint("async_quest", __name__)
+
+@quest_bp.route("", methods=["GET"])
+@jwt_required
+@conditional_get(extra=_quest_definitions_version)
+async def get_quests():
+    """Get all active quests with user's current progress."""
+    user_id = get_jwt_identity()
+    try:
+        quests_with_progress = await async_quest_service.get_quests_with_progress(user_id)
+        return respond(quests_with_progress)
+    except ServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        error_message = str(e) if DEBUG else "Internal server error"
+        print(f"Error in GET /quests: {e}")
+        return jsonify({"error": error_message}), 500
+
+dashboard_bp = Blueprint("async_dashboard", __name__)
+
+@dashboard_bp.route("/today", methods=["GET"])
+@jwt_required
+async def get_dashboard_today():
+    """Toàn bộ dữ liệu màn hình chính trong 1 request"""
+    return await _respond(async_dashboard_service.get_today(get_jwt_identity()))
@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..services import dashboard_service
+from ..utils import ServiceError, DEBUG, respond
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+@dashboard_bp.route("/today", methods=["GET"])
+@jwt_required()
+def get_dashboard_today():
+    """Lấy toàn bộ dữ liệu màn hình chính hôm nay trong 1 request"""
+    user_id = get_jwt_identity()
+    try:
+        data = dashboard_service.get_today(user_id)
+        return respond(data)
+    except ServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": str(e) if DEBUG else "Internal server error"}), 500
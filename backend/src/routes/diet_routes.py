@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import diet_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, conditional_get, respond
 from pydantic import ValidationError
 
 diet_bp = Blueprint("diet", __name__)
@@ -15,7 +15,7 @@ def set_diet_habit():
 
     try:
         diet_habit = diet_service.set_diet_habit(user_id, data)
-        return jsonify(diet_habit), 200
+        return respond(diet_habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except ValidationError:
@@ -25,13 +25,14 @@ def set_diet_habit():
 
 @diet_bp.route("/habit", methods=["GET"])
 @jwt_required()
+@conditional_get(versioned=False)  # habit đọc từ habit_cache: không tốn truy vấn nào khi trúng cache
 def get_diet_habit():
     """Lấy thông tin Diet Habit của người dùng"""
     user_id = get_jwt_identity()
 
     try:
         diet_habit = diet_service.get_diet_habit(user_id)
-        return jsonify(diet_habit), 200
+        return respond(diet_habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -39,12 +40,13 @@ def get_diet_habit():
 
 @diet_bp.route("/logs/today", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_today_diet_logs():
     """Lấy Diet Logs hôm nay"""
     user_id = get_jwt_identity()
     try:
         logs = diet_service.get_diet_logs_today(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -52,12 +54,13 @@ def get_today_diet_logs():
 
 @diet_bp.route("/logs/week", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_week_diet_logs():
     """Lấy Diet Logs từ thứ 2 đến hôm nay"""
     user_id = get_jwt_identity()
     try:
         logs = diet_service.get_diet_logs_week(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -72,7 +75,7 @@ def update_diet_log(log_id):
 
     try:
         updated_log = diet_service.update_diet_log(user_id, log_id, data)
-        return jsonify(updated_log), 200
+        return respond(updated_log)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import focus_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, conditional_get, respond
 
 focus_bp = Blueprint("focus", __name__)
 
@@ -12,7 +12,7 @@ def set_focus_habit():
     data = request.get_json()
     try:
         habit = focus_service.set_focus_habit(user_id, data)
-        return jsonify(habit), 200
+        return respond(habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -20,11 +20,12 @@ def set_focus_habit():
 
 @focus_bp.route("/habit", methods=["GET"])
 @jwt_required()
+@conditional_get(versioned=False)  # habit đọc từ habit_cache: không tốn truy vấn nào khi trúng cache
 def get_focus_habit():
     user_id = get_jwt_identity()
     try:
         habit = focus_service.get_focus_habit(user_id)
-        return jsonify(habit), 200
+        return respond(habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -32,11 +33,12 @@ def get_focus_habit():
 
 @focus_bp.route("/logs/today", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_focus_logs_today():
     user_id = get_jwt_identity()
     try:
         logs = focus_service.get_focus_logs_today(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -54,7 +56,7 @@ def update_focus_log(log_id):
 
     try:
         updated_log = focus_service.update_focus_log(user_id, log_id, minutes)
-        return jsonify(updated_log), 200
+        return respond(updated_log)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
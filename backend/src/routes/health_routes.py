@@ -1,5 +1,5 @@
-from flask import Blueprint, jsonify
-from ..utils import supabase
+from flask import Blueprint, Response, jsonify
+from ..utils import supabase, admin_required, admin_or_metrics_token_required, all_cache_stats, task_queue, pool_stats, io_stats, metrics
 
 health_bp = Blueprint("health", __name__)
 
@@ -15,3 +15,27 @@ def health_supabase_check():
     except Exception as e:
         return jsonify({"status": "error", "db": "disconnected", "error": str(e)}), 500
 
+@health_bp.route("/cache", methods=["GET"])
+@admin_required
+def health_cache_stats():
+    """Kích thước, hit/miss và số lần evict của các cache trong worker này"""
+    return jsonify({"caches": all_cache_stats()}), 200
+
+@health_bp.route("/pool", methods=["GET"])
+@admin_required
+def health_pool_stats():
+    """Số kết nối (đang dùng/rảnh), request đang chờ kết nối và số lần hết chờ của connection pool Supabase,
+    cùng số nguồn đọc song song đã quá hạn mà vẫn giữ thread (worker này)"""
+    return jsonify({"pools": pool_stats(), "io": io_stats()}), 200
+
+@health_bp.route("/tasks", methods=["GET"])
+@admin_required
+def health_tasks():
+    """Độ sâu hàng đợi, độ trễ và số tác vụ còn trong spool của hàng đợi chạy nền (worker này)"""
+    return jsonify(task_queue.stats()), 200
+
+@health_bp.route("/metrics", methods=["GET"])
+@admin_or_metrics_token_required
+def health_metrics():
+    """Số request, độ trễ theo route và số lần gọi, độ trễ theo bảng của worker này (định dạng Prometheus)"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..services import history_service
+from ..utils import ServiceError, DEBUG, conditional_get, respond
+
+history_bp = Blueprint("history", __name__)
+
+@history_bp.route("/stats", methods=["GET"])
+@jwt_required()
+@conditional_get()
+def get_history_stats():
+    """Thống kê hydrate/diet/sleep/focus theo khoảng ngày, từ bảng tổng hợp ngày
+
+    Query: from, to (YYYY-MM-DD, mặc định thứ 2 tuần này -> hôm nay)"""
+    user_id = get_jwt_identity()
+    try:
+        stats = history_service.get_stats(user_id, date_from=request.args.get("from"), date_to=request.args.get("to"))
+        return respond(stats)
+    except ServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": str(e) if DEBUG else "Internal server error"}), 500
+
+@history_bp.route("/<domain>", methods=["GET"])
+@jwt_required()
+@conditional_get()
+def get_history(domain):
+    """Lấy log của hydrate/diet/sleep/focus (hoặc tổng hợp ngày: summary) theo khoảng ngày
+
+    Query: from, to (YYYY-MM-DD, mặc định thứ 2 tuần này -> hôm nay), fields (vd. date,consumed_water),
+    limit (số dòng mỗi trang), cursor (next_cursor của trang trước)"""
+    user_id = get_jwt_identity()
+    try:
+        page = history_service.get_history(
+            user_id,
+            domain,
+            date_from=request.args.get("from"),
+            date_to=request.args.get("to"),
+            fields=request.args.get("fields"),
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit"),
+        )
+        return respond(page)
+    except ServiceError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        return jsonify({"error": str(e) if DEBUG else "Internal server error"}), 500
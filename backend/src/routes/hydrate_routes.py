@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import hydrate_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, conditional_get, respond
 from pydantic import ValidationError
 
 hydrate_bp = Blueprint("hydrate", __name__)
@@ -15,7 +15,7 @@ def set_hydrate_habit():
 
     try:
         hydrate_habit = hydrate_service.set_hydrate_habit(user_id, data)
-        return jsonify(hydrate_habit), 200
+        return respond(hydrate_habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except ValidationError:
@@ -25,13 +25,14 @@ def set_hydrate_habit():
 
 @hydrate_bp.route("/habit", methods=["GET"])
 @jwt_required()
+@conditional_get(versioned=False)  # habit đọc từ habit_cache: không tốn truy vấn nào khi trúng cache
 def get_hydrate_habit():
     """Lấy thông tin Hydrate Habit của người dùng"""
     user_id = get_jwt_identity()
     
     try:
         hydrate_habit = hydrate_service.get_hydrate_habit(user_id)
-        return jsonify(hydrate_habit), 200
+        return respond(hydrate_habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -39,12 +40,13 @@ def get_hydrate_habit():
 
 @hydrate_bp.route("/logs/today", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_today_hydrate_logs():
     """Lấy Hydrate Logs hôm nay"""
     user_id = get_jwt_identity()
     try:
         logs = hydrate_service.get_hydrate_logs_today(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -52,12 +54,13 @@ def get_today_hydrate_logs():
 
 @hydrate_bp.route("/logs/week", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_week_hydrate_logs():
     """Lấy Hydrate Logs từ thứ 2 đến hôm nay"""
     user_id = get_jwt_identity()
     try:
         logs = hydrate_service.get_hydrate_logs_week(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -71,7 +74,7 @@ def update_hydrate_log(log_id):
 
     try:
         updated_log = hydrate_service.update_hydrate_log(user_id, log_id)
-        return jsonify(updated_log), 200
+        return respond(updated_log)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
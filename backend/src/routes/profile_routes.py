@@ -2,20 +2,21 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import ProfileBase
 from ..services import profile_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, conditional_get, respond
 from pydantic import ValidationError
 
 profile_bp = Blueprint("profile", __name__)
 
 @profile_bp.route("", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_profile():
     """Lấy thông tin profile của user"""
     user_id = get_jwt_identity()  # Lấy user_id từ token
 
     try:
         profile = profile_service.get_user_profile(user_id)
-        return jsonify(profile), 200
+        return respond(profile)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -32,7 +33,7 @@ def update_profile():
     try:
         user_data = ProfileBase(**data)
         updated_profile = profile_service.update_user_profile(user_id, user_data)
-        return jsonify(updated_profile), 200
+        return respond(updated_profile)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except ValidationError as e:
@@ -1,23 +1,23 @@
 # routes/quest_routes.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 # Removed UUID import
 from ..services import quest_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, QUEST_CACHE_TTL, admin_required, conditional_get, respond
 from ..models import QuestWithProgressResponse
 
 quest_bp = Blueprint("quest", __name__)
 
 @quest_bp.route("", methods=["GET"])
 @jwt_required()
+@conditional_get(extra=quest_service.definitions_version)
 def get_quests():
     """Get all active quests with user's current progress."""
     user_id = get_jwt_identity() # Keep as string from token
     try:
         # Pass string ID directly to service
         quests_with_progress = quest_service.get_quests_with_progress(user_id)
-        response_data = [q.model_dump(mode='json') for q in quests_with_progress]
-        return jsonify(response_data), 200
+        return respond(quests_with_progress)
     # Removed ValueError catch for UUID
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
@@ -26,6 +26,21 @@ def get_quests():
         print(f"Error in GET /quests: {e}")
         return jsonify({"error": error_message}), 500
 
+@quest_bp.route("/definitions", methods=["GET"])
+@jwt_required()
+def get_quest_definitions():
+    """Định nghĩa các quest đang hoạt động, không kèm tiến độ. Giống nhau cho mọi user và hiếm khi sửa,
+    nên client và cache dùng chung được giữ trong QUEST_CACHE_TTL giây"""
+    try:
+        response = respond(quest_service.get_active_quests())
+        response.set_etag(quest_service.definitions_version())
+        response.headers["Cache-Control"] = f"public, max-age={int(QUEST_CACHE_TTL)}"
+        return response.make_conditional(request)
+    except Exception as e:
+        error_message = str(e) if DEBUG else "Internal server error"
+        print(f"Error in GET /quests/definitions: {e}")
+        return jsonify({"error": error_message}), 500
+
 # Route parameter quest_id is now treated as string by default
 @quest_bp.route("/<quest_id>/claim", methods=["POST"])
 @jwt_required()
@@ -35,14 +50,28 @@ def claim_quest(quest_id: str): # Accept string
     try:
         # Pass string IDs directly to service
         updated_rewards = quest_service.claim_quest_reward(user_id, quest_id)
-        return jsonify({
+        return respond({
             "message": "Reward claimed successfully!",
-            "rewards": updated_rewards.model_dump(mode='json')
-            }), 200
+            "rewards": updated_rewards
+            })
     # Removed ValueError catch for UUID
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
         error_message = str(e) if DEBUG else "Internal server error"
         print(f"Error in POST /quests/{quest_id}/claim: {e}")
-        return jsonify({"error": error_message}), 500
\ No newline at end of file
+        return jsonify({"error": error_message}), 500
+
+@quest_bp.route("/cache", methods=["GET"])
+@admin_required
+def get_quest_cache_stats():
+    """Số lần trúng/trượt cache định nghĩa quest (chỉ admin)"""
+    return jsonify(quest_service.quest_cache.stats()), 200
+
+@quest_bp.route("/cache/invalidate", methods=["POST"])
+@admin_required
+def invalidate_quest_cache():
+    """Xóa cache định nghĩa quest sau khi sửa bảng quests (chỉ admin).
+    Chỉ xóa ở worker xử lý request này; worker khác thấy thay đổi sau tối đa QUEST_CACHE_TTL giây"""
+    quest_service.invalidate_quest_cache()
+    return jsonify({"message": "Quest cache invalidated", "cache": quest_service.quest_cache.stats()}), 200
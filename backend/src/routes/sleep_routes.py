@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import sleep_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, conditional_get, respond
 from pydantic import ValidationError
 from ..services import xp_reward_service
 
@@ -16,7 +16,7 @@ def set_sleep_habit():
 
     try:
         sleep_habit = sleep_service.set_sleep_habit(user_id, data)
-        return jsonify(sleep_habit), 200
+        return respond(sleep_habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except ValidationError:
@@ -26,13 +26,14 @@ def set_sleep_habit():
 
 @sleep_bp.route("/habit", methods=["GET"])
 @jwt_required()
+@conditional_get(versioned=False)  # habit đọc từ habit_cache: không tốn truy vấn nào khi trúng cache
 def get_sleep_habit():
     """Lấy thông tin Sleep Habit"""
     user_id = get_jwt_identity()
     
     try:
         sleep_habit = sleep_service.get_sleep_habit(user_id)
-        return jsonify(sleep_habit), 200
+        return respond(sleep_habit)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -40,12 +41,13 @@ def get_sleep_habit():
 
 @sleep_bp.route("/logs/today", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_today_sleep_logs():
     """Lấy Sleep Logs hôm nay"""
     user_id = get_jwt_identity()
     try:
         logs = sleep_service.get_sleep_logs_today(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -53,12 +55,13 @@ def get_today_sleep_logs():
 
 @sleep_bp.route("/logs/week", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_week_sleep_logs():
     """Lấy Sleep Logs từ thứ 2 đến hôm nay"""
     user_id = get_jwt_identity()
     try:
         logs = sleep_service.get_sleep_logs_week(user_id)
-        return jsonify(logs), 200
+        return respond(logs)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -72,7 +75,7 @@ def update_sleep_log_completion(log_id):
 
     try:
         updated_log = sleep_service.update_sleep_log_completion(user_id, log_id)
-        return jsonify(updated_log), 200
+        return respond(updated_log)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -1,17 +1,18 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import xp_reward_service
-from ..utils import ServiceError, DEBUG
+from ..utils import ServiceError, DEBUG, conditional_get, respond
 
 xp_bp = Blueprint("xp", __name__)
 
 @xp_bp.route("", methods=["GET"])
 @jwt_required()
+@conditional_get()
 def get_xp_rewards():
     user_id = get_jwt_identity()
     try:
         data = xp_reward_service.get_rewards(user_id)
-        return jsonify(data), 200
+        return respond(data)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -23,7 +24,7 @@ def daily_checkin():
     user_id = get_jwt_identity()
     try:
         updated = xp_reward_service.update_checkin(user_id)
-        return jsonify(updated), 200
+        return respond(updated)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -35,7 +36,7 @@ def update_streak():
     user_id = get_jwt_identity()
     try:
         updated = xp_reward_service.update_streak(user_id)
-        return jsonify(updated), 200
+        return respond(updated)
     except ServiceError as e:
         return jsonify({"error": e.message}), e.status_code
     except Exception as e:
@@ -6,5 +6,8 @@ from .diet_services import diet_service
 from .xp_reward_services import xp_reward_service
 from .quest_services import quest_service
 from .focus_services import focus_service
+from .dashboard_services import dashboard_service
+from .history_services import history_service
+from .rollover_services import rollover_service
 
-__all__ = ["auth_service", "profile_service", "sleep_service", "hydrate_service", "diet_service", "xp_reward_service", "quest_service", "focus_service"]
\ No newline at end of file
+__all__ = ["auth_service", "profile_service", "sleep_service", "hydrate_service", "diet_service", "xp_reward_service", "quest_service", "focus_service", "dashboard_service", "history_service", "rollover_service"]
\ No newline at end of file
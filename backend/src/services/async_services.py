@@ -0,0 +1,76 @@
+"""Phiên bản async của các đường request nóng, trên client Supabase/PostgREST async.
+
+Dùng bởi app ASGI (asgi.py): đọc log hôm nay và habit, cập nhật log, xp rewards, quest kèm tiến độ
+và dashboard. Đây chỉ là lớp bọc mỏng: truy vấn và nghiệp vụ là các method *_flow của service sync,
+ở đây được chạy bằng utils.flow.arun, nên các truy vấn độc lập của 1 request chạy song song trên event
+loop thay vì thread. Service sync vẫn là phần cài đặt của mọi endpoint khác và của app WSGI.
+"""
+from datetime import date
+from ..utils import arun, user_today_flow
+from ..utils.config import supabase, SUPABASE_URL, SUPABASE_KEY, SUPABASE_POOL_SETTINGS
+from ..utils.data_backend import acreate_data_client
+from .hydrate_services import hydrate_service
+from .diet_services import diet_service
+from .focus_services import focus_service
+from .sleep_services import sleep_service
+from .xp_reward_services import xp_reward_service
+from .quest_services import quest_service
+from .dashboard_services import dashboard_service
+
+class _AsyncService:
+    def __init__(self, service):
+        self.service = service
+        self.client = None  # AsyncClient, gán bởi init_async_services()
+
+class AsyncHabitService(_AsyncService):
+    """Habit và log hôm nay của 1 domain (hydrate, diet, focus, sleep)"""
+
+    async def get_habit(self, user_id):
+        return await arun(self.service.habit_flow(self.client, user_id))
+
+    async def get_logs_today(self, user_id):
+        return await arun(self.service.logs_today_flow(self.client, user_id))
+
+    async def update_log(self, user_id, log_id, *args):
+        return await arun(self.service.update_log_flow(self.client, user_id, log_id, *args))
+
+class AsyncXPRewardService(_AsyncService):
+    async def get_rewards(self, user_id):
+        return await arun(self.service.rewards_flow(self.client, user_id))
+
+class AsyncQuestService(_AsyncService):
+    async def get_quests_with_progress(self, user_id, live_data=None):
+        return await arun(self.service.quests_with_progress_flow(self.client, user_id, live_data))
+
+    async def definitions_version(self):
+        return await arun(self.service.definitions_version_flow(self.client))
+
+class AsyncDashboardService(_AsyncService):
+    async def get_today(self, user_id):
+        return await arun(self.service.today_flow(self.client, user_id))
+
+async_hydrate_service = AsyncHabitService(hydrate_service)
+async_diet_service = AsyncHabitService(diet_service)
+async_focus_service = AsyncHabitService(focus_service)
+async_sleep_service = AsyncHabitService(sleep_service)
+async_xp_reward_service = AsyncXPRewardService(xp_reward_service)
+async_quest_service = AsyncQuestService(quest_service)
+async_dashboard_service = AsyncDashboardService(dashboard_service)
+
+# Các service dùng AsyncClient
+ASYNC_CLIENT_SERVICES = [async_hydrate_service, async_diet_service, async_focus_service, async_sleep_service,
+                         async_xp_reward_service, async_quest_service, async_dashboard_service]
+
+async def user_today(user_id) -> date:
+    """Hôm nay theo múi giờ của user (dùng chung cache múi giờ với service sync)"""
+    return await arun(user_today_flow(async_quest_service.client, user_id))
+
+async def init_async_services(client=None):
+    """Tạo AsyncClient trong event loop của worker (gọi khi app ASGI khởi động).
+    Service đã có client (vd. stub của benchmark) được giữ nguyên."""
+    if all(service.client is not None for service in ASYNC_CLIENT_SERVICES):
+        return
+    client = client or await acreate_data_client(supabase, SUPABASE_URL, SUPABASE_KEY, SUPABASE_POOL_SETTINGS)
+    for service in ASYNC_CLIENT_SERVICES:
+        if service.client is None:
+            service.client = client
@@ -1,123 +1,51 @@
 import uuid
 from ..models import UserCreate, UserResponse, ProfileCreate
-from ..utils import supabase, hash_password, verify_password, generate_jwt, generate_salt, ServiceError, DEBUG
-from datetime import datetime, timezone, timedelta
+from ..utils import supabase, hash_password, verify_password, needs_rehash, generate_jwt, generate_salt, ServiceError, DEBUG, \
+    DEFAULT_TIME_ZONE, local_today
 
 class AuthService:
     def __init__(self):
         self.client = supabase
         
-    @staticmethod
-    def get_current_period_start(quest_type: str) -> str:
-        now_utc_plus7 = datetime.now(timezone.utc) + timedelta(hours=7)
-        if quest_type == "daily":
-            return now_utc_plus7.date().isoformat()
-        elif quest_type == "monthly":
-            return now_utc_plus7.replace(day=1).date().isoformat()
-        return now_utc_plus7.date().isoformat()
-
     def register_user(self, user_data: UserCreate):
         user_data.id = str(uuid.uuid4())
         salt = generate_salt()
         user_data.password = hash_password(user_data.password, salt)
 
-        today = datetime.now(timezone(timedelta(hours=7))).date()
+        time_zone = user_data.time_zone or DEFAULT_TIME_ZONE
+        today = local_today(time_zone)
 
         try:
-            # Tạo user
-            response = self.client.table("users").insert(user_data.model_dump()).execute()
-            if not response.data:
-                raise ServiceError("Database server error", 500)
-
-            # Tạo profile
-            profile_data = ProfileCreate(user_id=user_data.id)
-            response_profile = self.client.table("profiles").insert(profile_data.model_dump()).execute()
-            if not response_profile.data:
-                raise ServiceError("Database server error", 500)
-
-            # Tạo các habit mặc định
-            default_sleep = {
-                "user_id": user_data.id,
-                "sleep_time": "23:00:00",
-                "wakeup_time": "07:00:00"
-            }
-            default_hydrate = {
-                "user_id": user_data.id,
-                "water_goal": 2000.0,
-                "cup_size": 250.0,
-                "reminder_time": []
-            }
-            default_diet = {
-                "user_id": user_data.id,
-                "calories_goal": 2000.0,
-                "reminder_time": []
-            }
-            default_focus = {
-                "user_id": user_data.id,
-                "focus_goal": 60  # 1h
-            }
-
-            self.client.table("sleep_habits").insert(default_sleep).execute()
-            self.client.table("hydrate_habits").insert(default_hydrate).execute()
-            self.client.table("diet_habits").insert(default_diet).execute()
-            self.client.table("focus_habits").insert(default_focus).execute()
-
-            # Tạo các log tương ứng cho hôm nay
-            sleep_logs = [
-                {
-                    "user_id": user_data.id,
-                    "task_type": "sleep",
-                    "scheduled_time": f"{today}T23:00:00+07:00"
+            # Các habit mặc định, log của hôm nay được tạo từ chúng
+            default_habits = {
+                "sleep": {
+                    "sleep_time": "23:00:00",
+                    "wakeup_time": "07:00:00"
+                },
+                "hydrate": {
+                    "water_goal": 2000.0,
+                    "cup_size": 250.0,
+                    "reminder_time": []
+                },
+                "diet": {
+                    "calories_goal": 2000.0,
+                    "reminder_time": []
                 },
-                {
-                    "user_id": user_data.id,
-                    "task_type": "wakeup",
-                    "scheduled_time": f"{(today + timedelta(days=1))}T07:00:00+07:00"
+                "focus": {
+                    "focus_goal": 60  # 1h
                 }
-            ]
-            hydrate_log = {
-                "user_id": user_data.id,
-                "water_goal": 2000.0,
-                "cup_size": 250.0,
-                "consumed_water": 0.0,
-                "date": str(today),
-                "completed": False
-            }
-            diet_log = {
-                "user_id": user_data.id,
-                "calories_goal": 2000.0,
-                "dishes": [],
-                "consumed_calories": 0.0,
-                "date": str(today),
-                "completed": False
-            }
-            focus_log = {
-                "user_id": user_data.id,
-                "focus_done": 0,
-                "date": str(today),
-                "completed": False
             }
 
-            self.client.table("sleep_logs").insert(sleep_logs).execute()
-            self.client.table("hydrate_logs").insert(hydrate_log).execute()
-            self.client.table("diet_logs").insert(diet_log).execute()
-            self.client.table("focus_logs").insert(focus_log).execute()
-
-            # Tạo user_quest_progress mặc định
-            quests_response = self.client.table("quests").select("id, type").eq("is_active", True).execute()
-            if not quests_response.data:
-                raise ServiceError("No quests available", 500)
-
-            quest_progress_data = [
-                {
-                    "user_id": user_data.id,
-                    "quest_id": quest["id"],
-                    "period_start_date": AuthService.get_current_period_start(quest["type"]),
-                    "current_progress": 0
-                }
-                for quest in quests_response.data
-            ]
-            self.client.table("user_quest_progress").insert(quest_progress_data).execute()
+            # Tạo user, profile, habit, log hôm nay và user_quest_progress trong 1 transaction
+            # (xem database/012_provision_user.sql): 1 round trip, lỗi thì rollback toàn bộ
+            response = self.client.rpc("provision_user", {
+                "p_user": user_data.model_dump(exclude={"time_zone"}),
+                "p_profile": ProfileCreate(user_id=user_data.id, time_zone=time_zone).model_dump(exclude={"user_id"}),
+                "p_habits": default_habits,
+                "p_today": today.isoformat()
+            }).execute()
+            if not response.data:
+                raise ServiceError("Database server error", 500)
 
             return UserResponse(**response.data[0]).model_dump()
 
@@ -129,6 +57,8 @@ class AuthService:
                 raise ServiceError("User created successfully", 201)
             if "already exists" in error_message:
                 raise ServiceError("Email already registered", 409)
+            if "no quests available" in error_message:
+                raise ServiceError("No quests available", 500)
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
 
@@ -141,6 +71,9 @@ class AuthService:
             user_data = response.data       
             if not verify_password(password, user_data.get("password")):
                 raise ServiceError("Invalid email or password", 401)
+
+            if needs_rehash(user_data["password"]):
+                self._rehash_password(user_data["id"], password, user_data["password"])
             
             return generate_jwt(UserResponse(**user_data))
         except ServiceError:
@@ -151,4 +84,16 @@ class AuthService:
                 raise ServiceError("Invalid email or password", 401)
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+    def _rehash_password(self, user_id: str, password: str, old_hash: str):
+        """Hash lại mật khẩu với BCRYPT_ROUNDS hiện tại khi hash cũ dùng cost khác.
+        Chỉ ghi nếu mật khẩu chưa bị đổi trong lúc đó; lỗi không làm hỏng lần đăng nhập."""
+        try:
+            new_hash = hash_password(password, generate_salt())
+            self.client.table("users").update({"password": new_hash}) \
+                .eq("id", user_id) \
+                .eq("password", old_hash) \
+                .execute()
+        except Exception as e:
+            print(f"Failed to rehash password for user {user_id}: {e}")
+
 auth_service = AuthService() # Tạo instance một lần duy nhất
@@ -0,0 +1,69 @@
+from datetime import date
+from typing import Callable
+from ..utils import ServiceError, LRUCache, DAILY_LOG_MEMO_MAX_ENTRIES
+
+# Log của 1 ngày được tạo khi user dùng domain lần đầu trong ngày (đọc hoặc ghi), không tạo trước
+# cho mọi user lúc 00:00. Upsert bỏ qua dòng đã có theo các cột unique dưới đây
+# (database/016_lazy_daily_logs.sql), nên nhiều request cùng lúc cũng chỉ tạo 1 bộ log.
+TODAY_LOG_CONFLICT = {
+    "hydrate": "user_id,date",
+    "diet": "user_id,date",
+    "focus": "user_id,date",
+    "sleep": "user_id,task_type,date",
+}
+
+# (domain, user_id) -> ngày (theo múi giờ của user) đã chắc chắn có log trong worker này. Sang ngày mới
+# entry cũ không còn khớp với today nữa; TTL 24h chỉ để giải phóng bộ nhớ
+materialized_days = LRUCache("daily_logs_materialized", DAILY_LOG_MEMO_MAX_ENTRIES, ttl=24 * 60 * 60)
+
+
+def today_log_rows(domain: str, habit: dict, today: date) -> list:
+    """Các dòng log của ``today`` cho 1 habit, giống các dòng cron (004 - 009) từng tạo"""
+    user_id = habit["user_id"]
+    if domain == "hydrate":
+        return [{"user_id": user_id, "water_goal": habit["water_goal"], "cup_size": habit["cup_size"],
+                 "consumed_water": 0, "date": today.isoformat(), "completed": False}]
+    if domain == "diet":
+        return [{"user_id": user_id, "calories_goal": habit["calories_goal"], "dishes": [],
+                 "consumed_calories": 0, "date": today.isoformat(), "completed": False}]
+    if domain == "focus":
+        return [{"user_id": user_id, "focus_done": 0, "date": today.isoformat(), "completed": False}]
+    return [
+        {"user_id": user_id, "task_type": "sleep", "scheduled_time": f"{today} {habit['sleep_time']}"},
+        {"user_id": user_id, "task_type": "wakeup", "scheduled_time": f"{today} {habit['wakeup_time']}"},
+    ]
+
+
+def upsert_today_logs(client, domain: str, rows: list):
+    """Builder upsert các log hôm nay (của 1 hoặc nhiều user), bỏ qua log đã có. Trả về builder để
+    gọi execute() hoặc yield trong 1 flow; data chỉ gồm các dòng vừa tạo."""
+    return client.table(f"{domain}_logs").upsert(rows, on_conflict=TODAY_LOG_CONFLICT[domain], ignore_duplicates=True)
+
+
+def remember_materialized(domain: str, user_id: str, today: date):
+    """Nhớ log hôm nay của user đã có, các lần ghi sau trong ngày không phải upsert lại"""
+    materialized_days.set((domain, user_id), today)
+
+
+def is_materialized(domain: str, user_id: str, today: date) -> bool:
+    return materialized_days.get((domain, user_id)) == today
+
+
+def materialize_today(client, domain: str, user_id: str, today: date, habit_flow: Callable):
+    """Flow (utils/flow.py) tạo log hôm nay của user từ habit (habit_flow của service, qua habit_cache).
+    Trả về các dòng vừa tạo: rỗng nếu log đã có (request khác vừa tạo) hoặc user chưa có habit của domain."""
+    try:
+        habit = yield from habit_flow(client, user_id)
+    except ServiceError as e:
+        if e.status_code == 404:
+            return []
+        raise
+    response = yield upsert_today_logs(client, domain, today_log_rows(domain, habit, today))
+    remember_materialized(domain, user_id, today)
+    return response.data or []
+
+
+def ensure_today(client, domain: str, user_id: str, today: date, habit_flow: Callable):
+    """Flow chạy trước khi ghi: chắc chắn log hôm nay đã có. Chỉ tốn 1 upsert cho lần ghi đầu tiên trong ngày (mỗi worker)."""
+    if not is_materialized(domain, user_id, today):
+        yield from materialize_today(client, domain, user_id, today, habit_flow)
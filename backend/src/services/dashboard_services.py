@@ -0,0 +1,72 @@
+from ..utils import supabase, ServiceError, QUEST_SOURCE_TIMEOUT, Parallel, run, user_period_starts_flow
+from .sleep_services import sleep_service
+from .hydrate_services import hydrate_service
+from .diet_services import diet_service
+from .focus_services import focus_service
+from .xp_reward_services import xp_reward_service
+from .quest_services import quest_service
+
+def _or_empty(flow, empty):
+    """Các flow get_* trả lỗi 404 khi chưa có dữ liệu, với dashboard đó chỉ là giá trị rỗng"""
+    def wrapper():
+        try:
+            return (yield from flow())
+        except ServiceError as e:
+            if e.status_code == 404:
+                return empty
+            raise
+    return wrapper
+
+class DashboardService:
+    def __init__(self):
+        self.client = supabase
+
+    def get_today(self, user_id):
+        return run(self.today_flow(self.client, user_id))
+
+    def today_flow(self, client, user_id):
+        """Gom toàn bộ dữ liệu màn hình chính trong 1 request (flow dùng chung với app ASGI, xem utils/flow.py).
+
+        Logs hôm nay, habit, xp_rewards và số quest đã nhận trong tháng được đọc song song, sau đó
+        quest progress được tính lại từ chính các dòng này nên không phải đọc lại lần nữa.
+        Nguồn nào lỗi sẽ trả giá trị rỗng và được ghi vào "errors"."""
+        today_start, month_start = yield from user_period_starts_flow(client, user_id)
+
+        sources = {
+            "sleep_logs": _or_empty(lambda: sleep_service.logs_today_flow(client, user_id), []),
+            "hydrate_logs": _or_empty(lambda: hydrate_service.logs_today_flow(client, user_id), []),
+            "diet_logs": _or_empty(lambda: diet_service.logs_today_flow(client, user_id), []),
+            "focus_logs": _or_empty(lambda: focus_service.logs_today_flow(client, user_id), []),
+            "sleep_habit": _or_empty(lambda: sleep_service.habit_flow(client, user_id), None),
+            "focus_habit": _or_empty(lambda: focus_service.habit_flow(client, user_id), None),
+            "xp_rewards": lambda: xp_reward_service.rewards_flow(client, user_id),
+            "monthly_daily_quests_claimed": lambda: quest_service._fetch_monthly_daily_quests_claimed(client, user_id, month_start),
+        }
+        defaults = {
+            "sleep_logs": [], "hydrate_logs": [], "diet_logs": [], "focus_logs": [],
+            "sleep_habit": None, "focus_habit": None, "xp_rewards": None, "monthly_daily_quests_claimed": 0,
+        }
+        errors = {}
+        data = yield Parallel(sources, defaults, timeout=QUEST_SOURCE_TIMEOUT, errors=errors)
+
+        live_data = quest_service.dependent_data_from_rows(
+            today_start,
+            hydrate_logs=data["hydrate_logs"],
+            sleep_logs=data["sleep_logs"],
+            diet_logs=data["diet_logs"],
+            focus_logs=data["focus_logs"],
+            xp_rewards=data["xp_rewards"],
+            monthly_daily_quests_claimed=data.pop("monthly_daily_quests_claimed"),
+        )
+        try:
+            quests = yield from quest_service.quests_with_progress_flow(client, user_id, live_data=live_data)
+            data["quests"] = [q.model_dump(mode='json') for q in quests]
+        except ServiceError as e:
+            data["quests"] = []
+            errors["quests"] = e.message
+
+        data["date"] = today_start.isoformat()
+        data["errors"] = errors
+        return data
+
+dashboard_service = DashboardService()
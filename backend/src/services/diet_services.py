@@ -1,6 +1,6 @@
-from datetime import datetime, timezone, timedelta
-from ..utils import supabase, ServiceError, DEBUG
-from .xp_reward_services import xp_reward_service
+from ..utils import supabase, ServiceError, DEBUG, habit_cache, task_queue, user_today, user_today_flow, Cached, Call, run
+from .daily_logs import TODAY_LOG_CONFLICT, materialize_today, ensure_today, remember_materialized
+from .history_services import history_service
 
 class DietService:
     def __init__(self):
@@ -24,12 +24,10 @@ class DietService:
             ).execute()
             if not habit_response.data:
                 raise ServiceError("Database server error", 500)
+            habit_cache.invalidate(("diet", user_id))
 
-            # Xóa Diet Logs hôm nay (tránh trùng lặp)
-            today = datetime.now(timezone(timedelta(hours=7))).date()
-            self.client.table("diet_logs").delete().eq("user_id", user_id).eq("date", today).execute()
-
-            # Tạo Diet Log hôm nay
+            # Ghi đè Diet Log hôm nay (upsert theo unique (user_id, date): tạo mới nếu chưa có)
+            today = user_today(user_id)
             diet_log = {
                 "user_id": user_id,
                 "calories_goal": calories_goal,
@@ -38,21 +36,31 @@ class DietService:
                 "date": today.isoformat(),
                 "completed": False
             }
-            logs_response = self.client.table("diet_logs").insert([diet_log]).execute()
+            logs_response = self.client.table("diet_logs").upsert([diet_log], on_conflict=TODAY_LOG_CONFLICT["diet"]).execute()
             if not logs_response.data:
                 raise ServiceError("Database server error", 500)
-
-            return habit_response.data[0]
+            remember_materialized("diet", user_id, today)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Log hôm nay vừa về 0: quest của ngày cũng phải giảm theo (sau try, như update_log_flow)
+        task_queue.enqueue("quest_progress_refresh", user_id, "log_meal", today.isoformat())
+        return habit_response.data[0]
+
     def get_diet_habit(self, user_id):
+        return run(self.habit_flow(self.client, user_id))
+
+    def habit_flow(self, client, user_id):
+        # Đọc qua cache: lần đọc trúng cache không tốn truy vấn nào. set_diet_habit xóa entry của worker này;
+        # worker khác thấy habit mới sau tối đa HABIT_CACHE_TTL giây
+        return (yield Cached(habit_cache, ("diet", user_id), lambda: self._load_diet_habit(client, user_id)))
+
+    def _load_diet_habit(self, client, user_id):
         try:
-            response = self.client.table("diet_habits").select("*") \
-                .eq("user_id", user_id) \
-                .execute()
+            response = yield client.table("diet_habits").select("*") \
+                .eq("user_id", user_id)
 
             if not response.data:
                 raise ServiceError("Diet habit not found", 404)
@@ -63,15 +71,26 @@ class DietService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def get_diet_logs_today(self, user_id):
-        today = datetime.now(timezone(timedelta(hours=7))).date()
+        return run(self.logs_today_flow(self.client, user_id))
+
+    def logs_today_flow(self, client, user_id):
+        today = yield from user_today_flow(client, user_id)
         try:
-            response = self.client.table("diet_logs").select("*") \
+            response = yield client.table("diet_logs").select("*") \
                 .eq("user_id", user_id) \
-                .eq("date", today) \
-                .execute()
+                .eq("date", today)
 
+            if not response.data:
+                # Lần đầu dùng trong ngày: tạo log hôm nay từ habit
+                created = yield from materialize_today(client, "diet", user_id, today, self.habit_flow)
+                if created:
+                    return created
+                response = yield client.table("diet_logs").select("*") \
+                    .eq("user_id", user_id) \
+                    .eq("date", today)
             if not response.data:
                 raise ServiceError("No diet logs found for today", 404)
+            remember_materialized("diet", user_id, today)
             return response.data
         except ServiceError:
             raise
@@ -79,56 +98,41 @@ class DietService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def get_diet_logs_week(self, user_id):
-        today = datetime.now(timezone(timedelta(hours=7))).date()
-        monday = today - timedelta(days=today.weekday())
-
-        try:
-            response = self.client.table("diet_logs").select("*") \
-                .eq("user_id", user_id) \
-                .gte("date", monday) \
-                .lte("date", today) \
-                .execute()
-
-            if not response.data:
-                raise ServiceError("No diet logs found for this week", 404)
-            return response.data
-        except ServiceError:
-            raise
-        except Exception as e:
-            raise ServiceError(str(e) if DEBUG else "Database server error", 500)
+        # Từ thứ 2 tuần này đến hôm nay (theo múi giờ của user); log của các ngày trước đã bị rollover xóa
+        # nên các ngày đó là dòng tổng hợp ngày (xem history_services.HISTORY_DOMAINS)
+        logs = history_service.get_week(user_id, "diet")
+        if not logs:
+            raise ServiceError("No diet logs found for this week", 404)
+        return logs
 
     def update_diet_log(self, user_id, log_id, data):
+        return run(self.update_log_flow(self.client, user_id, log_id, data))
+
+    def update_log_flow(self, client, user_id, log_id, data):
         try:
-            log_response = self.client.table("diet_logs").select("id, user_id, dishes, consumed_calories, calories_goal") \
-                .eq("id", log_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            today = yield from user_today_flow(client, user_id)
+            yield from ensure_today(client, "diet", user_id, today, self.habit_flow)
+            new_dishes_to_add = data.get("dishes", []) # Lấy danh sách món ăn từ data, mặc định là list rỗng nếu không có
 
-            if not log_response.data:
-                raise ServiceError("Diet log not found", 404)
+            # Nối món ăn mới vào log và tính lại tổng calories trong 1 câu lệnh (database/010_atomic_log_updates.sql)
+            updated_response = yield client.rpc("append_diet_dishes", {
+                "p_log_id": log_id,
+                "p_user_id": user_id,
+                "p_dishes": new_dishes_to_add
+            })
 
-            log = log_response.data[0]
-            # new_dishes = log["dishes"] + [data]
-            new_dishes_to_add = data.get("dishes", []) # Lấy danh sách món ăn từ data, mặc định là list rỗng nếu không có
-            current_dishes = log["dishes"] if log["dishes"] else [] # Đảm bảo log["dishes"] là list, xử lý trường hợp có thể là None/rỗng
-            new_dishes = current_dishes + new_dishes_to_add # Mở rộng danh sách món ăn hiện tại với món ăn mới
-            
-            # new_consumed = log["consumed_calories"] + data.get("calories", 0)
-            new_consumed = sum(dish.get("calories", 0) for dish in new_dishes) # Tính tổng calories từ tất cả dishes trong new_dishes
-            completed = new_consumed >= log["calories_goal"]
-
-            updated_response = self.client.table("diet_logs").update({
-                "dishes": new_dishes,
-                "consumed_calories": new_consumed,
-                "completed": completed
-            }).eq("id", log_id).execute()
-            
-            xp_reward_service.update_streak(user_id)
-
-            return updated_response.data[0]
+            if not updated_response.data:
+                raise ServiceError("Diet log not found", 404)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Sau try: log đã được ghi, nên việc xếp tác vụ nền không được biến thành lỗi 500 (client gửi lại sẽ
+        # bị tính 2 lần); enqueue tự ghi log lỗi của nó.
+        # Ghi ngày vào payload: tác vụ chạy lại từ spool hoặc retry sau nửa đêm vẫn tính cho hôm nay
+        yield Call(task_queue.enqueue, "credit_streak", user_id, today.isoformat())
+        yield Call(task_queue.enqueue, "quest_progress_refresh", user_id, "log_meal", today.isoformat())
+        return updated_response.data[0]
+
 diet_service = DietService()
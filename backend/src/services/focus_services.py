@@ -1,6 +1,5 @@
-from datetime import datetime, timezone, timedelta
-from ..utils import supabase, ServiceError, DEBUG
-from .xp_reward_services import xp_reward_service
+from ..utils import supabase, ServiceError, DEBUG, habit_cache, task_queue, user_today, user_today_flow, Cached, Call, run
+from .daily_logs import TODAY_LOG_CONFLICT, materialize_today, ensure_today, remember_materialized
 
 class FocusService:
     def __init__(self):
@@ -21,47 +20,70 @@ class FocusService:
             ).execute()
             if not habit_response.data:
                 raise ServiceError("Database server error", 500)
+            habit_cache.invalidate(("focus", user_id))
 
-            # Delete today’s log if exists
-            today = datetime.now(timezone(timedelta(hours=7))).date()
-            self.client.table("focus_logs").delete().eq("user_id", user_id).eq("date", today).execute()
-
-            # Insert new log for today
+            # Overwrite today’s log (upsert on unique (user_id, date), created if missing)
+            today = user_today(user_id)
             log = {
                 "user_id": user_id,
                 "focus_done": 0,
                 "date": today.isoformat(),
                 "completed": False
             }
-            logs_response = self.client.table("focus_logs").insert([log]).execute()
+            logs_response = self.client.table("focus_logs").upsert([log], on_conflict=TODAY_LOG_CONFLICT["focus"]).execute()
             if not logs_response.data:
                 raise ServiceError("Database server error", 500)
-
-            return habit_response.data[0]
+            remember_materialized("focus", user_id, today)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Log hôm nay vừa về 0: quest của ngày cũng phải giảm theo (sau try, như update_log_flow)
+        task_queue.enqueue("quest_progress_refresh", user_id, "focus_time", today.isoformat())
+        return habit_response.data[0]
+
     def get_focus_habit(self, user_id):
+        return run(self.habit_flow(self.client, user_id))
+
+    def habit_flow(self, client, user_id):
+        # Đọc qua cache: lần đọc trúng cache không tốn truy vấn nào. set_focus_habit xóa entry của worker này;
+        # worker khác thấy habit mới sau tối đa HABIT_CACHE_TTL giây
+        return (yield Cached(habit_cache, ("focus", user_id), lambda: self._load_focus_habit(client, user_id)))
+
+    def _load_focus_habit(self, client, user_id):
         try:
-            response = self.client.table("focus_habits").select("*") \
-                .eq("user_id", user_id).single().execute()
+            response = yield client.table("focus_habits").select("*") \
+                .eq("user_id", user_id).single()
             if not response.data:
                 raise ServiceError("Focus habit not found", 404)
             return response.data
         except ServiceError:
             raise
         except Exception as e:
+            error_message = str(e).lower()
+            if "0 rows" in error_message:
+                raise ServiceError("Focus habit not found", 404)
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def get_focus_logs_today(self, user_id):
-        today = datetime.now(timezone(timedelta(hours=7))).date()
+        return run(self.logs_today_flow(self.client, user_id))
+
+    def logs_today_flow(self, client, user_id):
+        today = yield from user_today_flow(client, user_id)
         try:
-            response = self.client.table("focus_logs").select("*") \
-                .eq("user_id", user_id).eq("date", today).execute()
+            response = yield client.table("focus_logs").select("*") \
+                .eq("user_id", user_id).eq("date", today)
+            if not response.data:
+                # Lần đầu dùng trong ngày: tạo log hôm nay từ habit
+                created = yield from materialize_today(client, "focus", user_id, today, self.habit_flow)
+                if created:
+                    return created
+                response = yield client.table("focus_logs").select("*") \
+                    .eq("user_id", user_id).eq("date", today)
             if not response.data:
                 raise ServiceError("No focus logs found for today", 404)
+            remember_materialized("focus", user_id, today)
             return response.data
         except ServiceError:
             raise
@@ -69,36 +91,33 @@ class FocusService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def update_focus_log(self, user_id, log_id, minutes):
-        try:
-            log_response = self.client.table("focus_logs").select("id, user_id, focus_done") \
-                .eq("id", log_id).eq("user_id", user_id).single().execute()
-            if not log_response.data:
-                raise ServiceError("Focus log not found", 404)
-
-            log = log_response.data
+        return run(self.update_log_flow(self.client, user_id, log_id, minutes))
 
-            habit_response = self.client.table("focus_habits").select("focus_goal") \
-                .eq("user_id", user_id).single().execute()
-            if not habit_response.data:
-                raise ServiceError("Focus habit not found", 404)
-
-            new_done = log["focus_done"] + minutes
-            completed = new_done >= habit_response.data["focus_goal"]
-
-            updated_response = self.client.table("focus_logs").update({
-                "focus_done": new_done,
-                "completed": completed
-            }).eq("id", log_id).execute()
+    def update_log_flow(self, client, user_id, log_id, minutes):
+        try:
+            today = yield from user_today_flow(client, user_id)
+            yield from ensure_today(client, "focus", user_id, today, self.habit_flow)
+            # Cộng thêm số phút và so với focus_goal của habit trong 1 câu lệnh (database/010_atomic_log_updates.sql)
+            updated_response = yield client.rpc("increment_focus_log", {
+                "p_log_id": log_id,
+                "p_user_id": user_id,
+                "p_minutes": minutes
+            })
 
             if not updated_response.data:
-                raise ServiceError("Database server error", 500)
-
-            xp_reward_service.update_streak(user_id)
-
-            return updated_response.data[0]
+                # increment_focus_log cần focus_habits: không có habit thì báo thiếu habit, không phải thiếu log
+                yield from self.habit_flow(client, user_id)
+                raise ServiceError("Focus log not found", 404)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Sau try: log đã được ghi, nên việc xếp tác vụ nền không được biến thành lỗi 500 (client gửi lại sẽ
+        # bị tính 2 lần); enqueue tự ghi log lỗi của nó.
+        # Ghi ngày vào payload: tác vụ chạy lại từ spool hoặc retry sau nửa đêm vẫn tính cho hôm nay
+        yield Call(task_queue.enqueue, "credit_streak", user_id, today.isoformat())
+        yield Call(task_queue.enqueue, "quest_progress_refresh", user_id, "focus_time", today.isoformat())
+        return updated_response.data[0]
+
 focus_service = FocusService()
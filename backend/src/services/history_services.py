@@ -0,0 +1,301 @@
+import base64
+import json
+from datetime import date, timedelta
+from operator import itemgetter
+from ..utils import supabase, ServiceError, DEBUG, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, HISTORY_MAX_STATS_DAYS, user_today
+
+# Mỗi domain: bảng, cột thời gian dùng để lọc/sắp xếp, các cột sắp xếp để phân trang
+# (dòng cuối trang xác định duy nhất theo các cột này) và các cột được phép chọn qua fields=.
+# Log của các ngày trước bị rollover xóa sau khi được tổng hợp: "summary" là cột của daily_summaries
+# cho biết ngày đó có dữ liệu của domain ("marker") và cách tính các cột của log từ dòng tổng hợp
+# (cột không có trong tổng hợp, vd. id, cup_size, dishes, task_type, là null)
+HISTORY_DOMAINS = {
+    "hydrate": {
+        "table": "hydrate_logs",
+        "time_column": "date",
+        "keys": ("date", "id"),
+        "columns": ("id", "user_id", "water_goal", "cup_size", "consumed_water", "date", "completed"),
+        "summary": {
+            "marker": "consumed_water",
+            "columns": {"date": itemgetter("date"), "water_goal": itemgetter("water_goal"),
+                        "consumed_water": itemgetter("consumed_water"), "completed": itemgetter("hydrate_completed")},
+        },
+    },
+    "diet": {
+        "table": "diet_logs",
+        "time_column": "date",
+        "keys": ("date", "id"),
+        "columns": ("id", "user_id", "calories_goal", "dishes", "consumed_calories", "date", "completed"),
+        "summary": {
+            "marker": "consumed_calories",
+            "columns": {"date": itemgetter("date"), "calories_goal": itemgetter("calories_goal"),
+                        "consumed_calories": itemgetter("consumed_calories"), "completed": itemgetter("diet_completed")},
+        },
+    },
+    "sleep": {
+        "table": "sleep_logs",
+        "time_column": "scheduled_time",
+        "keys": ("scheduled_time", "id"),
+        "columns": ("id", "user_id", "task_type", "scheduled_time", "completed"),
+        # 1 dòng cho cả ngày: hoàn thành khi mọi task của ngày đã hoàn thành
+        "summary": {
+            "marker": "sleep_tasks",
+            "columns": {"scheduled_time": lambda row: f"{row['date']} 00:00:00",
+                        "completed": lambda row: row["sleep_tasks_completed"] == row["sleep_tasks"]},
+        },
+    },
+    "focus": {
+        "table": "focus_logs",
+        "time_column": "date",
+        "keys": ("date", "id"),
+        "columns": ("id", "user_id", "focus_done", "date", "completed"),
+        "summary": {
+            "marker": "focus_done",
+            "columns": {"date": itemgetter("date"), "focus_done": itemgetter("focus_done"),
+                        "completed": itemgetter("focus_completed")},
+        },
+    },
+    # Tổng hợp mỗi ngày (database/014_daily_summaries.sql), còn lại sau khi cron xóa log cũ
+    "summary": {
+        "table": "daily_summaries",
+        "time_column": "date",
+        "keys": ("date",),
+        "columns": ("date", "water_goal", "consumed_water", "hydrate_completed", "calories_goal",
+                    "consumed_calories", "meals", "diet_completed", "sleep_tasks", "sleep_tasks_completed",
+                    "focus_done", "focus_completed"),
+    },
+}
+
+
+def encode_cursor(keys) -> str:
+    """Cursor = giá trị các cột sắp xếp của dòng cuối trang, client chỉ gửi lại nguyên văn"""
+    raw = json.dumps([str(key) for key in keys], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        keys = json.loads(raw)
+        if not isinstance(keys, list) or len(keys) != size or not all(isinstance(key, str) for key in keys):
+            raise ValueError(cursor)
+        return keys
+    except ValueError:
+        raise ServiceError("Invalid cursor", 400)
+
+
+def _quote(value: str) -> str:
+    # Giá trị trong or=(...) của PostgREST: đặt trong nháy kép vì timestamp có dấu ":" và khoảng trắng
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class HistoryService:
+    def __init__(self):
+        self.client = supabase
+
+    def _parse_date(self, value, name):
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ServiceError(f"Invalid {name} date, expected YYYY-MM-DD", 400)
+
+    def _parse_fields(self, domain, fields):
+        """Danh sách cột cần lấy (mặc định tất cả); luôn thêm các cột sắp xếp để tạo cursor"""
+        config = HISTORY_DOMAINS[domain]
+        if not fields:
+            return list(config["columns"])
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in requested if field not in config["columns"]]
+        if unknown:
+            raise ServiceError(f"Unknown fields for {domain}: {', '.join(unknown)}", 400)
+        columns = list(dict.fromkeys(requested))
+        for key in config["keys"]:
+            if key not in columns:
+                columns.append(key)
+        return columns
+
+    def _parse_limit(self, limit):
+        if limit in (None, ""):
+            return HISTORY_PAGE_SIZE
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ServiceError("Invalid limit", 400)
+        if limit < 1:
+            raise ServiceError("Invalid limit", 400)
+        return min(limit, HISTORY_MAX_PAGE_SIZE)
+
+    def _parse_range(self, user_id, date_from, date_to):
+        # Mặc định: từ thứ 2 tuần này đến hôm nay (như các endpoint /logs/week), theo múi giờ của user
+        date_to = self._parse_date(date_to, "to") if date_to else user_today(user_id)
+        date_from = self._parse_date(date_from, "from") if date_from else date_to - timedelta(days=date_to.weekday())
+        if date_from > date_to:
+            raise ServiceError("from must not be after to", 400)
+        return date_from, date_to
+
+    def get_history(self, user_id, domain, date_from=None, date_to=None, fields=None, cursor=None, limit=None):
+        """Lấy log (hoặc tổng hợp ngày với domain "summary") trong khoảng [from, to], theo trang.
+
+        Phân trang keyset theo các cột sắp xếp (vd. (date, id)): mỗi trang là 1 truy vấn dùng index
+        (user_id, date, id), không phụ thuộc đã đi sâu bao nhiêu trang như offset.
+        Các ngày trước hôm nay đã được tổng hợp đọc từ daily_summaries (1 dòng / ngày, id null) vì log
+        của chúng đã bị xóa; sau đó là log gốc của các ngày sau ngày tổng hợp cuối cùng (hôm nay, ngày
+        chưa tổng hợp). Cursor của phần tổng hợp có id rỗng.
+        Trả về {"items": [...], "next_cursor": cursor của trang sau hoặc None}."""
+        if domain not in HISTORY_DOMAINS:
+            raise ServiceError("History domain not found", 404)
+        config = HISTORY_DOMAINS[domain]
+        keys = config["keys"]
+        date_from, date_to = self._parse_range(user_id, date_from, date_to)
+        columns = self._parse_fields(domain, fields)
+        limit = self._parse_limit(limit)
+        after = decode_cursor(cursor, len(keys)) if cursor else None
+        in_summaries = "summary" in config and (after is None or after[-1] == "")
+        summarized_after = None
+        if in_summaries and after:
+            try:
+                summarized_after = date.fromisoformat(after[0][:10])
+            except ValueError:
+                raise ServiceError("Invalid cursor", 400)
+
+        try:
+            rows = []
+            logs_from = date_from
+            if in_summaries:
+                rows = self._summary_rows(user_id, domain, columns, date_from, date_to, summarized_after, limit)
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    return {"items": rows, "next_cursor": encode_cursor([rows[-1][keys[0]], ""])}
+                # Log gốc chỉ của các ngày sau ngày tổng hợp cuối cùng
+                if rows:
+                    logs_from = date.fromisoformat(str(rows[-1][keys[0]])[:10]) + timedelta(days=1)
+                elif summarized_after:
+                    logs_from = max(date_from, summarized_after + timedelta(days=1))
+                after = None
+
+            remaining = limit - len(rows)
+            logs = self._log_rows(config, user_id, columns, logs_from, date_to, after, remaining) \
+                if logs_from <= date_to else []
+            next_cursor = None
+            if len(logs) > remaining:
+                rows += logs[:remaining]
+                last = rows[-1]
+                next_cursor = encode_cursor(last[key] for key in keys) if last.get("id") \
+                    else encode_cursor([last[keys[0]], ""])
+            else:
+                rows += logs
+            return {"items": rows, "next_cursor": next_cursor}
+        except ServiceError:
+            raise
+        except Exception as e:
+            raise ServiceError(str(e) if DEBUG else "Database server error", 500)
+
+    def _summary_rows(self, user_id, domain, columns, date_from, date_to, after, limit):
+        """Tối đa limit + 1 ngày đã tổng hợp của domain trong [from, min(to, hôm qua)], sau ngày ``after``,
+        dưới dạng các cột của log"""
+        summary = HISTORY_DOMAINS[domain]["summary"]
+        until = min(date_to, user_today(user_id) - timedelta(days=1))
+        if date_from > until:
+            return []
+        query = self.client.table("daily_summaries").select("*").eq("user_id", user_id) \
+            .not_.is_(summary["marker"], "null") \
+            .gte("date", date_from.isoformat()) \
+            .lte("date", until.isoformat())
+        if after:
+            query = query.gt("date", after.isoformat())
+        response = query.order("date").limit(limit + 1).execute()
+
+        def as_log(row):
+            item = {column: summary["columns"][column](row) if column in summary["columns"] else None
+                    for column in columns}
+            if "user_id" in item:
+                item["user_id"] = user_id
+            return item
+        return [as_log(row) for row in response.data or []]
+
+    def _log_rows(self, config, user_id, columns, date_from, date_to, after, limit):
+        """Tối đa limit + 1 log gốc trong [from, to], sau dòng ``after`` (giá trị các cột sắp xếp)"""
+        time_column = config["time_column"]
+        keys = config["keys"]
+        query = self.client.table(config["table"]).select(", ".join(columns)).eq("user_id", user_id)
+        if time_column == "date":
+            query = query.gte("date", date_from.isoformat()).lte("date", date_to.isoformat())
+        else:
+            # scheduled_time là TIMESTAMP: lấy đến hết ngày "to"
+            query = query.gte(time_column, f"{date_from} 00:00:00") \
+                .lt(time_column, f"{date_to + timedelta(days=1)} 00:00:00")
+        if after:
+            if len(keys) == 1:
+                query = query.gt(keys[0], after[0])
+            else:
+                query = query.or_(f"{keys[0]}.gt.{_quote(after[0])},"
+                                  f"and({keys[0]}.eq.{_quote(after[0])},{keys[1]}.gt.{_quote(after[1])})")
+        for key in keys:
+            query = query.order(key)
+        # Lấy dư 1 dòng để biết còn trang sau hay không
+        return query.limit(limit + 1).execute().data or []
+
+    def get_week(self, user_id, domain):
+        """Mọi dòng của domain từ thứ 2 tuần này đến hôm nay (các endpoint /logs/week), qua get_history
+        nên các ngày trước hôm nay đọc từ daily_summaries"""
+        items, cursor = [], None
+        while True:
+            page = self.get_history(user_id, domain, cursor=cursor, limit=HISTORY_MAX_PAGE_SIZE)
+            items += page["items"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return items
+
+    def get_stats(self, user_id, date_from=None, date_to=None):
+        """Thống kê từng domain trong khoảng [from, to], tính từ bảng tổng hợp ngày (daily_summaries).
+
+        Chỉ gồm các ngày đã được tổng hợp (trước hôm nay), không quét lại log gốc."""
+        date_from, date_to = self._parse_range(user_id, date_from, date_to)
+        if (date_to - date_from).days >= HISTORY_MAX_STATS_DAYS:
+            raise ServiceError(f"Range must not exceed {HISTORY_MAX_STATS_DAYS} days", 400)
+        try:
+            response = self.client.table("daily_summaries") \
+                .select("consumed_water, hydrate_completed, consumed_calories, meals, diet_completed, "
+                        "sleep_tasks, sleep_tasks_completed, focus_done, focus_completed") \
+                .eq("user_id", user_id) \
+                .gte("date", date_from.isoformat()) \
+                .lte("date", date_to.isoformat()) \
+                .execute()
+            rows = response.data or []
+        except Exception as e:
+            raise ServiceError(str(e) if DEBUG else "Database server error", 500)
+
+        def days_of(column):
+            return [row for row in rows if row.get(column) is not None]
+
+        def completion(days, column):
+            completed = sum(1 for row in days if row.get(column))
+            return {"days": len(days), "completed_days": completed,
+                    "completion_rate": round(completed / len(days), 4) if days else None}
+
+        def average(days, column):
+            return round(sum(row[column] for row in days) / len(days), 2) if days else None
+
+        hydrate = days_of("consumed_water")
+        diet = days_of("consumed_calories")
+        sleep = days_of("sleep_tasks")
+        focus = days_of("focus_done")
+        sleep_tasks = sum(row["sleep_tasks"] for row in sleep)
+        sleep_completed = sum(row.get("sleep_tasks_completed") or 0 for row in sleep)
+        return {
+            "from": date_from.isoformat(),
+            "to": date_to.isoformat(),
+            "days": len(rows),
+            "hydrate": dict(completion(hydrate, "hydrate_completed"),
+                            average_consumed_water=average(hydrate, "consumed_water")),
+            "diet": dict(completion(diet, "diet_completed"),
+                         average_consumed_calories=average(diet, "consumed_calories"),
+                         meals=sum(row.get("meals") or 0 for row in diet)),
+            "sleep": {"days": len(sleep), "tasks": sleep_tasks, "completed_tasks": sleep_completed,
+                      "completion_rate": round(sleep_completed / sleep_tasks, 4) if sleep_tasks else None},
+            "focus": dict(completion(focus, "focus_completed"),
+                          total_minutes=sum(row["focus_done"] for row in focus),
+                          average_minutes=average(focus, "focus_done")),
+        }
+
+history_service = HistoryService()
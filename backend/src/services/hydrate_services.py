@@ -1,6 +1,6 @@
-from datetime import datetime, timezone, timedelta
-from ..utils import supabase, ServiceError, DEBUG
-from .xp_reward_services import xp_reward_service
+from ..utils import supabase, ServiceError, DEBUG, habit_cache, task_queue, user_today, user_today_flow, Cached, Call, run
+from .daily_logs import TODAY_LOG_CONFLICT, materialize_today, ensure_today, remember_materialized
+from .history_services import history_service
 
 class HydrateService:
     def __init__(self):
@@ -26,13 +26,11 @@ class HydrateService:
             ).execute()
             if not habit_response.data:
                 raise ServiceError("Database server error", 500)
+            habit_cache.invalidate(("hydrate", user_id))
 
-            # Xóa Hydrate Logs hôm nay (tránh trùng lặp)
-            # today của múi giờ utc+7
-            today = datetime.now(timezone(timedelta(hours=7))).date()
-            self.client.table("hydrate_logs").delete().eq("user_id", user_id).eq("date", today).execute()
-
-            # Tạo Hydrate Log hôm nay
+            # Ghi đè Hydrate Log hôm nay (upsert theo unique (user_id, date): tạo mới nếu chưa có)
+            # today theo múi giờ của user
+            today = user_today(user_id)
             hydrate_log = {
                 "user_id": user_id,
                 "water_goal": water_goal,
@@ -41,22 +39,33 @@ class HydrateService:
                 "date": today.isoformat(),
                 "completed": False
             }
-            logs_response = self.client.table("hydrate_logs").insert([hydrate_log]).execute()
+            logs_response = self.client.table("hydrate_logs").upsert([hydrate_log], on_conflict=TODAY_LOG_CONFLICT["hydrate"]).execute()
             if not logs_response.data:
                 raise ServiceError("Database server error", 500)
-            
-            return habit_response.data[0]
+            remember_materialized("hydrate", user_id, today)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Log hôm nay vừa về 0: quest của ngày cũng phải giảm theo (sau try, như update_log_flow)
+        task_queue.enqueue("quest_progress_refresh", user_id, "hydrate_goal", today.isoformat())
+        return habit_response.data[0]
+
+    # Các hàm *_flow chạy được trên cả client sync lẫn AsyncClient (utils/flow.py, services/async_services.py)
     def get_hydrate_habit(self, user_id):
         """Lấy thông tin thói quen uống nước"""
+        return run(self.habit_flow(self.client, user_id))
+
+    def habit_flow(self, client, user_id):
+        # Đọc qua cache: lần đọc trúng cache không tốn truy vấn nào. set_hydrate_habit xóa entry của worker này;
+        # worker khác thấy habit mới sau tối đa HABIT_CACHE_TTL giây
+        return (yield Cached(habit_cache, ("hydrate", user_id), lambda: self._load_hydrate_habit(client, user_id)))
+
+    def _load_hydrate_habit(self, client, user_id):
         try:
-            response = self.client.table("hydrate_habits").select("*") \
-                .eq("user_id", user_id) \
-                .execute()
+            response = yield client.table("hydrate_habits").select("*") \
+                .eq("user_id", user_id)
 
             if not response.data:
                 raise ServiceError("Hydrate habit not found", 404)
@@ -67,16 +76,27 @@ class HydrateService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def get_hydrate_logs_today(self, user_id):
-        # today của múi giờ utc+7
-        today = datetime.now(timezone(timedelta(hours=7))).date()
+        return run(self.logs_today_flow(self.client, user_id))
+
+    def logs_today_flow(self, client, user_id):
+        # today theo múi giờ của user
+        today = yield from user_today_flow(client, user_id)
         try:
-            response = self.client.table("hydrate_logs").select("*") \
+            response = yield client.table("hydrate_logs").select("*") \
                 .eq("user_id", user_id) \
-                .eq("date", today) \
-                .execute()
+                .eq("date", today)
 
+            if not response.data:
+                # Lần đầu dùng trong ngày: tạo log hôm nay từ habit
+                created = yield from materialize_today(client, "hydrate", user_id, today, self.habit_flow)
+                if created:
+                    return created
+                response = yield client.table("hydrate_logs").select("*") \
+                    .eq("user_id", user_id) \
+                    .eq("date", today)
             if not response.data:
                 raise ServiceError("No hydrate logs found for today", 404)
+            remember_materialized("hydrate", user_id, today)
             return response.data
         except ServiceError:
             raise
@@ -87,55 +107,28 @@ class HydrateService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def get_hydrate_logs_week(self, user_id):
-        # today của múi giờ utc+7
-        today = datetime.now(timezone(timedelta(hours=7))).date()
-        monday = today - timedelta(days=today.weekday())  # Lấy thứ 2 của tuần này
-        
-        try:
-            response = self.client.table("hydrate_logs").select("*") \
-                .eq("user_id", user_id) \
-                .gte("date", monday) \
-                .lte("date", today) \
-                .execute()
+        # Từ thứ 2 tuần này đến hôm nay (theo múi giờ của user); log của các ngày trước đã bị rollover xóa
+        # nên các ngày đó là dòng tổng hợp ngày (xem history_services.HISTORY_DOMAINS)
+        logs = history_service.get_week(user_id, "hydrate")
+        if not logs:
+            raise ServiceError("No hydrate logs found for this week", 404)
+        return logs
 
-            if not response.data:
-                raise ServiceError("No hydrate logs found for this week", 404)
-            return response.data
-        except ServiceError:
-            raise
-        except Exception as e:
-            error_message = str(e).lower()
-            if "0 rows" in error_message:
-                raise ServiceError("No hydrate logs found for this week", 404)
-            raise ServiceError(str(e) if DEBUG else "Database server error", 500)
-    
     def update_hydrate_log(self, user_id, log_id):
-        try:
-            # Kiểm tra log có tồn tại không
-            log_response = self.client.table("hydrate_logs").select("id, user_id, consumed_water, cup_size, water_goal") \
-                .eq("id", log_id) \
-                .eq("user_id", user_id) \
-                .execute()
+        return run(self.update_log_flow(self.client, user_id, log_id))
 
-            if not log_response.data:
-                raise ServiceError("Hydrate log not found", 404)
-            
-            log = log_response.data[0]
-            new_consumed = log["consumed_water"] + log["cup_size"]
-            completed = new_consumed >= log["water_goal"]
-
-            # Cập nhật lượng nước đã uống
-            updated_response = self.client.table("hydrate_logs").update({
-                "consumed_water": new_consumed,
-                "completed": completed
-            }).eq("id", log_id).execute()
+    def update_log_flow(self, client, user_id, log_id):
+        try:
+            today = yield from user_today_flow(client, user_id)
+            yield from ensure_today(client, "hydrate", user_id, today, self.habit_flow)
+            # Cộng thêm cup_size và tính lại completed trong 1 câu lệnh (xem database/010_atomic_log_updates.sql)
+            updated_response = yield client.rpc("increment_hydrate_log", {
+                "p_log_id": log_id,
+                "p_user_id": user_id
+            })
 
             if not updated_response.data:
-                raise ServiceError("Database server error", 500)
-            
-            xp_reward_service.update_streak(user_id)
-
-            return updated_response.data[0]
+                raise ServiceError("Hydrate log not found", 404)
         except ServiceError:
             raise
         except Exception as e:
@@ -144,4 +137,11 @@ class HydrateService:
                 raise ServiceError("Hydrate log not found", 404)
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Sau try: log đã được ghi, nên việc xếp tác vụ nền không được biến thành lỗi 500 (client gửi lại sẽ
+        # bị tính 2 lần); enqueue tự ghi log lỗi của nó.
+        # Ghi ngày vào payload: tác vụ chạy lại từ spool hoặc retry sau nửa đêm vẫn tính cho hôm nay
+        yield Call(task_queue.enqueue, "credit_streak", user_id, today.isoformat())
+        yield Call(task_queue.enqueue, "quest_progress_refresh", user_id, "hydrate_goal", today.isoformat())
+        return updated_response.data[0]
+
 hydrate_service = HydrateService()
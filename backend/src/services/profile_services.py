@@ -1,29 +1,34 @@
 from ..models import ProfileResponse, ProfileBase
-from ..utils import supabase, hash_password, verify_password, ServiceError, generate_salt, DEBUG
+from ..utils import supabase, hash_password, verify_password, ServiceError, generate_salt, DEBUG, time_zone_cache
 
 class ProfileService:
     def __init__(self):
         self.client = supabase
 
-    def get_user_profile(self, user_id: str):
+    def get_user_profile(self, user_id: str) -> ProfileResponse:
         try:
             response = self.client.table("profiles").select("*").eq("user_id", user_id).single().execute()
             if not response.data:
                 raise ServiceError("Database server error", 500)
             
-            return ProfileResponse(**response.data).model_dump()
+            return ProfileResponse(**response.data)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
-    def update_user_profile(self, user_id: str, user_data: ProfileBase):
+    def update_user_profile(self, user_id: str, user_data: ProfileBase) -> ProfileResponse:
         try:
-            response = self.client.table("profiles").update(user_data.model_dump()).eq("user_id", user_id).execute()
+            changes = user_data.model_dump()
+            if changes["time_zone"] is None:
+                del changes["time_zone"]  # Không gửi time_zone: giữ múi giờ hiện tại
+            response = self.client.table("profiles").update(changes).eq("user_id", user_id).execute()
             if not response.data:
                 raise ServiceError("Database server error", 500)
-            
-            return ProfileResponse(**response.data[0]).model_dump()
+
+            # Worker này dùng múi giờ mới ngay; worker khác sau tối đa TIME_ZONE_CACHE_TTL giây
+            time_zone_cache.invalidate(user_id)
+            return ProfileResponse(**response.data[0])
         except ServiceError:
             raise
         except Exception as e:
@@ -1,8 +1,12 @@
 # services/quest_service.py
+import hashlib
+import json
 from datetime import datetime, timedelta, timezone, date
 # Removed UUID import
 from typing import List, Optional, Dict
-from ..utils import supabase, ServiceError, DEBUG
+from ..utils import supabase, ServiceError, DEBUG, QUEST_SOURCE_TIMEOUT, QUEST_CACHE_TTL, QUEST_PROGRESS_REFRESH_TTL, \
+    QUEST_PROGRESS_MEMO_MAX_ENTRIES, TTLCache, LRUCache, task_queue, user_period_starts, period_starts_of, \
+    user_period_starts_flow, Cached, Parallel, run
 # Ensure imported models use 'str' for IDs
 from ..models import HydrateLogResponse, DietLogResponse, SleepLogResponse, QuestResponse, UserQuestProgressResponse, QuestWithProgressResponse, XpRewardsData
 from .xp_reward_services import xp_reward_service
@@ -10,69 +14,140 @@ from .xp_reward_services import xp_reward_service
 class QuestService:
     def __init__(self):
         self.client = supabase
-        self.local_tz = timezone(timedelta(hours=7)) # Adjust to your local timezone offset
-
-    def _get_current_period_starts(self) -> (date, date): # type: ignore
-        """Gets the start date for today (daily) and the current month (monthly)."""
-        now_local = datetime.now(self.local_tz)
-        today_start = now_local.date()
-        month_start = today_start.replace(day=1)
-        return today_start, month_start
-
-    def _get_or_create_user_progress(self, user_id: str, quest_id: str, period_start: date) -> Optional[dict]:
-        """Fetches or creates a progress record for a specific period. Uses string IDs."""
-        try:
-            progress_res = self.client.table("user_quest_progress")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("quest_id", quest_id)\
-                .eq("period_start_date", period_start.isoformat())\
-                .maybe_single()\
-                .execute()
-
-            if progress_res.data:
-                # Reset progress if the period_start_date in DB is older than the calculated one
-                # This handles daily/monthly resets automatically on first fetch of the new period
-                db_period_start = date.fromisoformat(progress_res.data['period_start_date'])
-                if db_period_start < period_start:
-                    print(f"Resetting progress for Quest {quest_id}, User {user_id}. DB period: {db_period_start}, Current period: {period_start}")
-                    reset_res = self.client.table("user_quest_progress")\
-                        .update({"current_progress": 0, "claimed_at": None, "period_start_date": period_start.isoformat()})\
-                        .eq("id", progress_res.data['id'])\
-                        .execute()
-                    if reset_res.data:
-                        return reset_res.data[0]
-                    else:
-                         print(f"Error resetting progress: {reset_res.error}")
-                         # Fallback to returning old data? Or raise? For now, return old.
-                         return progress_res.data
-                else:
-                    return progress_res.data # Return existing data for current period
-
-            # If no record exists for this period (or any previous), create one
-            print(f"Creating new progress record for Quest {quest_id}, User {user_id}, Period {period_start}")
-            new_progress = {
-                "user_id": user_id,
-                "quest_id": quest_id,
-                "current_progress": 0,
-                "period_start_date": period_start.isoformat(),
-                "claimed_at": None,
-            }
-            insert_res = self.client.table("user_quest_progress").insert(new_progress).execute()
-
-            if insert_res.data:
-                return insert_res.data[0]
-            else:
-                 print(f"Error creating progress for user {user_id}, quest {quest_id}, period {period_start}: {insert_res.error}")
-                 return None
-
-        except Exception as e:
-            print(f"DB Error in _get_or_create_user_progress for quest {quest_id}, user {user_id}: {e}")
-            return None
-
-    def _fetch_dependent_data(self, user_id: str, today_start: date, month_start: date) -> Dict:
-        """Fetches data needed for automatic quest progress calculation."""
-        dependent_data = {
+        # Quest definitions change rarely; keep the validated active quests for QUEST_CACHE_TTL seconds
+        self.quest_cache = TTLCache("active_quests", QUEST_CACHE_TTL)
+        self._definitions_hash = None  # (cached quest list, its hash)
+        # user_id -> the day (user's time zone) whose progress was last recomputed from the source data in this worker
+        self.progress_refreshed = LRUCache("quest_progress_refreshed", QUEST_PROGRESS_MEMO_MAX_ENTRIES, QUEST_PROGRESS_REFRESH_TTL)
+
+    def _get_current_period_starts(self, user_id: str) -> (date, date): # type: ignore
+        """Gets the start date for today (daily) and the current month (monthly) in the user's time zone."""
+        return user_period_starts(user_id)
+
+    def _task_period_starts(self, user_id: str, day: Optional[str]) -> (date, date): # type: ignore
+        """Periods of the day a task was enqueued for (``day``, ISO), or the current ones for tasks without it."""
+        return period_starts_of(date.fromisoformat(day)) if day else self._get_current_period_starts(user_id)
+
+    # The *_flow methods run on both the sync client and the AsyncClient (utils/flow.py, services/async_services.py)
+    def _load_active_quests(self, client):
+        quests_res = yield client.table("quests").select("*").eq("is_active", True)
+        return [QuestResponse.model_validate(quest_dict) for quest_dict in (quests_res.data or [])]
+
+    def active_quests_flow(self, client):
+        """Active quest definitions, served from the process-local cache (the cached list itself)."""
+        return (yield Cached(self.quest_cache, "active", lambda: self._load_active_quests(client)))
+
+    def get_active_quests(self) -> List[QuestResponse]:
+        return list(run(self.active_quests_flow(self.client)))
+
+    def definitions_version_flow(self, client):
+        """Short hash of the active quest definitions (part of the ETags of responses that include them)."""
+        return self.definitions_version((yield from self.active_quests_flow(client)))
+
+    def definitions_version(self, quests: Optional[List[QuestResponse]] = None) -> str:
+        """Computed once per cache load: ``quests`` defaults to the cached list."""
+        if quests is None:
+            quests = run(self.active_quests_flow(self.client))
+        memo = self._definitions_hash
+        if memo is None or memo[0] is not quests:
+            payload = json.dumps([q.model_dump(mode="json") for q in quests], sort_keys=True)
+            memo = self._definitions_hash = (quests, hashlib.sha1(payload.encode()).hexdigest()[:16])
+        return memo[1]
+
+    def invalidate_quest_cache(self):
+        """Call after editing the quests table so the change shows up without waiting for the TTL."""
+        self.quest_cache.invalidate()
+
+    def _load_period_progress(self, client, user_id: str, today_start: date, month_start: date):
+        """Loads every progress row of the user for the current daily and monthly periods in one query.
+        Returns a dict keyed by (quest_id, period_start_date iso string)."""
+        period_starts = sorted({today_start.isoformat(), month_start.isoformat()})
+        progress_res = yield client.table("user_quest_progress")\
+            .select("*")\
+            .eq("user_id", user_id)\
+            .in_("period_start_date", period_starts)
+        return {(row["quest_id"], row["period_start_date"]): row for row in (progress_res.data or [])}
+
+    def _compute_progress(self, quest: QuestResponse, live_data: Dict) -> int:
+        """Maps the live data onto a quest's progress value, capped at the quest's effective target."""
+        target_value = 0
+        if quest.trigger_type == 'hydrate_goal':
+            target_value = live_data["daily_hydrate_ml"]
+        elif quest.trigger_type == 'tasks_completed':
+            target_value = live_data["daily_tasks_completed"]
+        elif quest.trigger_type == 'log_meal':
+            target_value = live_data["daily_meals_logged"]
+        elif quest.trigger_type == 'focus_time':
+            target_value = live_data.get("daily_focus_minutes", 0)
+        elif quest.trigger_type == 'checkin':
+            target_value = 1 if live_data["daily_checkin_done"] else 0
+        elif quest.trigger_type == 'monthly_daily_quests':
+            target_value = live_data["monthly_daily_quests_claimed"]
+        # Add more trigger types as needed
+
+        # Cap progress at target_progress for non-accumulative goals like checkin/log_meal
+        effective_target = quest.target_progress if quest.trigger_type not in ['checkin', 'log_meal'] else 1
+        return int(min(target_value, effective_target))
+
+    # --- Dependent data sources (each one is a single independent query) ---
+    def _fetch_daily_hydrate_ml(self, client, user_id: str, today_start: date):
+        hydrate_res = yield client.table("hydrate_logs").select("consumed_water").eq("user_id", user_id).eq("date", today_start.isoformat()).maybe_single()
+        # maybe_single() returns None instead of a response when there is no row
+        if hydrate_res and hydrate_res.data:
+            return hydrate_res.data.get("consumed_water", 0)
+        return 0
+
+    def _fetch_daily_tasks_completed(self, client, user_id: str, today_start: date):
+        # Daily Task Completion (Sleep Logs)
+        sleep_tasks_res = yield client.table("sleep_logs").select("id", count='exact').eq("user_id", user_id).eq("completed", True).gte("scheduled_time", today_start.isoformat() + " 00:00:00").lt("scheduled_time", (today_start + timedelta(days=1)).isoformat() + " 00:00:00")
+        return sleep_tasks_res.count or 0
+
+    def _fetch_daily_meals_logged(self, client, user_id: str, today_start: date):
+        # Meal Logging (Diet Logs) - Check if 'dishes' JSON is not empty/null
+        # Note: JSON checks can be DB-specific. This checks if the key exists and is not an empty list/object.
+        # Adjust based on how you store empty dishes ('[]', '{}', or null)
+        diet_res = yield client.table("diet_logs").select("id", count='exact').eq("user_id", user_id).eq("date", today_start.isoformat()).not_.in_("dishes", ['[]', '{}']).not_.is_("dishes", None)
+        return diet_res.count or 0
+
+    def _fetch_daily_focus_minutes(self, client, user_id: str, today_start: date):
+        # Focus Logs - Sum of durations today
+        focus_res = yield client.table("focus_logs")\
+            .select("focus_done")\
+            .eq("user_id", user_id)\
+            .eq("date", today_start.isoformat())
+        return sum(log.get("focus_done", 0) for log in (focus_res.data or []))
+
+    def _fetch_daily_checkin_done(self, client, user_id: str, today_start: date):
+        # Check-in Status (from xp_rewards)
+        xp_res = yield client.table("xp_rewards").select("last_checkin_date").eq("user_id", user_id).maybe_single()
+        if xp_res and xp_res.data and xp_res.data.get("last_checkin_date"):
+            return date.fromisoformat(xp_res.data["last_checkin_date"]) == today_start
+        return False
+
+    def _monthly_claims_query(self, client, user_id: str, month_start: date):
+        # Monthly Quest Claims
+        start_of_month_iso = month_start.isoformat()
+        end_of_next_month_iso = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
+        # TODO: This still needs refinement - ideally join with quests table to ensure only 'daily' type quests are counted
+        return client.table("user_quest_progress")\
+            .select("id", count='exact')\
+            .match({'user_id': user_id})\
+            .not_.is_("claimed_at", None)\
+            .gte("period_start_date", start_of_month_iso)\
+            .lt("period_start_date", end_of_next_month_iso)
+
+    def _fetch_monthly_daily_quests_claimed(self, client, user_id: str, month_start: date):
+        count_res = yield self._monthly_claims_query(client, user_id, month_start)
+        return count_res.count or 0
+
+    def _fetch_dependent_data(self, client, user_id: str, today_start: date, month_start: date):
+        """Fetches data needed for automatic quest progress calculation.
+
+        The six sources are independent, so they run concurrently (the shared IO pool, or the event
+        loop on the AsyncClient); the wall-clock time is roughly that of the slowest query. A source
+        that fails or times out (QUEST_SOURCE_TIMEOUT) keeps its default, so quests depending on it
+        just don't update."""
+        defaults = {
             "daily_hydrate_ml": 0,
             "daily_tasks_completed": 0, # Count completed SleepLog tasks today
             "daily_meals_logged": 0, # Count non-empty DietLog dishes today
@@ -80,191 +155,228 @@ class QuestService:
             "daily_checkin_done": False,
             "monthly_daily_quests_claimed": 0,
         }
-        try:
-            # Hydrate Log
-            hydrate_res = self.client.table("hydrate_logs").select("consumed_water").eq("user_id", user_id).eq("date", today_start.isoformat()).maybe_single().execute()
-            if hydrate_res.data:
-                dependent_data["daily_hydrate_ml"] = hydrate_res.data.get("consumed_water", 0)
-
-            # Daily Task Completion (Sleep Logs)
-            sleep_tasks_res = self.client.table("sleep_logs").select("id", count='exact').eq("user_id", user_id).eq("completed", True).gte("scheduled_time", today_start.isoformat() + " 00:00:00").lt("scheduled_time", (today_start + timedelta(days=1)).isoformat() + " 00:00:00").execute()
-            if sleep_tasks_res.count is not None:
-                 dependent_data["daily_tasks_completed"] = sleep_tasks_res.count
-
-            # Meal Logging (Diet Logs) - Check if 'dishes' JSON is not empty/null
-            # Note: JSON checks can be DB-specific. This checks if the key exists and is not an empty list/object.
-            # Adjust based on how you store empty dishes ('[]', '{}', or null)
-            diet_res = self.client.table("diet_logs").select("id", count='exact').eq("user_id", user_id).eq("date", today_start.isoformat()).not_.in_("dishes", ['[]', '{}']).not_.is_("dishes", None).execute()
-            if diet_res.count is not None:
-                 dependent_data["daily_meals_logged"] = diet_res.count
-                 
-            # Focus Logs - Sum of durations today
-            focus_res = self.client.table("focus_logs")\
-                .select("focus_done")\
-                .eq("user_id", user_id)\
-                .eq("date", today_start.isoformat())\
-                .execute()
-            if focus_res.data:
-                total_focus_min = sum(log.get("focus_done", 0) for log in focus_res.data)
-                dependent_data["daily_focus_minutes"] = total_focus_min
-
-
-             # Check-in Status (from xp_rewards)
-            xp_res = self.client.table("xp_rewards").select("last_checkin_date").eq("user_id", user_id).maybe_single().execute()
-            if xp_res.data and xp_res.data.get("last_checkin_date"):
-                 last_checkin = date.fromisoformat(xp_res.data["last_checkin_date"])
-                 if last_checkin == today_start:
-                     dependent_data["daily_checkin_done"] = True
-
-            # Monthly Quest Claims
-            start_of_month_iso = month_start.isoformat()
-            end_of_next_month_iso = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
-            # TODO: This still needs refinement - ideally join with quests table to ensure only 'daily' type quests are counted
-            count_res = self.client.table("user_quest_progress")\
-                .select("id", count='exact')\
-                .match({'user_id': user_id})\
-                .not_.is_("claimed_at", None)\
-                .gte("period_start_date", start_of_month_iso)\
-                .lt("period_start_date", end_of_next_month_iso)\
-                .execute()
-            if count_res.count is not None:
-                 dependent_data["monthly_daily_quests_claimed"] = count_res.count
-
-        except Exception as e:
-            print(f"Error fetching dependent data for user {user_id}: {e}")
-            # Return defaults on error, quests requiring this data won't update automatically
-        return dependent_data
+        sources = {
+            "daily_hydrate_ml": lambda: self._fetch_daily_hydrate_ml(client, user_id, today_start),
+            "daily_tasks_completed": lambda: self._fetch_daily_tasks_completed(client, user_id, today_start),
+            "daily_meals_logged": lambda: self._fetch_daily_meals_logged(client, user_id, today_start),
+            "daily_focus_minutes": lambda: self._fetch_daily_focus_minutes(client, user_id, today_start),
+            "daily_checkin_done": lambda: self._fetch_daily_checkin_done(client, user_id, today_start),
+            "monthly_daily_quests_claimed": lambda: self._fetch_monthly_daily_quests_claimed(client, user_id, month_start),
+        }
+        return (yield Parallel(sources, defaults, timeout=QUEST_SOURCE_TIMEOUT))
+
+    def dependent_data_from_rows(self, today_start: date, hydrate_logs: List[dict], sleep_logs: List[dict],
+                                 diet_logs: List[dict], focus_logs: List[dict], xp_rewards: Optional[dict],
+                                 monthly_daily_quests_claimed: int) -> Dict:
+        """Builds the same dict as _fetch_dependent_data from rows a caller has already loaded
+        (today's logs and the xp_rewards row), so they are not read a second time."""
+        today_iso = today_start.isoformat()
+        day_end = (today_start + timedelta(days=1)).isoformat()
+        last_checkin = (xp_rewards or {}).get("last_checkin_date")
+        return {
+            "daily_hydrate_ml": next((log.get("consumed_water", 0) for log in hydrate_logs if log.get("date") == today_iso), 0),
+            "daily_tasks_completed": sum(
+                1 for log in sleep_logs
+                if log.get("completed") and today_iso <= str(log.get("scheduled_time", ""))[:10] < day_end
+            ),
+            "daily_meals_logged": sum(
+                1 for log in diet_logs
+                if log.get("date") == today_iso and log.get("dishes") not in (None, [], {})
+            ),
+            "daily_focus_minutes": sum(log.get("focus_done", 0) for log in focus_logs if log.get("date") == today_iso),
+            "daily_checkin_done": bool(last_checkin) and str(last_checkin)[:10] == today_iso,
+            "monthly_daily_quests_claimed": monthly_daily_quests_claimed,
+        }
 
-    def get_quests_with_progress(self, user_id: str) -> List[QuestWithProgressResponse]:
-        """Fetches all active quests and the user's progress for the current period. Uses string IDs."""
+    # Trigger types whose progress refresh_quest_progress can recompute from the source data
+    REFRESHABLE_TRIGGERS = {'hydrate_goal', 'tasks_completed', 'log_meal', 'focus_time', 'checkin', 'monthly_daily_quests'}
+
+    def _refresh_rpc(self, client, user_id: str, trigger_type: str, today_start: date, month_start: date):
+        return client.rpc("refresh_quest_progress", {
+            "p_user_id": user_id,
+            "p_trigger_type": trigger_type,
+            "p_daily_start": today_start.isoformat(),
+            "p_monthly_start": month_start.isoformat(),
+        })
+
+    def _refresh_triggers(self, client, user_id: str, trigger_types, today_start: date, month_start: date):
+        """Recomputes the progress of ``trigger_types`` from the source data (missing rows are created),
+        one refresh_quest_progress rpc per trigger, run concurrently. A failed refresh keeps the stored rows."""
+        def refresh(trigger_type):
+            yield self._refresh_rpc(client, user_id, trigger_type, today_start, month_start)
+        sources = {trigger_type: (lambda trigger_type=trigger_type: refresh(trigger_type))
+                   for trigger_type in sorted(trigger_types)}
+        yield Parallel(sources, {name: None for name in sources}, timeout=QUEST_SOURCE_TIMEOUT)
+
+    # --- Pure helpers of quests_with_progress_flow ---
+    @staticmethod
+    def _period_start(quest: QuestResponse, today_start: date, month_start: date) -> str:
+        return (today_start if quest.type == 'daily' else month_start).isoformat()
+
+    def _missing_quests(self, quests: List[QuestResponse], progress_by_key: Dict[tuple, dict],
+                        today_start: date, month_start: date) -> List[QuestResponse]:
+        """Quests without a progress row for their current period."""
+        return [quest for quest in quests
+                if (quest.id, self._period_start(quest, today_start, month_start)) not in progress_by_key]
+
+    def _stale_triggers(self, quests: List[QuestResponse], progress_by_key: Dict[tuple, dict], live_data: Dict,
+                        today_start: date, month_start: date) -> set:
+        """Trigger types with an unclaimed stored row whose progress differs from the live data
+        (an update task that was lost or has not run yet)."""
+        stale = set()
+        for quest in quests:
+            row = progress_by_key.get((quest.id, self._period_start(quest, today_start, month_start)))
+            if row is None or row.get("claimed_at") is not None or quest.trigger_type not in self.REFRESHABLE_TRIGGERS:
+                continue
+            if row.get("current_progress") != self._compute_progress(quest, live_data):
+                stale.add(quest.trigger_type)
+        return stale
+
+    def _seed_rows(self, user_id: str, quests: List[QuestResponse], live_data: Dict,
+                   today_start: date, month_start: date) -> List[dict]:
+        return [{
+            "user_id": user_id,
+            "quest_id": quest.id,
+            "period_start_date": self._period_start(quest, today_start, month_start),
+            "current_progress": self._compute_progress(quest, live_data),
+        } for quest in quests]
+
+    def _with_progress(self, quests: List[QuestResponse], progress_by_key: Dict[tuple, dict],
+                       today_start: date, month_start: date) -> List[QuestWithProgressResponse]:
+        results: List[QuestWithProgressResponse] = []
+        for quest in quests:
+            progress_dict = progress_by_key.get((quest.id, self._period_start(quest, today_start, month_start)))
+
+            user_progress_model: Optional[UserQuestProgressResponse] = None
+            is_completed = False
+            is_claimable = False
+            if progress_dict:
+                user_progress_model = UserQuestProgressResponse.model_validate(progress_dict)
+                is_completed = user_progress_model.current_progress >= quest.target_progress
+                is_claimable = is_completed and user_progress_model.claimed_at is None
+            else:
+                print(f"Skipping auto-update for quest {quest.id} due to missing progress record.")
+
+            results.append(
+                QuestWithProgressResponse(
+                    **quest.model_dump(),
+                    user_progress=user_progress_model,
+                    is_completed=is_completed,
+                    is_claimable=is_claimable
+                )
+            )
+        return results
+
+    def get_quests_with_progress(self, user_id: str, live_data: Optional[Dict] = None) -> List[QuestWithProgressResponse]:
+        return run(self.quests_with_progress_flow(self.client, user_id, live_data))
+
+    def quests_with_progress_flow(self, client, user_id: str, live_data: Optional[Dict] = None):
+        """Fetches all active quests and the user's progress for the current period. Uses string IDs.
+
+        Progress is kept up to date by background tasks as the user's data changes, so this mostly
+        reads the stored rows of the current periods (one query). A task can be lost or still queued,
+        so the stored rows are checked against the source data too:
+        - callers that already hold the dependent data (see dependent_data_from_rows) pass it as
+          live_data, and the triggers whose rows disagree with it are recomputed;
+        - otherwise every trigger is recomputed from the source data (refresh_quest_progress) the first
+          time per QUEST_PROGRESS_REFRESH_TTL this worker serves the user's quests.
+        Rows that don't exist yet (first open of the day/month) are seeded from the dependent data
+        and created in one bulk insert."""
         try:
-            today_start, month_start = self._get_current_period_starts()
-
-            # 1. Fetch dependent data needed for updates
-            live_data = self._fetch_dependent_data(user_id, today_start, month_start)
+            today_start, month_start = yield from user_period_starts_flow(client, user_id)
 
-            # 2. Fetch all active quests
-            quests_res = self.client.table("quests").select("*").eq("is_active", True).execute()
-            if not quests_res.data:
+            # 1. Fetch all active quests
+            quests = list((yield from self.active_quests_flow(client)))
+            if not quests:
                 return []
 
-            results: List[QuestWithProgressResponse] = []
-
-            # 3. Get/Create/Update progress for each quest
-            for quest_dict in quests_res.data:
-                quest = QuestResponse.model_validate(quest_dict)
-                period_start = today_start if quest.type == 'daily' else month_start
-
-                # Get or create ensures we have a record for the *current* period
-                progress_dict = self._get_or_create_user_progress(user_id, quest.id, period_start)
-
-                current_progress_val = 0
-                if progress_dict:
-                    current_progress_val = progress_dict.get("current_progress", 0)
-                else:
-                    # If creation failed, skip automatic updates for this quest
-                     print(f"Skipping auto-update for quest {quest.id} due to missing progress record.")
-                     # Continue to process the quest with 0 progress
-
-                # --- Automatic Progress Updates Based on Live Data ---
-                updated_progress_required = False
-                if progress_dict and progress_dict.get("claimed_at") is None: # Only update if not claimed
-                    target_value = 0
-                    if quest.trigger_type == 'hydrate_goal':
-                        target_value = live_data["daily_hydrate_ml"]
-                    elif quest.trigger_type == 'tasks_completed':
-                         target_value = live_data["daily_tasks_completed"]
-                    elif quest.trigger_type == 'log_meal':
-                         target_value = live_data["daily_meals_logged"]
-                    elif quest.trigger_type == 'focus_time':
-                         target_value = live_data.get("daily_focus_minutes", 0)
-                    elif quest.trigger_type == 'checkin':
-                         target_value = 1 if live_data["daily_checkin_done"] else 0
-                    elif quest.trigger_type == 'monthly_daily_quests':
-                         target_value = live_data["monthly_daily_quests_claimed"]
-                    # Add more trigger types as needed
-
-                    # Update if the calculated progress is different from stored progress
-                    # Cap progress at target_progress for non-accumulative goals like checkin/log_meal
-                    effective_target = quest.target_progress if quest.trigger_type not in ['checkin', 'log_meal'] else 1
-                    final_progress = min(target_value, effective_target) # Use actual target from quest def
-
-                    if final_progress != current_progress_val:
-                        current_progress_val = final_progress
-                        progress_dict["current_progress"] = current_progress_val # Update dict for calculations below
-                        updated_progress_required = True
-
-                # --- Update DB if progress changed (and record exists) ---
-                if updated_progress_required and progress_dict:
-                    try:
-                        update_res = self.client.table("user_quest_progress")\
-                            .update({"current_progress": current_progress_val})\
-                            .eq("id", progress_dict["id"])\
-                            .execute()
-                        if not update_res.data:
-                            print(f"Warning: Failed to update progress in DB for quest {quest.id}, user {user_id}")
-                    except Exception as update_e:
-                         print(f"DB Error updating progress for quest {quest.id}, user {user_id}: {update_e}")
-
-                # --- Calculate final state ---
-                user_progress_model: Optional[UserQuestProgressResponse] = None
-                is_completed = False
-                is_claimable = False
-                if progress_dict:
-                    # Use the potentially updated progress value
-                    progress_dict['current_progress'] = current_progress_val
-                    user_progress_model = UserQuestProgressResponse.model_validate(progress_dict)
-                    is_completed = user_progress_model.current_progress >= quest.target_progress
-                    is_claimable = is_completed and user_progress_model.claimed_at is None
-
-
-                results.append(
-                    QuestWithProgressResponse(
-                        **quest.model_dump(),
-                        user_progress=user_progress_model,
-                        is_completed=is_completed,
-                        is_claimable=is_claimable
-                    )
-                )
-
-            return results
+            # 2. Recompute the progress from the source data when it was not checked lately in this worker
+            if live_data is None and self.progress_refreshed.get(user_id) != today_start:
+                triggers = {quest.trigger_type for quest in quests} & self.REFRESHABLE_TRIGGERS
+                yield from self._refresh_triggers(client, user_id, triggers, today_start, month_start)
+                self.progress_refreshed.set(user_id, today_start)
+
+            # 3. Load the user's progress for the current daily and monthly periods in one go
+            progress_by_key = yield from self._load_period_progress(client, user_id, today_start, month_start)
+            if live_data is not None:
+                stale = self._stale_triggers(quests, progress_by_key, live_data, today_start, month_start)
+                if stale:
+                    yield from self._refresh_triggers(client, user_id, stale, today_start, month_start)
+                    progress_by_key = yield from self._load_period_progress(client, user_id, today_start, month_start)
+
+            # 4. Seed the rows that are missing for the current period
+            missing = self._missing_quests(quests, progress_by_key, today_start, month_start)
+            if missing:
+                if live_data is None:
+                    live_data = yield from self._fetch_dependent_data(client, user_id, today_start, month_start)
+                new_rows = self._seed_rows(user_id, missing, live_data, today_start, month_start)
+                try:
+                    # ignore_duplicates: a row created meanwhile by update_quest_progress is kept as is
+                    insert_res = yield client.table("user_quest_progress")\
+                        .upsert(new_rows, on_conflict="user_id,quest_id,period_start_date", ignore_duplicates=True)
+                    for row in insert_res.data or []:
+                        progress_by_key[(row["quest_id"], row["period_start_date"])] = row
+                    if len(insert_res.data or []) < len(new_rows):
+                        progress_by_key = yield from self._load_period_progress(client, user_id, today_start, month_start)
+                except Exception as insert_e:
+                    # New rows are returned without progress
+                    print(f"DB Error creating quest progress for user {user_id}: {insert_e}")
+
+            # 5. Calculate final state
+            return self._with_progress(quests, progress_by_key, today_start, month_start)
 
         except Exception as e:
             print(f"Error fetching quests with progress: {e}")
             raise ServiceError(str(e) if DEBUG else "Failed to load quests", 500)
 
-    # --- update_quest_progress (Called by other services - Requires Dependency Injection or Event Bus ideally) ---
-    # This is the method other services *should* call.
-    # For now, it's less critical as get_quests_with_progress recalculates based on triggers.
-    def update_quest_progress(self, user_id: str, trigger_type: str, increment: int = 1, value: Optional[int] = None):
+    # --- Trigger-driven progress updates (emitted by the habit/check-in services through task_queue) ---
+    def _has_active_trigger(self, trigger_type: str) -> bool:
+        return any(quest.trigger_type == trigger_type for quest in self.get_active_quests())
+
+    def update_quest_progress(self, user_id: str, trigger_type: str, increment: int = 1, value: Optional[int] = None,
+                              day: Optional[str] = None) -> List[dict]:
         """
-        Updates progress for relevant quests based on a trigger type.
-        'increment' adds to existing progress. 'value' sets the progress directly.
-        NOTE: This requires careful implementation to avoid race conditions if called frequently.
-              The get_quests_with_progress method currently handles most updates by recalculating.
+        Updates progress for the active quests with this trigger_type in the periods of ``day`` (the user's
+        date when the task was enqueued, ISO; default today), so a task replayed after midnight still counts
+        for the day it belongs to. 'increment' adds to existing progress. 'value' sets the progress directly.
+        Runs as one conditional UPDATE in the database (database/018_quest_progress_from_source.sql):
+        missing period rows are created, claimed rows are left alone and progress is capped at the
+        target. 'value' may lower the progress of an unclaimed row.
+        Returns the rows that changed.
         """
-        print(f"Placeholder: update_quest_progress called for user {user_id}, trigger {trigger_type}, increment {increment}, value {value}")
-        # 1. Find active quests matching the trigger_type.
-        # 2. Determine the correct period_start_date (daily/monthly).
-        # 3. Get or create the user_quest_progress record for that period.
-        # 4. If the quest is not already claimed:
-        #    - Calculate the new progress (either add increment or set value, ensuring not to exceed target).
-        #    - Update the record in the database.
-        # This requires careful handling of concurrency and is less reliable than the fetch-time calculation
-        # used in get_quests_with_progress without proper transactional updates or event sourcing.
-        pass
-
+        if not self._has_active_trigger(trigger_type):
+            return []
+        today_start, month_start = self._task_period_starts(user_id, day)
+        res = self.client.rpc("apply_quest_progress", {
+            "p_user_id": user_id,
+            "p_trigger_type": trigger_type,
+            "p_daily_start": today_start.isoformat(),
+            "p_monthly_start": month_start.isoformat(),
+            "p_increment": increment,
+            "p_value": None if value is None else int(value),
+        }).execute()
+        return res.data or []
+
+    def refresh_quest_progress(self, user_id: str, trigger_type: str, day: Optional[str] = None) -> List[dict]:
+        """Sets the progress of trigger_type's quests for ``day`` (see update_quest_progress) to the value
+        recomputed from the source data, so it also goes down when that data does (habit reset, task
+        unchecked). One rpc that locks the progress rows before reading the source, so concurrent or
+        replayed refreshes end on the latest value. The handler the services enqueue after changing their data."""
+        if not self._has_active_trigger(trigger_type):
+            return []
+        today_start, month_start = self._task_period_starts(user_id, day)
+        res = self._refresh_rpc(self.client, user_id, trigger_type, today_start, month_start).execute()
+        return res.data or []
 
     def claim_quest_reward(self, user_id: str, quest_id: str) -> XpRewardsData:
         """Claims the reward for a completed quest for the current period. Uses string IDs."""
         # (Keep the Warning about atomicity)
         try:
-            today_start, month_start = self._get_current_period_starts()
+            today_start, month_start = self._get_current_period_starts(user_id)
 
             # 1. Get Quest Definition
-            quest_res = self.client.table("quests").select("*").eq("id", quest_id).eq("is_active", True).maybe_single().execute()
-            if not quest_res.data: raise ServiceError("Quest not found or not active", 404)
-            quest = QuestResponse.model_validate(quest_res.data)
+            quest = next((q for q in self.get_active_quests() if q.id == quest_id), None)
+            if quest is None: raise ServiceError("Quest not found or not active", 404)
 
             # 2. Get Current Period Progress
             period_start = today_start if quest.type == 'daily' else month_start
@@ -278,8 +390,8 @@ class QuestService:
             # Recalculate completion based on current state, especially for aggregate quests
             is_completed = False
             if quest.trigger_type == 'monthly_daily_quests':
-                 live_data = self._fetch_dependent_data(user_id, today_start, month_start)
-                 is_completed = live_data["monthly_daily_quests_claimed"] >= quest.target_progress
+                 claimed = self._monthly_claims_query(self.client, user_id, month_start).execute().count or 0
+                 is_completed = claimed >= quest.target_progress
             # TODO: Add similar recalculations for other trigger types if their progress might change
             # between fetch and claim (e.g., tasks_completed)
             elif quest.trigger_type in ['hydrate_goal', 'log_meal', 'checkin']:
@@ -305,6 +417,9 @@ class QuestService:
             progress_update_res = self.client.table("user_quest_progress").update({"claimed_at": claim_time.isoformat()}).eq("id", progress.id).execute()
             if not progress_update_res.data: raise ServiceError("Failed to finalize claim status", 500) # See warning in previous version
 
+            # Claims count towards the monthly quest
+            task_queue.enqueue("quest_progress_refresh", user_id, "monthly_daily_quests", today_start.isoformat())
+
             updated_rewards = xp_reward_service.get_rewards(user_id)
             return XpRewardsData.model_validate(updated_rewards)
 
@@ -313,4 +428,6 @@ class QuestService:
             print(f"Error claiming quest {quest_id} reward for user {user_id}: {e}")
             raise ServiceError(str(e) if DEBUG else "Failed to claim reward", 500)
 
-quest_service = QuestService()
\ No newline at end of file
+quest_service = QuestService()
+task_queue.register("quest_progress", quest_service.update_quest_progress)
+task_queue.register("quest_progress_refresh", quest_service.refresh_quest_progress)
\ No newline at end of file
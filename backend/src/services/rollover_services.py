@@ -0,0 +1,229 @@
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, timezone, timedelta
+from ..utils import supabase, ServiceError, ROLLOVER_CHUNK_SIZE, ROLLOVER_PARALLELISM, ROLLOVER_LEASE_SECONDS, \
+    ROLLOVER_PRECREATE_LOGS, DEFAULT_TIME_ZONE, is_valid_time_zone, local_today, period_starts
+from .quest_services import quest_service
+from .daily_logs import today_log_rows, upsert_today_logs
+
+class RolloverService:
+    """Rollover lúc 00:00 của 1 múi giờ: xóa log cũ của các user ở múi giờ đó. Với ROLLOVER_PRECREATE_LOGS
+    còn tạo trước log và quest progress của ngày mới (mặc định chúng được tạo khi user dùng lần đầu, xem
+    daily_logs). run_due() chạy rollover cho mọi múi giờ vừa qua nửa đêm, nên tải trải ra theo múi giờ.
+
+    Thay cho các hàm cron generate_daily_*_logs / reset_user_quest_progress (1 transaction lớn cho
+    mọi user với NOT EXISTS). User được chia thành các chunk theo khoảng user_id (keyset), mỗi chunk
+    là vài câu lệnh ngắn giới hạn trong khoảng đó, chạy song song tối đa ``parallelism`` chunk.
+    Tiến độ lưu trong rollover_runs (database/015_rollover_runs.sql) nên chạy lại sau khi crash sẽ
+    tiếp tục từ chunk chưa xong; mọi bước đều idempotent nên làm lại 1 chunk không sinh dòng trùng."""
+
+    def __init__(self):
+        self.client = supabase
+
+    def _now(self):
+        return datetime.now(timezone.utc)
+
+    # --- Lease: chỉ 1 worker chạy rollover của 1 (ngày, múi giờ) tại 1 thời điểm ---
+    def _acquire(self, day: date, time_zone: str, owner: str, restart: bool):
+        self.client.table("rollover_runs").upsert({"day": day.isoformat(), "time_zone": time_zone},
+                                                  on_conflict="day,time_zone", ignore_duplicates=True).execute()
+        now = self._now()
+        changes = {"lease_owner": owner, "lease_until": (now + timedelta(seconds=ROLLOVER_LEASE_SECONDS)).isoformat()}
+        if restart:
+            changes.update(last_user_id=None, users_done=0, chunks_done=0, rows_written=0, finished_at=None,
+                           started_at=now.isoformat())
+        response = self.client.table("rollover_runs").update(changes) \
+            .eq("day", day.isoformat()) \
+            .eq("time_zone", time_zone) \
+            .or_(f'lease_until.is.null,lease_until.lt."{now.isoformat()}"') \
+            .execute()
+        if not response.data:
+            raise ServiceError(f"Rollover of {day} ({time_zone}) is already running", 409)
+        return response.data[0]
+
+    def _save_progress(self, run: dict, owner: str, finished: bool = False):
+        changes = {key: run[key] for key in ("last_user_id", "users_done", "chunks_done", "rows_written")}
+        if finished:
+            changes.update(finished_at=self._now().isoformat(), lease_owner=None, lease_until=None)
+        else:
+            changes["lease_until"] = (self._now() + timedelta(seconds=ROLLOVER_LEASE_SECONDS)).isoformat()
+        response = self.client.table("rollover_runs").update(changes) \
+            .eq("day", run["day"]) \
+            .eq("time_zone", run["time_zone"]) \
+            .eq("lease_owner", owner) \
+            .execute()
+        if not response.data:
+            raise ServiceError(f"Lost the lease of the rollover of {run['day']} ({run['time_zone']})", 409)
+        run.update(response.data[0])
+
+    # --- Chunk ---
+    def _next_chunk(self, time_zone, after, chunk_size):
+        """user_id của chunk tiếp theo của múi giờ (sau ``after``), theo thứ tự id: dùng index
+        (time_zone, user_id) của profiles, không offset"""
+        query = self.client.table("profiles").select("user_id").eq("time_zone", time_zone)
+        if after:
+            query = query.gt("user_id", after)
+        return [row["user_id"] for row in query.order("user_id").limit(chunk_size).execute().data or []]
+
+    def _in_chunk(self, query, after, last):
+        query = query.lte("user_id", last)
+        return query.gt("user_id", after) if after else query
+
+    def _process_chunk(self, time_zone, after, user_ids, today: date, month_start: date, quests):
+        """Rollover cho các user của ``time_zone`` trong khoảng (after, user_ids[-1]]. Trả về số dòng đã tạo."""
+        last = user_ids[-1]
+
+        # 1. Tổng hợp log của các ngày trước vào daily_summaries rồi xóa chúng, cùng progress của các tháng
+        # trước. Khoảng id còn chứa user của múi giờ khác (ngày của họ có thể chưa sang): hàm SQL chỉ đụng tới
+        # user thuộc time_zone, trong 1 round trip và 1 transaction (database/020_purge_folds_summaries.sql)
+        self.client.rpc("purge_rollover_chunk", {
+            "p_time_zone": time_zone,
+            "p_after": after,
+            "p_last": last,
+            "p_today": today.isoformat(),
+            "p_month_start": month_start.isoformat(),
+        }).execute()
+
+        if not ROLLOVER_PRECREATE_LOGS:
+            # Log và quest progress của ngày mới được tạo khi user dùng lần đầu (daily_logs, apply_quest_progress)
+            return 0
+
+        # 2. Habit của các user trong chunk: 1 truy vấn / bảng (theo khoảng id, bỏ user của múi giờ khác)
+        written = 0
+        members = set(user_ids)
+        for domain in ("sleep", "hydrate", "diet", "focus"):
+            habits = self._in_chunk(self.client.table(f"{domain}_habits").select("*"), after, last).execute().data or []
+            habits = [habit for habit in habits if habit["user_id"] in members]
+            rows = [row for habit in habits for row in today_log_rows(domain, habit, today)]
+            # 3. Log hôm nay: upsert bỏ qua dòng đã có (unique theo TODAY_LOG_CONFLICT), thay cho NOT EXISTS
+            if rows:
+                written += len(upsert_today_logs(self.client, domain, rows).execute().data or [])
+
+        # 4. Quest progress của kỳ hiện tại cho mọi user trong chunk (thay cho CROSS JOIN users x quests)
+        progress = [
+            {"user_id": user_id, "quest_id": quest.id, "current_progress": 0,
+             "period_start_date": (today if quest.type == "daily" else month_start).isoformat()}
+            for user_id in user_ids
+            for quest in quests
+        ]
+        if progress:
+            response = self.client.table("user_quest_progress") \
+                .upsert(progress, on_conflict="user_id,quest_id,period_start_date", ignore_duplicates=True) \
+                .execute()
+            written += len(response.data or [])
+        return written
+
+    def run(self, day=None, chunk_size=None, parallelism=None, restart=False, time_zone=None):
+        """Chạy (hoặc tiếp tục) rollover của ``day`` cho các user ở ``time_zone`` (mặc định
+        DEFAULT_TIME_ZONE; ``day`` mặc định là hôm nay ở múi giờ đó).
+
+        In thông lượng của từng chunk, lưu tiến độ sau mỗi chunk liên tiếp đã xong và trả về
+        dòng rollover_runs cuối cùng."""
+        chunk_size = chunk_size or ROLLOVER_CHUNK_SIZE
+        parallelism = parallelism or ROLLOVER_PARALLELISM
+        time_zone = time_zone or DEFAULT_TIME_ZONE
+        if not is_valid_time_zone(time_zone):
+            raise ServiceError(f"Unknown time zone {time_zone}", 400)
+        today, month_start = period_starts(time_zone)
+        if day is not None:
+            today, month_start = day, day.replace(day=1)
+        label = f"{today} ({time_zone})"
+        owner = uuid.uuid4().hex
+        run = self._acquire(today, time_zone, owner, restart)
+        if run.get("finished_at"):
+            print(f"Rollover {label}: already finished ({run['users_done']} users)")
+            self.client.table("rollover_runs").update({"lease_owner": None, "lease_until": None}) \
+                .eq("day", today.isoformat()) \
+                .eq("time_zone", time_zone) \
+                .eq("lease_owner", owner) \
+                .execute()
+            return run
+
+        quests = quest_service.get_active_quests()
+        started = time.perf_counter()
+        if run.get("last_user_id"):
+            print(f"Rollover {label}: resuming after user {run['last_user_id']} ({run['users_done']} users done)")
+
+        pending = deque()  # (chunk number, last user id, user count, future), theo thứ tự id
+        after = run.get("last_user_id")
+        number = run.get("chunks_done", 0)
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="rollover") as executor:
+            def submit(after, user_ids, number):
+                def timed():
+                    chunk_started = time.perf_counter()
+                    rows = self._process_chunk(time_zone, after, user_ids, today, month_start, quests)
+                    return rows, time.perf_counter() - chunk_started
+                pending.append((number, user_ids[-1], len(user_ids), executor.submit(timed)))
+
+            def checkpoint():
+                # Chỉ lưu đến chunk cuối cùng mà mọi chunk trước nó đều đã xong
+                while pending and pending[0][3].done():
+                    number, last_id, users, future = pending.popleft()
+                    rows, seconds = future.result()  # lỗi của chunk: dừng, lần chạy sau làm lại từ checkpoint
+                    run.update(last_user_id=last_id, users_done=run["users_done"] + users,
+                               chunks_done=run["chunks_done"] + 1, rows_written=run["rows_written"] + rows)
+                    self._save_progress(run, owner)
+                    print(f"Rollover {label} chunk {number}: {users} users, {rows} rows in {seconds:.2f}s "
+                          f"({users / seconds if seconds else 0:.0f} users/s)")
+
+            try:
+                while True:
+                    user_ids = self._next_chunk(time_zone, after, chunk_size)
+                    if not user_ids:
+                        break
+                    number += 1
+                    submit(after, user_ids, number)
+                    after = user_ids[-1]
+                    # Tối đa ``parallelism`` chunk đang chạy, và không đi trước chunk chưa xong cũ nhất quá xa
+                    while True:
+                        running = [item[3] for item in pending if not item[3].done()]
+                        if len(running) < parallelism and len(pending) < 2 * parallelism:
+                            break
+                        wait(running or [pending[0][3]], return_when=FIRST_COMPLETED)
+                        checkpoint()
+                wait([item[3] for item in pending])
+                checkpoint()
+            except BaseException:
+                for item in pending:
+                    item[3].cancel()
+                raise
+
+        self._save_progress(run, owner, finished=True)
+        elapsed = time.perf_counter() - started
+        print(f"Rollover {label}: {run['users_done']} users in {run['chunks_done']} chunks, "
+              f"{run['rows_written']} rows, {elapsed:.2f}s")
+        return run
+
+    def run_due(self, chunk_size=None, parallelism=None):
+        """Rollover cho mọi múi giờ đang có user mà ngày hiện tại (giờ địa phương) chưa được rollover xong.
+
+        Gọi định kỳ (vd. mỗi 15 phút, xem README): mỗi múi giờ được xử lý ngay sau 00:00 của nó, nên
+        user được chia theo múi giờ thay vì cùng rollover 1 lúc. Múi giờ đang được worker khác chạy
+        thì bỏ qua. Trả về các dòng rollover_runs đã chạy."""
+        zones = self.client.rpc("rollover_time_zones", {}).execute().data or []
+        days = {row["time_zone"]: local_today(row["time_zone"])
+                for row in zones if is_valid_time_zone(row["time_zone"])}
+        if not days:
+            return []
+        finished = self.client.table("rollover_runs").select("day, time_zone") \
+            .in_("time_zone", sorted(days)) \
+            .gte("day", min(days.values()).isoformat()) \
+            .not_.is_("finished_at", "null") \
+            .execute().data or []
+        done = {(row["time_zone"], str(row["day"])) for row in finished}
+
+        runs = []
+        for time_zone, today in sorted(days.items()):
+            if (time_zone, today.isoformat()) in done:
+                continue
+            try:
+                runs.append(self.run(today, chunk_size, parallelism, time_zone=time_zone))
+            except ServiceError as e:
+                if e.status_code != 409:
+                    raise
+                print(f"Rollover {today} ({time_zone}): {e.message}")
+        return runs
+
+rollover_service = RolloverService()
@@ -1,6 +1,6 @@
-from datetime import datetime, timezone, timedelta
-from ..utils import supabase, ServiceError, DEBUG
-from .xp_reward_services import xp_reward_service
+from ..utils import supabase, ServiceError, DEBUG, habit_cache, task_queue, user_today, user_today_flow, Cached, Call, run
+from .daily_logs import TODAY_LOG_CONFLICT, materialize_today, ensure_today, remember_materialized
+from .history_services import history_service
 
 class SleepService:
     def __init__(self):
@@ -20,38 +20,51 @@ class SleepService:
             ).execute()
             if not habit_response.data:
                 raise ServiceError("Database server error", 500)
+            habit_cache.invalidate(("sleep", user_id))
 
-            # Xóa Sleep Logs hôm nay (tránh trùng lặp)
-            # today của múi giờ utc+7
-            today = datetime.now(timezone(timedelta(hours=7))).date()
-            self.client.table("sleep_logs").delete().eq("user_id", user_id).gte("scheduled_time", today).execute()
-
-            # Tạo Sleep Logs hôm nay
+            # Ghi đè Sleep Logs hôm nay (upsert theo unique (user_id, task_type, date): tạo mới nếu chưa có).
+            # Giờ thức dậy cùng ngày với giờ ngủ, như cron 004 và provision_user
+            # today theo múi giờ của user
+            today = user_today(user_id)
             sleep_log = {
                 "user_id": user_id,
                 "task_type": "sleep",
                 "scheduled_time": f"{today} {sleep_time}",
+                "completed": False,
             }
             wakeup_log = {
                 "user_id": user_id,
                 "task_type": "wakeup",
                 "scheduled_time": f"{today} {wakeup_time}",
+                "completed": False,
             }
-            logs_response = self.client.table("sleep_logs").insert([sleep_log, wakeup_log]).execute()
+            logs_response = self.client.table("sleep_logs").upsert(
+                [sleep_log, wakeup_log], on_conflict=TODAY_LOG_CONFLICT["sleep"]
+            ).execute()
             if not logs_response.data:
                 raise ServiceError("Database server error", 500)
-            
-            return habit_response.data[0]
+            remember_materialized("sleep", user_id, today)
         except ServiceError:
             raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Log hôm nay vừa về 0: quest của ngày cũng phải giảm theo (sau try, như update_log_flow)
+        task_queue.enqueue("quest_progress_refresh", user_id, "tasks_completed", today.isoformat())
+        return habit_response.data[0]
+
     def get_sleep_habit(self, user_id):
+        return run(self.habit_flow(self.client, user_id))
+
+    def habit_flow(self, client, user_id):
+        # Đọc qua cache: lần đọc trúng cache không tốn truy vấn nào. set_sleep_habit xóa entry của worker này;
+        # worker khác thấy habit mới sau tối đa HABIT_CACHE_TTL giây
+        return (yield Cached(habit_cache, ("sleep", user_id), lambda: self._load_sleep_habit(client, user_id)))
+
+    def _load_sleep_habit(self, client, user_id):
         try:
-            response = self.client.table("sleep_habits").select("*") \
-                .eq("user_id", user_id) \
-                .execute()
+            response = yield client.table("sleep_habits").select("*") \
+                .eq("user_id", user_id)
             if not response.data:
                 raise ServiceError("Sleep habit not found", 404)
             return response.data[0]
@@ -65,17 +78,28 @@ class SleepService:
 
 
     def get_sleep_logs_today(self, user_id):
-        # today của múi giờ utc+7
-        today = datetime.now(timezone(timedelta(hours=7))).date()
+        return run(self.logs_today_flow(self.client, user_id))
+
+    def logs_today_flow(self, client, user_id):
+        # today theo múi giờ của user
+        today = yield from user_today_flow(client, user_id)
         try:
-            response = self.client.table("sleep_logs").select("*") \
+            response = yield client.table("sleep_logs").select("*") \
                 .eq("user_id", user_id) \
                 .gte("scheduled_time", f"{today} 00:00:00") \
-                .lt("scheduled_time", f"{today} 23:59:59") \
-                .execute()
-
+                .lt("scheduled_time", f"{today} 23:59:59")
+
+            # Lần đầu dùng trong ngày: tạo log sleep/wakeup hôm nay từ habit (log wakeup có thể đã có
+            # từ lúc đăng ký, chỉ thêm log còn thiếu)
+            if {row["task_type"] for row in response.data} != {"sleep", "wakeup"} \
+                    and (yield from materialize_today(client, "sleep", user_id, today, self.habit_flow)):
+                response = yield client.table("sleep_logs").select("*") \
+                    .eq("user_id", user_id) \
+                    .gte("scheduled_time", f"{today} 00:00:00") \
+                    .lt("scheduled_time", f"{today} 23:59:59")
             if not response.data:
                 raise ServiceError("No sleep logs found for today", 404)
+            remember_materialized("sleep", user_id, today)
             return response.data
         except ServiceError:
             raise
@@ -86,53 +110,37 @@ class SleepService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def get_sleep_logs_week(self, user_id):
-        # today của múi giờ utc+7
-        today = datetime.now(timezone(timedelta(hours=7))).date()
-        monday = today - timedelta(days=today.weekday())  # Lấy thứ 2 của tuần này
-        
-        try:
-            response = self.client.table("sleep_logs").select("*") \
-                .eq("user_id", user_id) \
-                .gte("scheduled_time", f"{monday} 00:00:00") \
-                .lt("scheduled_time", f"{today} 23:59:59") \
-                .execute()
+        # Từ thứ 2 tuần này đến hôm nay (theo múi giờ của user); log của các ngày trước đã bị rollover xóa
+        # nên các ngày đó là dòng tổng hợp ngày (xem history_services.HISTORY_DOMAINS)
+        logs = history_service.get_week(user_id, "sleep")
+        if not logs:
+            raise ServiceError("No sleep logs found for this week", 404)
+        return logs
 
-            if not response.data:
-                raise ServiceError("No sleep logs found for this week", 404)
-            return response.data
-        except ServiceError:
-            raise
-        except Exception as e:
-            error_message = str(e).lower()
-            if "0 rows" in error_message:
-                raise ServiceError("No sleep logs found for this week", 404)
-            raise ServiceError(str(e) if DEBUG else "Database server error", 500)
-    
     def update_sleep_log_completion(self, user_id, log_id):
+        return run(self.update_log_flow(self.client, user_id, log_id))
+
+    def update_log_flow(self, client, user_id, log_id):
         try:
+            today = yield from user_today_flow(client, user_id)
+            yield from ensure_today(client, "sleep", user_id, today, self.habit_flow)
             # Kiểm tra log đúng định dạng uuid chưa
             if not log_id or len(log_id) != 36:
                 raise ServiceError("Sleep log not found", 404)
             
-            log_response = self.client.table("sleep_logs").select("id, user_id") \
+            log_response = yield client.table("sleep_logs").select("id, user_id") \
                 .eq("id", log_id) \
-                .eq("user_id", user_id) \
-                .execute()
+                .eq("user_id", user_id)
 
             if not log_response.data:
                 raise ServiceError("Sleep log not found", 404)
 
             # Cập nhật trạng thái completed
-            updated_response = self.client.table("sleep_logs").update({"completed": True}) \
-                .eq("id", log_id) \
-                .execute()
+            updated_response = yield client.table("sleep_logs").update({"completed": True}) \
+                .eq("id", log_id)
 
             if not updated_response.data:
                 raise ServiceError("Database server error", 500)
-            
-            xp_reward_service.update_streak(user_id)
-
-            return updated_response.data[0]
         except ServiceError:
             raise
         except Exception as e:
@@ -141,5 +149,12 @@ class SleepService:
                 raise ServiceError("Sleep log not found", 404)
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
+        # Sau try: log đã được ghi, nên việc xếp tác vụ nền không được biến thành lỗi 500 (client gửi lại sẽ
+        # bị tính 2 lần); enqueue tự ghi log lỗi của nó.
+        # Ghi ngày vào payload: tác vụ chạy lại từ spool hoặc retry sau nửa đêm vẫn tính cho hôm nay
+        yield Call(task_queue.enqueue, "credit_streak", user_id, today.isoformat())
+        yield Call(task_queue.enqueue, "quest_progress_refresh", user_id, "tasks_completed", today.isoformat())
+        return updated_response.data[0]
+
 
 sleep_service = SleepService()
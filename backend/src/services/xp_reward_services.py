@@ -1,9 +1,16 @@
-from datetime import datetime, timedelta, timezone, date
-from ..utils import supabase, ServiceError, DEBUG
+from datetime import datetime, date
+from ..utils import supabase, ServiceError, DEBUG, STREAK_MEMO_MAX_ENTRIES, LRUCache, task_queue, user_today, user_today_flow, run
 
 class XPRewardService:
     def __init__(self):
         self.client = supabase
+        # user_id -> ngày (theo múi giờ của user) đã cộng streak; sang ngày mới entry cũ không còn khớp,
+        # TTL 24h chỉ để giải phóng bộ nhớ
+        self.streak_memo = LRUCache("streak_credited", STREAK_MEMO_MAX_ENTRIES, ttl=24 * 60 * 60)
+
+    def _remember_streak(self, user_id, today):
+        """Nhớ user đã được cộng streak hôm nay"""
+        self.streak_memo.set(user_id, today)
 
     def _format_dates(self, data):
         """Chuyển đổi các trường date về ISO format string"""
@@ -12,39 +19,50 @@ class XPRewardService:
                 data[field] = data[field].isoformat()
         return data
 
+    def _default_rewards(self, user_id):
+        return {
+            "user_id": user_id,
+            "last_checkin_date": datetime(2000, 1, 1).date().isoformat(),
+            "last_streak_date": datetime(2000, 1, 1).date().isoformat(),
+        }
+
+    def _with_resets(self, data, today):
+        """daily_checkin và streak về 0 nếu đã bỏ qua ít nhất 1 ngày"""
+        last_checkin_date = datetime.fromisoformat(data["last_checkin_date"]).date()
+        last_streak_date = datetime.fromisoformat(data["last_streak_date"]).date()
+
+        # Reset nếu bỏ qua 1 ngày
+        if (today - last_checkin_date).days > 1:
+            data["daily_checkin"] = 0
+        if (today - last_streak_date).days > 1:
+            data["streak"] = 0
+
+        return self._format_dates(data)
+
     def get_rewards(self, user_id):
+        return run(self.rewards_flow(self.client, user_id))
+
+    def rewards_flow(self, client, user_id):
+        # Chạy được trên cả client sync lẫn AsyncClient (utils/flow.py, services/async_services.py)
         try:
-            today = datetime.now(timezone(timedelta(hours=7))).date()
+            today = yield from user_today_flow(client, user_id)
 
-            response = self.client.table("xp_rewards").select("*").eq("user_id", user_id).execute()
+            response = yield client.table("xp_rewards").select("*").eq("user_id", user_id)
             if not response.data:
-                new_data = {
-                    "user_id": user_id,
-                    "last_checkin_date": datetime(2000, 1, 1).date().isoformat(),
-                    "last_streak_date": datetime(2000, 1, 1).date().isoformat(),
-                }
-                insert_resp = self.client.table("xp_rewards").insert(new_data).execute()
+                insert_resp = yield client.table("xp_rewards").insert(self._default_rewards(user_id))
                 if not insert_resp.data:
                     raise ServiceError("Database server error", 500)
                 return self._format_dates(insert_resp.data[0])
 
-            data = response.data[0]
-            last_checkin_date = datetime.fromisoformat(data["last_checkin_date"]).date()
-            last_streak_date = datetime.fromisoformat(data["last_streak_date"]).date()
-
-            # Reset nếu bỏ qua 1 ngày
-            if (today - last_checkin_date).days > 1:
-                data["daily_checkin"] = 0
-            if (today - last_streak_date).days > 1:
-                data["streak"] = 0
-
-            return self._format_dates(data)
+            return self._with_resets(response.data[0], today)
+        except ServiceError:
+            raise
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
     def update_checkin(self, user_id):
         try:
-            today = datetime.now(timezone(timedelta(hours=7))).date()
+            today = user_today(user_id)
             response = self.client.table("xp_rewards").select("*").eq("user_id", user_id).execute()
             if not response.data:
                 raise ServiceError("XP Rewards not found", 404)
@@ -79,7 +97,9 @@ class XPRewardService:
             if not updated.data:
                 raise ServiceError("Database server error", 500)
             
-            self.update_streak(user_id)
+            # Ghi ngày vào payload: tác vụ chạy lại từ spool hoặc retry sau nửa đêm vẫn tính cho hôm nay
+            task_queue.enqueue("credit_streak", user_id, today.isoformat())
+            task_queue.enqueue("quest_progress", user_id, "checkin", value=1, day=today.isoformat())
 
             return self._format_dates(updated.data[0])
         except ServiceError:
@@ -87,9 +107,18 @@ class XPRewardService:
         except Exception as e:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
-    def update_streak(self, user_id):
+    def credit_streak(self, user_id, day=None):
+        """Cộng streak cho ngày ``day`` (ISO, ghi lúc enqueue; mặc định hôm nay) sau một hành động của user.
+        Nếu worker này đã cộng cho user ngày đó (hoặc ngày sau) thì bỏ qua hoàn toàn (không đọc, không ghi) và trả về None."""
+        today = date.fromisoformat(day) if day else user_today(user_id)
+        credited = self.streak_memo.get(user_id)
+        if credited is not None and credited >= today:
+            return None
+        return self.update_streak(user_id, today)
+
+    def update_streak(self, user_id, today=None):
         try:
-            today = datetime.now(timezone(timedelta(hours=7))).date()
+            today = today or user_today(user_id)
             response = self.client.table("xp_rewards").select("*").eq("user_id", user_id).execute()
             if not response.data:
                 raise ServiceError("XP Rewards not found", 404)
@@ -97,12 +126,14 @@ class XPRewardService:
             data = response.data[0]
             last_streak_date = datetime.fromisoformat(data["last_streak_date"]).date()
 
+            # Đã cộng streak ngày này (hoặc tác vụ cũ chạy lại sau khi ngày sau đã được cộng): không cần ghi lại
+            if last_streak_date >= today:
+                self._remember_streak(user_id, last_streak_date)
+                return self._format_dates(data)
+
             if (today - last_streak_date).days > 1:
                 data["streak"] = 0
-            if last_streak_date != today:
-                streak = data["streak"] + 1
-            else:
-                streak = data["streak"]
+            streak = data["streak"] + 1
 
             update_data = {
                 "streak": streak,
@@ -112,6 +143,7 @@ class XPRewardService:
             updated = self.client.table("xp_rewards").update(update_data).eq("user_id", user_id).execute()
             if not updated.data:
                 raise ServiceError("Database server error", 500)
+            self._remember_streak(user_id, today)
 
             return self._format_dates(updated.data[0])
         except ServiceError:
@@ -120,3 +152,6 @@ class XPRewardService:
             raise ServiceError(str(e) if DEBUG else "Database server error", 500)
 
 xp_reward_service = XPRewardService()
+
+# Chạy nền sau khi request ghi log/check-in trả về (xem src/utils/tasks.py)
+task_queue.register("credit_streak", xp_reward_service.credit_streak)
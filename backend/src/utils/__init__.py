@@ -1,3 +1,15 @@
-from .config import supabase, JWT_SECRET_KEY, DEBUG
-from .security import hash_password, verify_password, generate_jwt, generate_salt
-from .exceptions import ServiceError
\ No newline at end of file
+from .config import supabase, DATA_BACKEND, METRICS_ENABLED, TRACE_SAMPLE_RATE, TRACE_REPEAT_THRESHOLD, JWT_SECRET_KEY, DEBUG, QUEST_SOURCE_TIMEOUT, QUEST_CACHE_TTL, QUEST_PROGRESS_REFRESH_TTL, QUEST_PROGRESS_MEMO_MAX_ENTRIES, STREAK_MEMO_MAX_ENTRIES, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, HISTORY_MAX_STATS_DAYS, ROLLOVER_CHUNK_SIZE, ROLLOVER_PARALLELISM, ROLLOVER_LEASE_SECONDS, ROLLOVER_PRECREATE_LOGS, DAILY_LOG_MEMO_MAX_ENTRIES, DEFAULT_TIME_ZONE
+from .security import hash_password, verify_password, needs_rehash, generate_jwt, generate_salt, admin_required, admin_or_metrics_token_required
+from .exceptions import ServiceError
+from .concurrency import io_executor, io_stats, gather, agather
+from .flow import Call, Cached, Parallel, run, arun
+from .cache import TTLCache, LRUCache, habit_cache, time_zone_cache, all_cache_stats
+from .timezones import is_valid_time_zone, local_today, period_starts, period_starts_of, user_time_zone, user_today, user_period_starts, \
+    user_time_zone_flow, user_today_flow, user_period_starts_flow
+from .tasks import task_queue
+from .http_pool import pool_stats
+from .versions import user_versions, start_version_memo, end_version_memo
+from .etag import conditional_get, memoize_user_versions
+from .metrics import metrics, track_requests
+from .tracing import trace_requests, start_trace, end_trace, current_trace, warn_repeated
+from .serialization import respond, encoded
@@ -0,0 +1,188 @@
+import copy
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from .config import HABIT_CACHE_MAX_ENTRIES, HABIT_CACHE_MAX_BYTES, HABIT_CACHE_TTL, TIME_ZONE_CACHE_MAX_ENTRIES, TIME_ZONE_CACHE_TTL
+
+# Mọi cache tạo trong process này, để liệt kê thống kê của chúng ở 1 chỗ
+_registry: List[Any] = []
+
+def all_cache_stats() -> List[dict]:
+    return [cache.stats() for cache in _registry]
+
+class TTLCache:
+    """Cache trong process, mỗi entry hết hạn ``ttl`` giây sau khi được nạp.
+
+    Dành cho các bảng nhỏ, ít thay đổi. Trượt cache thì nạp giá trị 1 lần (thread khác hỏi cùng key
+    chờ lần nạp đó thay vì cũng truy vấn). Mỗi process worker có bản riêng, nên ``invalidate`` chỉ xóa
+    ở process này; ở process khác dữ liệu cũ tồn tại tối đa TTL"""
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._entries: Dict[Hashable, tuple] = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        _registry.append(self)
+
+    def _lookup(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return True, entry[0]
+        return False, None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Giá trị trong cache hoặc ``default``, không nạp (cho người gọi tự nạp bất đồng bộ)"""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+        with self._load_lock:
+            # Thread khác có thể đã nạp xong trong lúc chờ
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+            return value
+
+    def invalidate(self, key: Hashable = None):
+        """Xóa 1 key, hoặc mọi key khi không truyền key"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+class LRUCache:
+    """Cache LRU có giới hạn trong process, mỗi entry có hạn dùng riêng.
+
+    Giữ tối đa ``max_entries`` giá trị (và, với ``max_bytes``, khoảng chừng đó byte, đo bằng kích thước
+    pickle); entry ít được dùng gần đây nhất bị loại để lấy chỗ, nên bộ nhớ mỗi worker dùng cho cache có
+    giới hạn. Giá trị được copy khi ghi vào và đọc ra nên người gọi không sửa được các dòng trong cache"""
+
+    _MISSING = object()
+
+    def __init__(self, name: str, max_entries: int, ttl: float, max_bytes: Optional[int] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _registry.append(self)
+
+    def _drop(self, key: Hashable):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[1] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Lưu 1 giá trị; ``ttl`` thay thời gian sống mặc định của cache cho entry này"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        value = copy.deepcopy(value)
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) if self.max_bytes else 0
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Đọc qua cache: trả về giá trị trong cache, hoặc nạp, lưu rồi trả về.
+        Lỗi của loader được ném tiếp và không có gì được lưu"""
+        value = self.get(key, self._MISSING)
+        if value is self._MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.bytes = 0
+            elif key in self._entries:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes if self.max_bytes else None,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+# Dòng habit theo (domain, user_id): trúng cache không tốn truy vấn nào. set_*_habit xóa entry ở worker của nó;
+# worker khác thấy thay đổi sau tối đa HABIT_CACHE_TTL (mặc định ngắn)
+habit_cache = LRUCache("habits", HABIT_CACHE_MAX_ENTRIES, HABIT_CACHE_TTL, max_bytes=HABIT_CACHE_MAX_BYTES)
+# Tên múi giờ theo user_id: nạp ở lần dùng đầu tiên (timezones.user_time_zone); cập nhật profile xóa entry ở
+# worker của nó, worker khác thấy thay đổi sau tối đa TIME_ZONE_CACHE_TTL
+time_zone_cache = LRUCache("time_zones", TIME_ZONE_CACHE_MAX_ENTRIES, TIME_ZONE_CACHE_TTL)
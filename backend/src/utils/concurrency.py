@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional
+from .config import IO_POOL_SIZE
+from .http_pool import call_deadline
+
+# Pool dùng chung, có giới hạn, để chạy song song các lần đọc PostgREST độc lập.
+# Thread chỉ được tạo ở lần submit đầu tiên, nên server pre-fork không bao giờ kế thừa chúng.
+io_executor = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io")
+
+
+class _AbandonedWork:
+    """Đếm các nguồn đã trễ deadline khi đang chạy: chúng giữ 1 thread của pool cho tới khi lệnh gọi
+    trả về, việc mà deadline của lệnh gọi (xem http_pool.call_deadline) giữ cho ngắn"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.total = 0
+
+    def track(self, future: Future):
+        with self._lock:
+            self.running += 1
+            self.total += 1
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self.running -= 1
+
+
+_abandoned = _AbandonedWork()
+
+
+def io_stats() -> dict:
+    """Kích thước pool dùng chung và số nguồn đã quá hạn vẫn còn giữ thread của nó"""
+    return {"max_workers": IO_POOL_SIZE, "abandoned_running": _abandoned.running,
+            "abandoned_total": _abandoned.total}
+
+
+def _run_with_deadline(deadline: float, fn: Callable[[], Any]) -> Any:
+    call_deadline.set(deadline)
+    return fn()
+
+def gather(sources: Dict[str, Callable[[], Any]], defaults: Dict[str, Any], timeout: float,
+           timeouts: Optional[Dict[str, float]] = None, errors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Chạy song song mọi nguồn trên pool dùng chung và trả về {name: kết quả}.
+
+    Mỗi nguồn có deadline riêng (``timeouts[name]``, không có thì ``timeout`` giây, tính từ lúc submit).
+    Nguồn lỗi hoặc trễ deadline chỉ nhận giá trị ``defaults[name]``; kết quả của các nguồn khác vẫn được
+    giữ. Deadline cũng giới hạn timeout của các lệnh gọi HTTP trong nguồn, nên nguồn đang chạy khi quá
+    hạn sẽ dừng ngay sau đó thay vì giữ thread. Nếu truyền ``errors``, nó nhận {name: thông báo} cho mọi
+    nguồn phải dùng giá trị mặc định"""
+    timeouts = timeouts or {}
+    started = time.monotonic()
+    # Mỗi nguồn chạy trong bản sao context của người gọi, nên trace truy vấn của request đi theo nó
+    futures = {name: io_executor.submit(contextvars.copy_context().run, _run_with_deadline,
+                                        started + timeouts.get(name, timeout), fn)
+               for name, fn in sources.items()}
+
+    results: Dict[str, Any] = {}
+    for name, future in futures.items():
+        remaining = started + timeouts.get(name, timeout) - time.monotonic()
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            if not future.cancel():
+                _abandoned.track(future)
+            print(f"Timed out fetching {name} after {timeouts.get(name, timeout)}s, using default")
+            results[name] = defaults.get(name)
+            if errors is not None:
+                errors[name] = "Timed out"
+        except Exception as e:
+            print(f"Error fetching {name}: {e}")
+            results[name] = defaults.get(name)
+            if errors is not None:
+                errors[name] = getattr(e, "message", str(e))
+    return results
+
+async def agather(sources: Dict[str, Callable[[], Awaitable[Any]]], defaults: Dict[str, Any], timeout: float,
+                  timeouts: Optional[Dict[str, float]] = None, errors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Phiên bản asyncio của ``gather`` cho tầng service async: cùng deadline, giá trị mặc định và cách
+    báo ``errors``, nhưng các nguồn là coroutine chạy bằng asyncio.gather trên event loop.
+    Nguồn trễ deadline bị hủy"""
+    timeouts = timeouts or {}
+
+    async def run(name, fn):
+        try:
+            return await asyncio.wait_for(fn(), timeouts.get(name, timeout))
+        except asyncio.TimeoutError:
+            print(f"Timed out fetching {name} after {timeouts.get(name, timeout)}s, using default")
+            if errors is not None:
+                errors[name] = "Timed out"
+        except Exception as e:
+            print(f"Error fetching {name}: {e}")
+            if errors is not None:
+                errors[name] = getattr(e, "message", str(e))
+        return defaults.get(name)
+
+    names = list(sources)
+    values = await asyncio.gather(*(run(name, sources[name]) for name in names))
+    return dict(zip(names, values))
@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client
+from .data_backend import create_data_client
 
 load_dotenv() # load env variables from .env file
 
@@ -9,7 +9,96 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY) # dùng để tạo JWT
+# Connection pool cho các request PostgREST của mỗi worker (dùng chung cho mọi thread của worker).
+# Số kết nối nên >= số thread có thể gọi Supabase cùng lúc (WEB_THREADS + IO_POOL_SIZE + TASK_WORKERS);
+# giữ keep-alive bằng số kết nối để một đợt request dồn dập không phải mở lại kết nối TLS.
+SUPABASE_POOL_SETTINGS = {
+    "max_connections": int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "32")),
+    "max_keepalive_connections": int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "32"))),
+    "keepalive_expiry": float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30")),  # giây kết nối rảnh được giữ lại
+    "http2": os.getenv("SUPABASE_HTTP2", "False").lower() == "true",  # True: nhiều request chung 1 kết nối
+    "connect_timeout": float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5")),
+    "read_timeout": float(os.getenv("SUPABASE_READ_TIMEOUT", "30")),
+    "pool_timeout": float(os.getenv("SUPABASE_POOL_TIMEOUT", "5")),  # giây chờ 1 kết nối rảnh khi pool đầy
+}
+
+# Nơi lưu dữ liệu: "supabase" (mặc định) hoặc "memory" (bảng trong bộ nhớ, cho test và benchmark chạy offline;
+# dữ liệu mất khi process kết thúc). MEMORY_BACKEND_LATENCY: giây chờ giả lập cho mỗi lần gọi.
+DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase").lower()
+MEMORY_BACKEND_LATENCY = float(os.getenv("MEMORY_BACKEND_LATENCY", "0"))
+
+# Đo số request/độ trễ theo route và số lần gọi/độ trễ theo bảng, xem tại /health/metrics (định dạng Prometheus).
+# Tắt thì cũng tắt luôn việc trace truy vấn (TRACE_SAMPLE_RATE)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+# /health/metrics chỉ dành cho admin; Prometheus (không có JWT) gửi header "Authorization: Bearer <METRICS_TOKEN>".
+# Để trống thì chỉ token admin được đọc
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+supabase = create_data_client(DATA_BACKEND, SUPABASE_URL, SUPABASE_KEY, SUPABASE_POOL_SETTINGS,
+                              latency=MEMORY_BACKEND_LATENCY, instrument=METRICS_ENABLED) # dùng để tạo JWT
 
 # Đọc biến DEBUG từ môi trường (hoặc mặc định là False)
-DEBUG = os.getenv("DEBUG", "False").lower() == "true"
\ No newline at end of file
+DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+# Ghi lại từng lần gọi Supabase (bảng, bộ lọc, thời gian, số dòng) của một tỉ lệ request;
+# cảnh báo khi cùng một kiểu truy vấn lặp lại quá TRACE_REPEAT_THRESHOLD lần trong 1 request (N+1).
+# DEBUG: theo dõi mọi request và trả thêm header Server-Timing
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1" if DEBUG else "0.05"))
+TRACE_REPEAT_THRESHOLD = int(os.getenv("TRACE_REPEAT_THRESHOLD", "5"))
+
+# Thread pool dùng chung cho các truy vấn chạy song song
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "16"))
+# Thời gian chờ tối đa (giây) cho mỗi nguồn dữ liệu của quest
+QUEST_SOURCE_TIMEOUT = float(os.getenv("QUEST_SOURCE_TIMEOUT", "2.0"))
+# Thời gian (giây) giữ danh sách quest đang hoạt động trong bộ nhớ
+QUEST_CACHE_TTL = float(os.getenv("QUEST_CACHE_TTL", "300"))
+# Tiến độ quest do tác vụ nền cập nhật; GET /quest tính lại từ dữ liệu gốc cho mỗi user tối đa 1 lần mỗi
+# QUEST_PROGRESS_REFRESH_TTL giây trong mỗi worker (nhớ tối đa QUEST_PROGRESS_MEMO_MAX_ENTRIES user)
+QUEST_PROGRESS_REFRESH_TTL = float(os.getenv("QUEST_PROGRESS_REFRESH_TTL", "300"))
+QUEST_PROGRESS_MEMO_MAX_ENTRIES = int(os.getenv("QUEST_PROGRESS_MEMO_MAX_ENTRIES", "50000"))
+# Lịch sử log (/history/<domain>): số dòng mỗi trang mặc định và tối đa
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+# Rollover hằng ngày (rollover.py): số user mỗi chunk, số chunk chạy song song và thời gian giữ lease (giây)
+ROLLOVER_CHUNK_SIZE = int(os.getenv("ROLLOVER_CHUNK_SIZE", "500"))
+ROLLOVER_PARALLELISM = int(os.getenv("ROLLOVER_PARALLELISM", "4"))
+ROLLOVER_LEASE_SECONDS = int(os.getenv("ROLLOVER_LEASE_SECONDS", "300"))
+# True: rollover tạo trước log hôm nay cho mọi user như cron cũ; mặc định log được tạo khi user dùng lần đầu
+ROLLOVER_PRECREATE_LOGS = os.getenv("ROLLOVER_PRECREATE_LOGS", "False").lower() == "true"
+# Khoảng ngày tối đa của /history/stats
+HISTORY_MAX_STATS_DAYS = int(os.getenv("HISTORY_MAX_STATS_DAYS", "366"))
+# Múi giờ (IANA) của user chưa chọn múi giờ; "hôm nay", kỳ quest và rollover tính theo múi giờ của từng user.
+# Múi giờ của user được cache trong mỗi worker (số user tối đa, thời gian sống tính bằng giây)
+DEFAULT_TIME_ZONE = os.getenv("DEFAULT_TIME_ZONE", "Asia/Ho_Chi_Minh")
+TIME_ZONE_CACHE_MAX_ENTRIES = int(os.getenv("TIME_ZONE_CACHE_MAX_ENTRIES", "50000"))
+TIME_ZONE_CACHE_TTL = float(os.getenv("TIME_ZONE_CACHE_TTL", "600"))
+# Cache habit theo (domain, user_id): số dòng tối đa, số byte tối đa (ước lượng theo kích thước pickle)
+# mỗi worker và thời gian sống (giây). TTL ngắn: worker khác thấy habit mới sau tối đa chừng ấy giây
+HABIT_CACHE_MAX_ENTRIES = int(os.getenv("HABIT_CACHE_MAX_ENTRIES", "10000"))
+HABIT_CACHE_MAX_BYTES = int(os.getenv("HABIT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+HABIT_CACHE_TTL = float(os.getenv("HABIT_CACHE_TTL", "60"))
+# Số user tối đa được nhớ "đã cộng streak hôm nay" trong mỗi worker
+STREAK_MEMO_MAX_ENTRIES = int(os.getenv("STREAK_MEMO_MAX_ENTRIES", "50000"))
+# Số (domain, user_id) đã có log hôm nay được nhớ trong mỗi worker (log tạo khi dùng lần đầu trong ngày)
+DAILY_LOG_MEMO_MAX_ENTRIES = int(os.getenv("DAILY_LOG_MEMO_MAX_ENTRIES", "50000"))
+
+# Hàng đợi chạy nền cho các tác vụ phụ sau khi ghi log (cộng streak, cập nhật quest, ...)
+TASKS_ENABLED = os.getenv("TASKS_ENABLED", "True").lower() == "true"  # False: chạy ngay trong request như trước
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "2"))
+TASK_QUEUE_MAX = int(os.getenv("TASK_QUEUE_MAX", "1000"))
+TASK_MAX_RETRIES = int(os.getenv("TASK_MAX_RETRIES", "5"))
+TASK_RETRY_BACKOFF = float(os.getenv("TASK_RETRY_BACKOFF", "0.5"))  # giây, nhân đôi sau mỗi lần thử lại
+# Đường dẫn tương đối tính từ thư mục backend (chứa app.py), không phụ thuộc thư mục chạy lệnh
+TASK_SPOOL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                              os.getenv("TASK_SPOOL_DIR", os.path.join("instance", "task_spool")))
+TASK_DRAIN_TIMEOUT = float(os.getenv("TASK_DRAIN_TIMEOUT", "10"))
+
+# bcrypt: work factor cho hash mới (hash cũ có cost khác sẽ được hash lại khi đăng nhập)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Process pool riêng cho bcrypt. BCRYPT_HOST_PROCESSES là tổng số process bcrypt cho cả máy, chia đều
+# cho WEB_WORKERS worker (gunicorn.conf.py ghi số worker thực tế vào WEB_WORKERS; chạy 1 process thì là 1).
+# BCRYPT_POOL_SIZE đặt thẳng số process của mỗi worker (0 = chạy ngay trên thread của request).
+WEB_WORKERS = max(int(os.getenv("WEB_WORKERS", "1")), 1)
+BCRYPT_HOST_PROCESSES = int(os.getenv("BCRYPT_HOST_PROCESSES", str(min(os.cpu_count() or 1, 4))))
+BCRYPT_POOL_SIZE = int(os.getenv("BCRYPT_POOL_SIZE", str(max(BCRYPT_HOST_PROCESSES // WEB_WORKERS, 1))))
+# Số việc chờ tối đa của mỗi worker
+BCRYPT_QUEUE_MAX = int(os.getenv("BCRYPT_QUEUE_MAX", "32"))
@@ -0,0 +1,173 @@
+"""Giao diện truy cập dữ liệu mà các service dùng, và các backend cài đặt nó.
+
+Service chỉ dùng ``client.table(name)`` / ``client.rpc(fn, params)`` và tập con query builder
+bên dưới, nên bất kỳ object nào có chúng đều thay được client Supabase:
+
+- ``supabase``: client Supabase/PostgREST thật (dùng pool, xem http_pool.py)
+- ``memory``: MemoryClient (memory_backend.py), bảng trong process cho test offline và benchmark
+
+DATA_BACKEND chọn backend (utils/config.py). InstrumentedClient bọc backend nào cũng được để đo
+thời gian mỗi lệnh gọi theo bảng và thao tác (metrics.py) và trace các request được lấy mẫu (tracing.py).
+"""
+import inspect
+import time
+from typing import Any, Dict, Optional, Protocol
+from .http_pool import acreate_pooled_client, create_pooled_client
+from .memory_backend import AsyncMemoryClient, MemoryClient
+from .metrics import metrics
+from .tracing import SHAPE_METHODS, current_trace, shape_part
+
+BACKENDS = ("supabase", "memory")
+
+
+class QueryBuilder(Protocol):
+    """Tập con query builder PostgREST mà các service dùng"""
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "QueryBuilder": ...
+    def insert(self, json: Any, **kwargs) -> "QueryBuilder": ...
+    def upsert(self, json: Any, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs) -> "QueryBuilder": ...
+    def update(self, json: Dict[str, Any], **kwargs) -> "QueryBuilder": ...
+    def delete(self, **kwargs) -> "QueryBuilder": ...
+
+    @property
+    def not_(self) -> "QueryBuilder": ...
+    def eq(self, column: str, value: Any) -> "QueryBuilder": ...
+    def neq(self, column: str, value: Any) -> "QueryBuilder": ...
+    def gt(self, column: str, value: Any) -> "QueryBuilder": ...
+    def gte(self, column: str, value: Any) -> "QueryBuilder": ...
+    def lt(self, column: str, value: Any) -> "QueryBuilder": ...
+    def lte(self, column: str, value: Any) -> "QueryBuilder": ...
+    def in_(self, column: str, values: Any) -> "QueryBuilder": ...
+    def is_(self, column: str, value: Any) -> "QueryBuilder": ...
+    def match(self, query: Dict[str, Any]) -> "QueryBuilder": ...
+    def or_(self, filters: str) -> "QueryBuilder": ...
+    def limit(self, size: int) -> "QueryBuilder": ...
+    def order(self, column: str, desc: bool = False, **kwargs) -> "QueryBuilder": ...
+    def single(self) -> "QueryBuilder": ...
+    def maybe_single(self) -> "QueryBuilder": ...
+
+    def execute(self) -> Any:
+        """Response có ``.data`` (và ``.count`` khi select kèm count); None với maybe_single() rỗng"""
+
+
+class DataClient(Protocol):
+    def table(self, table_name: str) -> QueryBuilder: ...
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None) -> QueryBuilder: ...
+
+
+OPERATIONS = ("select", "insert", "upsert", "update", "delete")
+
+
+class _InstrumentedQuery:
+    """Chuyển truy vấn cho builder được bọc và ghi lại thời gian ``execute()`` của nó.
+
+    Khi request được trace (tracing.py), ghi thêm dạng filter và số dòng trả về"""
+
+    __slots__ = ("_builder", "_table", "_operation", "_trace", "_shape")
+
+    def __init__(self, builder, table: str, operation: str):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._trace = current_trace()
+        self._shape = [] if self._trace is not None else None
+
+    def __getattr__(self, name):
+        attribute = getattr(self._builder, name)
+        if name in OPERATIONS:
+            self._operation = name
+        if not callable(attribute):
+            if self._shape is not None and name in SHAPE_METHODS:
+                self._shape.append(name)
+            return self._chain(attribute)  # not_ là property
+
+        def call(*args, **kwargs):
+            if self._shape is not None and name in SHAPE_METHODS:
+                self._shape.append(shape_part(name, args))
+            return self._chain(attribute(*args, **kwargs))
+        return call
+
+    def _chain(self, result):
+        # select()/update()/... trả về builder mới, các filter trả về chính builder đó
+        if hasattr(result, "execute"):
+            self._builder = result
+            return self
+        return result
+
+    def _record(self, started: float, response=None, error: bool = False):
+        seconds = time.perf_counter() - started
+        metrics.observe_query(self._table, self._operation, seconds, error=error)
+        if self._trace is not None:
+            data = getattr(response, "data", None)
+            rows = len(data) if isinstance(data, list) else int(data is not None)
+            self._trace.add(self._table, self._operation, tuple(self._shape), seconds, rows)
+
+    def execute(self):
+        started = time.perf_counter()
+        try:
+            response = self._builder.execute()
+        except Exception:
+            self._record(started, error=True)
+            raise
+        if inspect.isawaitable(response):
+            return self._finish(response, started)
+        self._record(started, response)
+        return response
+
+    async def _finish(self, response, started: float):
+        try:
+            response = await response
+        except Exception:
+            self._record(started, error=True)
+            raise
+        self._record(started, response)
+        return response
+
+
+class InstrumentedClient:
+    """DataClient (sync hoặc async) có các lệnh gọi được đếm và đo thời gian theo bảng và thao tác.
+
+    Mọi thứ khác (thuộc tính, helper của MemoryClient) được đọc và ghi thẳng vào client được bọc"""
+
+    def __init__(self, client):
+        object.__setattr__(self, "client", client)
+
+    def table(self, table_name: str):
+        return _InstrumentedQuery(self.client.table(table_name), table_name, "select")
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None):
+        return _InstrumentedQuery(self.client.rpc(fn, params), fn, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.client, name, value)
+
+
+def create_data_client(backend: str, url: Optional[str] = None, key: Optional[str] = None,
+                       pool_settings: Optional[Dict[str, Any]] = None, latency: float = 0.0,
+                       instrument: bool = True) -> DataClient:
+    """Client mà mọi service sync dùng. ``latency`` chỉ áp dụng cho backend memory"""
+    if backend == "memory":
+        client = MemoryClient(latency=latency).seed()
+    elif backend == "supabase":
+        client = create_pooled_client(url, key, **(pool_settings or {}))
+    else:
+        raise ValueError(f"Unknown DATA_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return InstrumentedClient(client) if instrument else client
+
+
+async def acreate_data_client(client: DataClient, url: Optional[str] = None, key: Optional[str] = None,
+                              pool_settings: Optional[Dict[str, Any]] = None):
+    """Client của các service async, trên cùng backend (và với memory, cùng dữ liệu) với ``client``.
+
+    Được đo khi ``client`` được đo"""
+    instrumented = isinstance(client, InstrumentedClient)
+    if instrumented:
+        client = client.client
+    if isinstance(client, MemoryClient):
+        async_client = AsyncMemoryClient(client)
+    else:
+        async_client = await acreate_pooled_client(url, key, **(pool_settings or {}))
+    return InstrumentedClient(async_client) if instrumented else async_client
@@ -0,0 +1,75 @@
+import hashlib
+from datetime import date
+from functools import wraps
+from typing import Callable, Optional
+from flask import current_app, g, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from .versions import user_versions, start_version_memo, end_version_memo
+from .timezones import user_today
+
+# Dữ liệu của user phải được kiểm tra lại mỗi lần dùng (304 không tốn truy vấn nào); chỉ trình duyệt được lưu
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(user_id: str, version: str, today: date, resource: str, variant: str = "") -> str:
+    """Strong ETag của 1 resource của user tại 1 phiên bản dữ liệu.
+
+    Ngày theo múi giờ của user là một phần của ETag, nên ETag của các resource "hôm nay" đổi đúng
+    nửa đêm của user, trước khi rollover ghi gì"""
+    key = f"{user_id}|{version}|{today.isoformat()}|{resource}|{variant}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def conditional_get(extra: Optional[Callable[[], str]] = None, versioned: bool = True):
+    """ETag và If-None-Match cho endpoint GET theo user (đặt dưới @jwt_required()).
+
+    ETag lấy từ phiên bản dữ liệu của user (versions.py), đọc trước khi view chạy, nên If-None-Match
+    khớp được trả 304 sau 1 truy vấn nhỏ, không chạy view và các truy vấn của nó. ``extra`` thêm dấu
+    phiên bản của dữ liệu chung cho mọi user (vd. định nghĩa quest). Không đọc được phiên bản thì ETag
+    là hash của body: khi đó 304 chỉ tiết kiệm phần tải về.
+    ``versioned=False`` luôn hash body, cho view đọc từ cache, nơi đọc phiên bản còn tốn hơn chạy view"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version = user_versions.get(user_id) if versioned else None
+            etag = None
+            if version is not None:
+                etag = make_etag(user_id, version, user_today(user_id), request.full_path,
+                                 f"{request.headers.get('Accept', '')}|{extra() if extra else ''}")
+                if etag in request.if_none_match:
+                    response = current_app.response_class(status=304)
+                    return _cacheable(response, etag)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if etag is None:
+                response.add_etag()
+                response.make_conditional(request)
+                return _cacheable(response)
+            return _cacheable(response, etag)
+        return wrapper
+    return decorator
+
+
+def _cacheable(response, etag: Optional[str] = None):
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = PRIVATE_REVALIDATE
+    response.vary.update(("Authorization", "Accept"))
+    return response
+
+
+def memoize_user_versions(app):
+    """Mỗi request của app Flask đọc phiên bản của 1 user tối đa 1 lần (xem versions.start_version_memo)"""
+    @app.before_request
+    def _start_version_memo():
+        g._version_memo_token = start_version_memo()
+
+    @app.teardown_request
+    def _end_version_memo(exc):
+        # Worker gthread dùng lại thread: request sau không được thấy các phiên bản này
+        end_version_memo(g.pop("_version_memo_token", None))
+
+    return app
@@ -0,0 +1,119 @@
+"""Một cách viết duy nhất của method service cho cả client dữ liệu sync lẫn async.
+
+Flow là generator yield các lệnh gọi data backend nó cần và nhận lại kết quả:
+
+    def habit_flow(self, client, user_id):
+        response = yield client.table("hydrate_habits").select("*").eq("user_id", user_id)
+        if not response.data:
+            raise ServiceError("Hydrate habit not found", 404)
+        return response.data[0]
+
+Bản thân flow không làm I/O: service sync chạy nó bằng ``run(flow)``, gọi ``execute()`` cho từng
+truy vấn được yield, còn tầng async dùng ``await arun(flow)`` để await truy vấn đó. Lệnh gọi lỗi
+được ném lại vào flow ngay tại ``yield``, nên try/except của flow xử lý giống nhau trên cả 2 client.
+Ngoài query builder (bất cứ thứ gì có ``execute()``), flow có thể yield:
+
+- ``Call(fn, *args)``: lệnh gọi blocking (vd. task_queue.enqueue), ``arun`` chạy nó trong 1 thread
+- ``Cached(cache, key, load)``: đọc qua TTLCache/LRUCache, ``load()`` trả về 1 flow
+- ``Parallel(sources, defaults, timeout)``: các flow độc lập chạy song song, như gather/agather
+
+và chuyển cho flow khác bằng ``yield from``.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Generator, Optional
+from .concurrency import gather, agather
+
+Flow = Generator[Any, Any, Any]
+
+
+class Call:
+    """Lệnh gọi hàm blocking: ``run`` gọi trực tiếp, ``arun`` chạy trong 1 thread"""
+
+    def __init__(self, fn: Callable, *args, **kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+
+class Cached:
+    """Đọc qua ``cache`` (TTLCache hoặc LRUCache): giá trị của ``key``, hoặc kết quả của flow do
+    ``load()`` trả về, sau đó được lưu vào cache"""
+
+    def __init__(self, cache, key, load: Callable[[], Flow]):
+        self.cache = cache
+        self.key = key
+        self.load = load
+
+
+class Parallel:
+    """Chạy song song các flow độc lập: {name: kết quả}, cùng deadline, ``defaults`` và cách báo
+    ``errors`` của concurrency.gather (thread với ``run``, event loop với ``arun``)"""
+
+    def __init__(self, sources: Dict[str, Callable[[], Flow]], defaults: Dict[str, Any], timeout: float,
+                 timeouts: Optional[Dict[str, float]] = None, errors: Optional[Dict[str, str]] = None):
+        self.sources = sources
+        self.defaults = defaults
+        self.timeout = timeout
+        self.timeouts = timeouts
+        self.errors = errors
+
+
+def _step(flow: Flow, value: Any, error: Optional[BaseException]):
+    return flow.throw(error) if error is not None else flow.send(value)
+
+
+def run(flow: Flow) -> Any:
+    """Chạy ``flow`` trên client sync và trả về kết quả"""
+    value, error = None, None
+    while True:
+        try:
+            request = _step(flow, value, error)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        try:
+            value = _run_request(request)
+        except Exception as e:
+            error = e
+
+
+def _run_request(request: Any) -> Any:
+    if isinstance(request, Call):
+        return request.fn(*request.args, **request.kwargs)
+    if isinstance(request, Cached):
+        return request.cache.get_or_load(request.key, lambda: run(request.load()))
+    if isinstance(request, Parallel):
+        sources = {name: (lambda load=load: run(load())) for name, load in request.sources.items()}
+        return gather(sources, request.defaults, request.timeout, request.timeouts, request.errors)
+    return request.execute()
+
+
+async def arun(flow: Flow) -> Any:
+    """Chạy ``flow`` trên client async và trả về kết quả"""
+    value, error = None, None
+    while True:
+        try:
+            request = _step(flow, value, error)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        try:
+            value = await _arun_request(request)
+        except Exception as e:
+            error = e
+
+
+async def _arun_request(request: Any) -> Any:
+    if isinstance(request, Call):
+        return await asyncio.to_thread(request.fn, *request.args, **request.kwargs)
+    if isinstance(request, Cached):
+        missing = object()
+        value = request.cache.get(request.key, missing)
+        if value is missing:
+            value = await arun(request.load())
+            request.cache.set(request.key, value)
+        return value
+    if isinstance(request, Parallel):
+        sources = {name: (lambda load=load: arun(load())) for name, load in request.sources.items()}
+        return await agather(sources, request.defaults, request.timeout, request.timeouts, request.errors)
+    return await request.execute()
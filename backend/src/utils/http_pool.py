@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Union
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import AsyncClient, SyncClient
+from supabase.lib.client_options import DEFAULT_HEADERS
+
+# Mọi client PostgREST có pool tạo trong process này, cho pool_stats() và việc tạo lại pool sau fork
+_registry: "weakref.WeakSet" = weakref.WeakSet()
+
+# Deadline (time.monotonic()) của các lệnh gọi trong context hiện tại. concurrency.gather đặt nó cho từng nguồn,
+# và transport giới hạn mọi timeout theo nó, nên lệnh gọi trễ bỏ cuộc thay vì giữ thread
+call_deadline: ContextVar[Optional[float]] = ContextVar("call_deadline", default=None)
+
+
+def _cap_timeouts(request: httpx.Request):
+    """Cắt các timeout connect/read/write/pool của request theo thời gian còn lại trước ``call_deadline``"""
+    deadline = call_deadline.get()
+    if deadline is None:
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise httpx.TimeoutException("Call deadline exceeded", request=request)
+    timeouts = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {name: remaining if value is None else min(value, remaining)
+                                     for name, value in timeouts.items()}
+
+
+class _PoolCounters:
+    """Bộ đếm sử dụng của 1 connection pool, do transport của nó ghi (httpx không có thống kê pool)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.pool_timeouts = 0
+        self.connect_errors = 0
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, error: Exception = None):
+        with self._lock:
+            self.in_flight -= 1
+            if isinstance(error, httpx.PoolTimeout):
+                self.pool_timeouts += 1
+            elif isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+                self.connect_errors += 1
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    def __init__(self, counters: _PoolCounters, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters
+
+    def handle_request(self, request):
+        _cap_timeouts(request)
+        self.counters.started()
+        try:
+            response = super().handle_request(request)
+        except Exception as e:
+            self.counters.finished(e)
+            raise
+        self.counters.finished()
+        return response
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, counters: _PoolCounters, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters
+
+    async def handle_async_request(self, request):
+        _cap_timeouts(request)
+        self.counters.started()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception as e:
+            self.counters.finished(e)
+            raise
+        self.counters.finished()
+        return response
+
+
+class _PooledMixin:
+    """Tạo session PostgREST với giới hạn và timeout theo cấu hình thay vì mặc định của httpx.
+
+    ``create_session`` là hook BasePostgrestClient gọi để tạo session: cùng chữ ký, và session là class
+    của chính postgrest (SyncClient có thêm ``aclose`` mà SyncPostgrestClient gọi)"""
+    pool_settings: Dict[str, Any] = {}
+    transport_class = _CountingTransport
+    session_class = SyncClient
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Union[int, float, httpx.Timeout],
+                       verify: bool = True, proxy: Optional[str] = None):
+        settings = self.pool_settings
+        self.counters = _PoolCounters()
+        self._session_args = (base_url, verify, proxy)
+        limits = httpx.Limits(max_connections=settings["max_connections"],
+                              max_keepalive_connections=settings["max_keepalive_connections"],
+                              keepalive_expiry=settings["keepalive_expiry"])
+        transport = self.transport_class(self.counters, limits=limits, http2=settings["http2"],
+                                         verify=verify, proxy=proxy)
+        _registry.add(self)
+        return self.session_class(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(connect=settings["connect_timeout"], read=settings["read_timeout"],
+                                  write=settings["read_timeout"], pool=settings["pool_timeout"]),
+            transport=transport,
+            follow_redirects=True,
+        )
+
+    def _reset_after_fork(self):
+        # Socket của process cha không được dùng chung: bỏ pool cũ (không đóng, tránh gửi TLS close_notify
+        # trên kết nối của process cha) và tạo pool mới, giữ header hiện tại (vd. Authorization)
+        base_url, verify, proxy = self._session_args
+        self.session = self.create_session(base_url, dict(self.session.headers), self.session.timeout, verify, proxy)
+
+    def pool_stats(self) -> dict:
+        settings = self.pool_settings
+        counters = self.counters
+        return {
+            "client": self.label,
+            "pid": os.getpid(),
+            "max_connections": settings["max_connections"],
+            "max_keepalive_connections": settings["max_keepalive_connections"],
+            "http2": settings["http2"],
+            "in_flight": counters.in_flight,
+            # Request vượt quá max_connections đang chờ kết nối rảnh (tối đa pool_timeout)
+            "queued": max(counters.in_flight - settings["max_connections"], 0),
+            "peak_in_flight": counters.peak_in_flight,
+            "requests": counters.requests,
+            "pool_timeouts": counters.pool_timeouts,
+            "connect_errors": counters.connect_errors,
+        }
+
+
+class PooledPostgrestClient(_PooledMixin, SyncPostgrestClient):
+    label = "sync"
+
+
+class PooledAsyncPostgrestClient(_PooledMixin, AsyncPostgrestClient):
+    label = "async"
+    transport_class = _AsyncCountingTransport
+    session_class = AsyncClient
+
+    def _reset_after_fork(self):
+        # AsyncClient được tạo trong event loop của worker, không có gì để làm lại sau fork
+        pass
+
+
+class PooledDataClient:
+    """DataClient của backend supabase (xem data_backend.py): ``table()``/``rpc()`` của 1 client PostgREST
+    có pool, cũng là tất cả những gì service dùng của client Supabase"""
+
+    def __init__(self, postgrest):
+        self.postgrest = postgrest
+
+    def table(self, table_name: str):
+        return self.postgrest.from_(table_name)
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None):
+        return self.postgrest.rpc(fn, params or {})
+
+
+def _postgrest_client(client_class, url: str, key: str, settings: Dict[str, Any]):
+    # Cùng endpoint và header như create_client() cấp cho client PostgREST của nó
+    pooled_class = type(client_class.__name__, (client_class,), {"pool_settings": settings})
+    headers = {**DEFAULT_HEADERS, "apiKey": key, "Authorization": f"Bearer {key}"}
+    return pooled_class(f"{url.rstrip('/')}/rest/v1", headers=headers, schema="public")
+
+
+def create_pooled_client(url: str, key: str, **settings) -> PooledDataClient:
+    """Client cho REST API của Supabase, mọi lệnh gọi đi qua 1 connection pool dùng chung, có giới hạn.
+
+    ``settings``: max_connections, max_keepalive_connections, keepalive_expiry, http2,
+    connect_timeout, read_timeout, pool_timeout (giây)"""
+    return PooledDataClient(_postgrest_client(PooledPostgrestClient, url, key, settings))
+
+
+async def acreate_pooled_client(url: str, key: str, **settings) -> PooledDataClient:
+    """create_pooled_client() trên client PostgREST async (gọi trong event loop sẽ dùng nó)"""
+    return PooledDataClient(_postgrest_client(PooledAsyncPostgrestClient, url, key, settings))
+
+
+def pool_stats() -> List[dict]:
+    """Mức sử dụng của mọi connection pool PostgREST trong process này"""
+    return [client.pool_stats() for client in list(_registry)]
+
+
+def _reset_pools_after_fork():
+    for client in list(_registry):
+        client._reset_after_fork()
+
+
+# gunicorn (preload_app) tạo client trong master rồi fork: mỗi worker cần pool riêng
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
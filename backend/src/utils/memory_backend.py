@@ -0,0 +1,784 @@
+"""Data backend trong bộ nhớ (DATA_BACKEND=memory) cho test offline và benchmark.
+
+Cài đặt tập con query builder PostgREST mà project dùng
+(table/select/insert/upsert/update/delete, eq/neq/gt/gte/lt/lte/in_/is_/not_/match/or_,
+limit/order, single/maybe_single, execute) và các hàm rpc() định nghĩa trong
+database/*.sql, cùng các trigger tăng user_versions. Dòng được đánh index theo ``user_id``
+và ``date``, nên ``eq`` trên 1 trong 2 cột chỉ quét các dòng của user (hoặc ngày) đó. Mỗi ``execute()``
+tính là 1 round trip và có thể sleep ``latency`` được truyền vào, nên benchmark so sánh được số lượng
+và chi phí round trip mà không cần project Supabase thật. AsyncMemoryClient cho các service async
+dùng cùng dữ liệu (``execute()`` được await).
+"""
+import asyncio
+import copy
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+# Cột xung đột upsert dùng khi không truyền on_conflict (khóa chính của bảng)
+PRIMARY_KEYS = {
+    "profiles": ("user_id",),
+    "xp_rewards": ("user_id",),
+    "sleep_habits": ("user_id",),
+    "hydrate_habits": ("user_id",),
+    "diet_habits": ("user_id",),
+    "focus_habits": ("user_id",),
+    "daily_summaries": ("user_id", "date"),
+    "rollup_checkpoints": ("name",),
+    "rollover_runs": ("day", "time_zone"),
+}
+
+# Các cột database tự điền khi dòng được insert mà không có chúng
+COLUMN_DEFAULTS = {
+    "users": {"role": "user", "reset_token": None, "reset_token_expiration": None},
+    "profiles": {"time_zone": "Asia/Ho_Chi_Minh"},  # 017_user_time_zones.sql
+    "xp_rewards": {"coins": 0, "diamonds": 0, "streak": 0, "daily_checkin": 0,
+                   "last_checkin_date": "2000-01-01", "last_streak_date": "2000-01-01"},
+    "sleep_logs": {"completed": False},
+    "hydrate_logs": {"completed": False},
+    "diet_logs": {"completed": False},
+    "focus_logs": {"completed": False},
+    "quests": {"description": None, "trigger_type": None, "is_active": True},
+    "user_quest_progress": {"current_progress": 0, "claimed_at": None},
+    "rollover_runs": {"last_user_id": None, "users_done": 0, "chunks_done": 0, "rows_written": 0,
+                      "finished_at": None, "lease_owner": None, "lease_until": None},
+}
+# Cột sinh tự động (GENERATED ALWAYS AS ... STORED): tính từ dòng khi được insert
+GENERATED_COLUMNS = {
+    "sleep_logs": {"date": lambda row: _normalize(row.get("scheduled_time"))[:10]},  # 016_lazy_daily_logs.sql
+}
+TIMESTAMP_DEFAULTS = {"quests": "created_at", "user_quest_progress": "last_updated", "rollover_runs": "started_at"}
+
+# Các cột có hash index trong mọi bảng
+INDEXED_COLUMNS = ("user_id", "date")
+
+# Các bảng mà việc ghi vào làm tăng user_versions (database/019_user_versions.sql)
+VERSIONED_TABLES = {
+    "sleep_logs", "hydrate_logs", "diet_logs", "focus_logs", "user_quest_progress", "xp_rewards",
+    "daily_summaries", "profiles", "sleep_habits", "hydrate_habits", "diet_habits", "focus_habits",
+}
+
+# Các dòng do migration insert (database/007_quest_tables.sql)
+SEED_QUESTS = [
+    {"title": "Drink up 1500ml", "description": "Stay hydrated throughout the day", "type": "daily",
+     "trigger_type": "hydrate_goal", "target_progress": 1500, "reward_type": "coins", "reward_amount": 30},
+    {"title": "Complete 2 Sleep Tasks", "description": "Finish 2 sleep tasks from your daily list", "type": "daily",
+     "trigger_type": "tasks_completed", "target_progress": 2, "reward_type": "coins", "reward_amount": 50},
+    {"title": "Check-in Today", "description": "Claim your daily check-in reward", "type": "daily",
+     "trigger_type": "checkin", "target_progress": 1, "reward_type": "coins", "reward_amount": 10},
+    {"title": "Log Meal", "description": "Record what you had", "type": "daily",
+     "trigger_type": "log_meal", "target_progress": 1, "reward_type": "diamonds", "reward_amount": 1},
+    {"title": "Earn 50 coins", "description": "Collect coins from various activities", "type": "daily",
+     "trigger_type": "earn_coins", "target_progress": 50, "reward_type": "coins", "reward_amount": 20},
+    {"title": "Focus 30 minutes", "description": "Spend 30 minutes on a focus task", "type": "daily",
+     "trigger_type": "focus_time", "target_progress": 30, "reward_type": "coins", "reward_amount": 40},
+    {"title": "Monthly Master", "description": "Complete 40 daily quests this month", "type": "monthly",
+     "trigger_type": "monthly_daily_quests", "target_progress": 40, "reward_type": "diamonds", "reward_amount": 40},
+]
+
+
+def _normalize(value):
+    """Chuyển giá trị filter và giá trị đã lưu thành string/scalar so sánh được"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and len(value) >= 19 and value[10] == "T":
+        return value.replace("T", " ", 1)
+    return value
+
+
+_COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def _split_conditions(text: str) -> List[str]:
+    """Tách cây logic PostgREST theo dấu phẩy cấp ngoài cùng (không nằm trong ngoặc hay nháy)"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+
+def _logic_predicate(condition: str):
+    """Predicate của 1 điều kiện or_(): ``col.op.value``, ``and(...)`` hoặc ``or(...)`` (eq/neq/gt/gte/lt/lte/is)"""
+    for group, combine in (("and(", all), ("or(", any)):
+        if condition.startswith(group) and condition.endswith(")"):
+            predicates = [_logic_predicate(part) for part in _split_conditions(condition[len(group):-1])]
+            return lambda row: combine(p(row) for p in predicates)
+    column, operator, value = condition.split(".", 2)
+    if operator == "is":
+        expected = {"null": None, "true": True, "false": False}[value]
+        return lambda row: row.get(column) is expected
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    compare = _COMPARISONS[operator]
+    return lambda row: row.get(column) is not None and compare(_normalize(row[column]), _normalize(value))
+
+
+def _index_key(value):
+    value = _normalize(value)
+    return json.dumps(value, sort_keys=True) if isinstance(value, (list, dict)) else value
+
+
+class _MemoryTable:
+    """Các dòng của 1 bảng cùng 1 hash index cho mỗi cột trong INDEXED_COLUMNS.
+
+    Ghi vào bảng có phiên bản thêm (table, user_id) vào ``changes``, được các trigger phiên bản đọc"""
+
+    def __init__(self, name: str = "", changes: Optional[set] = None):
+        self.rows: List[dict] = []
+        self._index: Dict[str, Dict] = {column: defaultdict(list) for column in INDEXED_COLUMNS}
+        self.name = name
+        self._changes = changes
+
+    def _changed(self, row: dict):
+        if self._changes is not None and row.get("user_id") is not None:
+            self._changes.add((self.name, row["user_id"]))
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(list(self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, row: dict):
+        self._changed(row)
+        self.rows.append(row)
+        for column in INDEXED_COLUMNS:
+            if column in row:
+                self._index[column][_index_key(row[column])].append(row)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def _unindex(self, row: dict, column: str):
+        bucket = self._index[column].get(_index_key(row[column]), [])
+        for i, indexed in enumerate(bucket):
+            if indexed is row:
+                del bucket[i]
+                break
+
+    def update(self, row: dict, changes: dict):
+        self._changed(row)
+        for column in INDEXED_COLUMNS:
+            if column in changes and column in row:
+                self._unindex(row, column)
+        row.update(changes)
+        for column in INDEXED_COLUMNS:
+            if column in changes:
+                self._index[column][_index_key(row[column])].append(row)
+        self._changed(row)
+
+    def remove(self, rows: List[dict]):
+        removed = {id(row) for row in rows}
+        for row in rows:
+            self._changed(row)
+            for column in INDEXED_COLUMNS:
+                if column in row:
+                    self._unindex(row, column)
+        self.rows = [row for row in self.rows if id(row) not in removed]
+
+    def candidates(self, equals: Dict[str, object]) -> List[dict]:
+        """Các dòng có thể khớp ``equals`` (cột -> giá trị): 1 bucket của index khi cột có index"""
+        for column in INDEXED_COLUMNS:
+            if column in equals:
+                return list(self._index[column].get(_index_key(equals[column]), []))
+        return list(self.rows)
+
+    def where(self, **equals) -> List[dict]:
+        return [row for row in self.candidates(equals)
+                if all(_normalize(row.get(c)) == _normalize(v) for c, v in equals.items())]
+
+
+class _Tables(dict):
+    """Các bảng của MemoryClient theo tên, tạo ở lần dùng đầu tiên. ``changes`` gom các cặp
+    (bảng có phiên bản, user_id) mà câu lệnh hiện tại đã ghi"""
+
+    def __init__(self):
+        super().__init__()
+        self.changes: set = set()
+
+    def __missing__(self, name):
+        table = self[name] = _MemoryTable(name, self.changes if name in VERSIONED_TABLES else None)
+        return table
+
+
+def _bump_user_versions(tables: _Tables):
+    """Các trigger cấp câu lệnh của database/019_user_versions.sql: khi câu lệnh xong, mỗi user có dòng bị
+    nó ghi được data_version + 1"""
+    changed = {user_id for _, user_id in tables.changes}
+    tables.changes.clear()
+    versions = tables["user_versions"]
+    for user_id in changed:
+        row = next(iter(versions.where(user_id=user_id)), None)
+        if row is None:
+            versions.append({"user_id": user_id, "data_version": 1})
+        else:
+            versions.update(row, {"data_version": row["data_version"] + 1})
+
+
+class _MemoryQuery:
+    def __init__(self, client, table_name):
+        self._client = client
+        self._table = table_name
+        self._op = "select"
+        self._payload = None
+        self._columns = "*"
+        self._count = None
+        self._filters = []
+        self._equals = {}  # Các filter eq(), dùng để chọn index
+        self._negate_next = False
+        self._limit = None
+        self._orders = []
+        self._single = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+
+    # --- thao tác ---
+    def select(self, *columns, count=None):
+        self._op = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, json, **kwargs):
+        self._op = "insert"
+        self._payload = json
+        return self
+
+    def upsert(self, json, on_conflict="", ignore_duplicates=False, **kwargs):
+        self._op = "upsert"
+        self._payload = json
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, **kwargs):
+        self._op = "update"
+        self._payload = json
+        return self
+
+    def delete(self, **kwargs):
+        self._op = "delete"
+        return self
+
+    # --- filter ---
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def _add(self, predicate):
+        if self._negate_next:
+            self._negate_next = False
+            self._filters.append(lambda row: not predicate(row))
+        else:
+            self._filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        if not self._negate_next:
+            self._equals.setdefault(column, value)
+        return self._add(lambda row: _normalize(row.get(column)) == _normalize(value))
+
+    def neq(self, column, value):
+        return self._add(lambda row: _normalize(row.get(column)) != _normalize(value))
+
+    def gt(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and _normalize(row[column]) > _normalize(value))
+
+    def gte(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and _normalize(row[column]) >= _normalize(value))
+
+    def lt(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and _normalize(row[column]) < _normalize(value))
+
+    def lte(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and _normalize(row[column]) <= _normalize(value))
+
+    def in_(self, column, values):
+        normalized = [_normalize(v) for v in values]
+
+        def predicate(row):
+            value = row.get(column)
+            # Cột JSON được so sánh qua dạng text, như PostgREST làm với '[]'/'{}'
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, separators=(",", ":"))
+            return _normalize(value) in normalized
+        return self._add(predicate)
+
+    def is_(self, column, value):
+        expected = None if value in (None, "null") else value
+        return self._add(lambda row: row.get(column) is expected or row.get(column) == expected)
+
+    def match(self, query):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def or_(self, filters):
+        predicates = [_logic_predicate(part) for part in _split_conditions(filters)]
+        return self._add(lambda row: any(p(row) for p in predicates))
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self._orders.append((column, desc))
+        return self
+
+    def single(self):
+        self._single = "single"
+        return self
+
+    def maybe_single(self):
+        self._single = "maybe"
+        return self
+
+    # --- thực thi ---
+    def _project(self, row):
+        if self._columns.strip() == "*":
+            return copy.deepcopy(row)
+        columns = [c.strip() for c in self._columns.split(",")]
+        return {c: copy.deepcopy(row.get(c)) for c in columns}
+
+    def _matching(self, table: _MemoryTable):
+        return [row for row in table.candidates(self._equals) if all(f(row) for f in self._filters)]
+
+    def execute(self):
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        return self._execute()
+
+    def _execute(self):
+        with self._client.lock:
+            self._client.round_trips += 1
+            self._client.calls[(self._table, self._op)] += 1
+            try:
+                data = self._run()
+            finally:
+                _bump_user_versions(self._client.tables)
+
+        count = len(data) if self._count else None
+        if self._single:
+            if not data:
+                if self._single == "maybe":
+                    return None  # postgrest-py trả về None với maybe_single() rỗng
+                raise Exception("JSON object requested, multiple (or no) rows returned. The result contains 0 rows")
+            data = data[0]
+        return SimpleNamespace(data=data, count=count)
+
+    def _run(self):
+        table = self._client.tables[self._table]
+        if self._op == "select":
+            result = self._matching(table)
+            for column, desc in reversed(self._orders):  # sắp xếp ổn định: order() đầu tiên được áp dụng sau cùng
+                result.sort(key=lambda row: _normalize(row.get(column)), reverse=desc)
+            if self._limit is not None:
+                result = result[:self._limit]
+            return [self._project(row) for row in result]
+        if self._op == "insert":
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            inserted = [self._client._new_row(self._table, item) for item in payload]
+            table.extend(inserted)
+            return [copy.deepcopy(row) for row in inserted]
+        if self._op == "upsert":
+            return self._run_upsert(table)
+        if self._op == "update":
+            updated = []
+            for row in self._matching(table):
+                table.update(row, copy.deepcopy(self._payload))
+                updated.append(copy.deepcopy(row))
+            return updated
+        if self._op == "delete":
+            removed = self._matching(table)
+            table.remove(removed)
+            return [copy.deepcopy(row) for row in removed]
+        raise ValueError(f"Unsupported operation {self._op}")
+
+    def _run_upsert(self, table: _MemoryTable):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        if self._on_conflict:
+            key_columns = tuple(c.strip() for c in self._on_conflict.split(","))
+        else:
+            key_columns = PRIMARY_KEYS.get(self._table, ("id",))
+        written = []
+        generated = GENERATED_COLUMNS.get(self._table, {})
+        for item in payload:
+            key = {c: generated[c](item) if c in generated else item.get(c) for c in key_columns}
+            existing = next(iter(table.where(**key)), None)
+            if existing is None:
+                new_row = self._client._new_row(self._table, item)
+                table.append(new_row)
+                written.append(copy.deepcopy(new_row))
+            elif not self._ignore_duplicates:
+                table.update(existing, copy.deepcopy(item))
+                written.append(copy.deepcopy(existing))
+        return written
+
+
+# --- Bản Python của các hàm Postgres gọi qua rpc() ---
+def _increment_hydrate_log(tables, p_log_id, p_user_id):
+    for row in tables["hydrate_logs"].where(user_id=p_user_id, id=p_log_id):
+        consumed_water = row.get("consumed_water", 0) + row.get("cup_size", 0)
+        tables["hydrate_logs"].update(row, {"consumed_water": consumed_water,
+                                            "completed": consumed_water >= row.get("water_goal", 0)})
+        return [copy.deepcopy(row)]
+    return []
+
+
+def _increment_focus_log(tables, p_log_id, p_user_id, p_minutes):
+    habit = next(iter(tables["focus_habits"].where(user_id=p_user_id)), None)
+    for row in tables["focus_logs"].where(user_id=p_user_id, id=p_log_id):
+        if habit:
+            focus_done = row.get("focus_done", 0) + p_minutes
+            tables["focus_logs"].update(row, {"focus_done": focus_done, "completed": focus_done >= habit.get("focus_goal", 0)})
+            return [copy.deepcopy(row)]
+    return []
+
+
+def _append_diet_dishes(tables, p_log_id, p_user_id, p_dishes):
+    for row in tables["diet_logs"].where(user_id=p_user_id, id=p_log_id):
+        dishes = (row.get("dishes") or []) + copy.deepcopy(p_dishes or [])
+        consumed_calories = float(sum(d.get("calories", 0) for d in dishes))
+        tables["diet_logs"].update(row, {"dishes": dishes, "consumed_calories": consumed_calories,
+                                         "completed": consumed_calories >= row.get("calories_goal", 0)})
+        return [copy.deepcopy(row)]
+    return []
+
+
+def _apply_quest_progress(tables, p_user_id, p_trigger_type, p_daily_start, p_monthly_start,
+                          p_increment=1, p_value=None):
+    progress_rows = tables["user_quest_progress"]
+    changed = []
+    for quest in tables["quests"]:
+        if not quest.get("is_active") or quest.get("trigger_type") != p_trigger_type:
+            continue
+        period_start = p_daily_start if quest.get("type") == "daily" else p_monthly_start
+        row = next(iter(progress_rows.where(user_id=p_user_id, quest_id=quest["id"],
+                                            period_start_date=period_start)), None)
+        if row is None:
+            row = {"id": str(uuid.uuid4()), "user_id": p_user_id, "quest_id": quest["id"],
+                   "period_start_date": period_start, "current_progress": 0, "claimed_at": None,
+                   "last_updated": datetime.now(timezone.utc).isoformat()}
+            progress_rows.append(row)
+        cap = 1 if p_trigger_type in ("checkin", "log_meal") else quest.get("target_progress", 0)
+        new_progress = min(p_value if p_value is not None else row["current_progress"] + p_increment, cap)
+        if row.get("claimed_at") is None and new_progress != row["current_progress"]:
+            progress_rows.update(row, {"current_progress": new_progress,
+                                       "last_updated": datetime.now(timezone.utc).isoformat()})
+            changed.append(copy.deepcopy(row))
+    return changed
+
+
+def _quest_source_value(tables, p_user_id, p_trigger_type, day, month_start):
+    if p_trigger_type == "hydrate_goal":
+        return int(max((row.get("consumed_water", 0) for row in tables["hydrate_logs"].where(user_id=p_user_id, date=day)),
+                       default=0))
+    if p_trigger_type == "tasks_completed":
+        return sum(1 for row in tables["sleep_logs"].where(user_id=p_user_id, date=day) if row.get("completed"))
+    if p_trigger_type == "log_meal":
+        return sum(1 for row in tables["diet_logs"].where(user_id=p_user_id, date=day)
+                   if row.get("dishes") not in (None, [], {}))
+    if p_trigger_type == "focus_time":
+        return sum(row.get("focus_done", 0) for row in tables["focus_logs"].where(user_id=p_user_id, date=day))
+    if p_trigger_type == "checkin":
+        return len(tables["xp_rewards"].where(user_id=p_user_id, last_checkin_date=day))
+    if p_trigger_type == "monthly_daily_quests":
+        month_end = (date.fromisoformat(month_start).replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
+        return sum(1 for row in tables["user_quest_progress"].where(user_id=p_user_id)
+                   if row.get("claimed_at") is not None and month_start <= _normalize(row["period_start_date"]) < month_end)
+    return None
+
+
+def _refresh_quest_progress(tables, p_user_id, p_trigger_type, p_daily_start, p_monthly_start):
+    value = _quest_source_value(tables, p_user_id, p_trigger_type, _normalize(p_daily_start), _normalize(p_monthly_start))
+    if value is None:
+        return []
+    return _apply_quest_progress(tables, p_user_id, p_trigger_type, p_daily_start, p_monthly_start, 0, value)
+
+
+def _provision_user(tables, p_user, p_profile, p_habits, p_today):
+    # Kiểm tra trước rồi mới ghi, nên lỗi không để lại gì (như transaction bị rollback)
+    if any(row.get("email") == p_user["email"] for row in tables["users"]):
+        raise Exception(f"Key (email)=({p_user['email']}) already exists.")
+    active_quests = [quest for quest in tables["quests"] if quest.get("is_active")]
+    if not active_quests:
+        raise Exception("No quests available")
+    user_id = p_user["id"]
+    today = date.fromisoformat(p_today)
+    month_start = today.replace(day=1)
+    user = dict(COLUMN_DEFAULTS["users"], **p_user)
+    tables["users"].append(user)
+    profile = dict(p_profile, user_id=user_id)
+    profile["time_zone"] = p_profile.get("time_zone") or COLUMN_DEFAULTS["profiles"]["time_zone"]
+    tables["profiles"].append(profile)
+    for domain, habit in p_habits.items():
+        tables[f"{domain}_habits"].append(dict(copy.deepcopy(habit), user_id=user_id))
+    sleep, hydrate, diet = p_habits["sleep"], p_habits["hydrate"], p_habits["diet"]
+    new_logs = {
+        "sleep_logs": [
+            {"user_id": user_id, "task_type": "sleep", "scheduled_time": f"{today} {sleep['sleep_time']}"},
+            {"user_id": user_id, "task_type": "wakeup", "scheduled_time": f"{today} {sleep['wakeup_time']}"},
+        ],
+        "hydrate_logs": [{"user_id": user_id, "water_goal": hydrate["water_goal"], "cup_size": hydrate["cup_size"],
+                          "consumed_water": 0.0, "date": p_today}],
+        "diet_logs": [{"user_id": user_id, "calories_goal": diet["calories_goal"], "dishes": [],
+                       "consumed_calories": 0.0, "date": p_today}],
+        "focus_logs": [{"user_id": user_id, "focus_done": 0, "date": p_today}],
+        "user_quest_progress": [{
+            "user_id": user_id,
+            "quest_id": quest["id"],
+            "period_start_date": (today if quest.get("type") == "daily" else month_start).isoformat(),
+        } for quest in active_quests],
+    }
+    for table_name, rows in new_logs.items():
+        for row in rows:
+            row.setdefault("id", str(uuid.uuid4()))
+            for column, value in COLUMN_DEFAULTS.get(table_name, {}).items():
+                row.setdefault(column, value)
+            if table_name in TIMESTAMP_DEFAULTS:
+                row.setdefault(TIMESTAMP_DEFAULTS[table_name], datetime.now(timezone.utc).isoformat())
+            for column, compute in GENERATED_COLUMNS.get(table_name, {}).items():
+                row[column] = compute(row)
+            tables[table_name].append(row)
+    return [copy.deepcopy(user)]
+
+
+def _zone_users(tables, time_zone):
+    """Các user_id có profile ở ``time_zone``; None (mọi user) khi không truyền múi giờ"""
+    if time_zone is None:
+        return None
+    return {row["user_id"] for row in tables["profiles"] if row.get("time_zone") == time_zone}
+
+
+def _fold_daily_summaries(tables, include):
+    """Upsert các dòng daily_summaries của những log thỏa ``include(user_id, day)``; trả về số dòng"""
+    summaries = defaultdict(dict)  # (user_id, day) -> các cột của 1 hoặc nhiều domain
+    for row in tables["hydrate_logs"]:
+        if include(row["user_id"], _normalize(row.get("date"))):
+            summary = summaries[row["user_id"], _normalize(row["date"])]
+            summary["water_goal"] = max(summary.get("water_goal", 0), row.get("water_goal", 0))
+            summary["consumed_water"] = summary.get("consumed_water", 0) + row.get("consumed_water", 0)
+            summary["hydrate_completed"] = summary.get("hydrate_completed", False) or bool(row.get("completed"))
+    for row in tables["diet_logs"]:
+        if include(row["user_id"], _normalize(row.get("date"))):
+            summary = summaries[row["user_id"], _normalize(row["date"])]
+            summary["calories_goal"] = max(summary.get("calories_goal", 0), row.get("calories_goal", 0))
+            summary["consumed_calories"] = summary.get("consumed_calories", 0) + row.get("consumed_calories", 0)
+            summary["meals"] = summary.get("meals", 0) + len(row.get("dishes") or [])
+            summary["diet_completed"] = summary.get("diet_completed", False) or bool(row.get("completed"))
+    for row in tables["sleep_logs"]:
+        day = _normalize(row.get("scheduled_time"))[:10]
+        if include(row["user_id"], day):
+            summary = summaries[row["user_id"], day]
+            summary["sleep_tasks"] = summary.get("sleep_tasks", 0) + 1
+            summary["sleep_tasks_completed"] = summary.get("sleep_tasks_completed", 0) + bool(row.get("completed"))
+    for row in tables["focus_logs"]:
+        if include(row["user_id"], _normalize(row.get("date"))):
+            summary = summaries[row["user_id"], _normalize(row["date"])]
+            summary["focus_done"] = summary.get("focus_done", 0) + row.get("focus_done", 0)
+            summary["focus_completed"] = summary.get("focus_completed", False) or bool(row.get("completed"))
+
+    updated_at = datetime.now(timezone.utc).isoformat()
+    for (user_id, day), columns in summaries.items():
+        existing = next(iter(tables["daily_summaries"].where(user_id=user_id, date=day)), None)
+        if existing is None:
+            tables["daily_summaries"].append(dict(columns, user_id=user_id, date=day, updated_at=updated_at))
+        else:
+            tables["daily_summaries"].update(existing, dict(columns, updated_at=updated_at))
+    return len(summaries)
+
+
+def _rollup_daily_summaries(tables, p_day, p_time_zone=None):
+    day = _normalize(p_day)
+    zone_users = _zone_users(tables, p_time_zone)
+    return _fold_daily_summaries(
+        tables, lambda user_id, row_day: row_day == day and (zone_users is None or user_id in zone_users))
+
+
+def _rollup_pending_days(tables, p_until, p_time_zone=None):
+    until = date.fromisoformat(_normalize(p_until))
+    name = "daily_summaries" if p_time_zone is None else f"daily_summaries:{p_time_zone}"
+    checkpoint = next(iter(tables["rollup_checkpoints"].where(name=name)), None)
+    if checkpoint is not None:
+        last_done = date.fromisoformat(checkpoint["last_date"])
+    else:
+        first_days = [_normalize(row["date"]) for name in ("hydrate_logs", "diet_logs", "focus_logs")
+                      for row in tables[name]]
+        first_days += [_normalize(row["scheduled_time"])[:10] for row in tables["sleep_logs"]]
+        last_done = date.fromisoformat(min(first_days)) - timedelta(days=1) if first_days else until
+    day = last_done + timedelta(days=1)
+    while day <= until:
+        _rollup_daily_summaries(tables, day.isoformat(), p_time_zone)
+        day += timedelta(days=1)
+    last_done = max(last_done, until)
+    if checkpoint is None:
+        tables["rollup_checkpoints"].append({"name": name, "last_date": last_done.isoformat()})
+    else:
+        checkpoint["last_date"] = last_done.isoformat()
+    return last_done.isoformat()
+
+
+def _purge_rollover_chunk(tables, p_time_zone, p_after, p_last, p_today, p_month_start):
+    after, last = _normalize(p_after), _normalize(p_last)
+    users = {user_id for user_id in _zone_users(tables, p_time_zone)
+             if (after is None or _normalize(user_id) > after) and _normalize(user_id) <= last}
+    today, month_start = _normalize(p_today), _normalize(p_month_start)
+    # Như database/020_purge_folds_summaries.sql: log được tổng hợp trước khi bị xóa
+    _fold_daily_summaries(tables, lambda user_id, day: user_id in users and day is not None and day < today)
+    purged = 0
+    for table_name, column, before in (("hydrate_logs", "date", today), ("diet_logs", "date", today),
+                                       ("focus_logs", "date", today), ("sleep_logs", "date", today),
+                                       ("user_quest_progress", "period_start_date", month_start)):
+        table = tables[table_name]
+        old = [row for row in table
+               if row["user_id"] in users and row.get(column) is not None and _normalize(row[column]) < before]
+        table.remove(old)
+        purged += len(old)
+    return purged
+
+
+def _rollover_time_zones(tables):
+    counts = defaultdict(int)
+    for row in tables["profiles"]:
+        counts[row.get("time_zone")] += 1
+    return [{"time_zone": zone, "users": users} for zone, users in sorted(counts.items())]
+
+
+FUNCTIONS = {
+    "increment_hydrate_log": _increment_hydrate_log,
+    "increment_focus_log": _increment_focus_log,
+    "append_diet_dishes": _append_diet_dishes,
+    "apply_quest_progress": _apply_quest_progress,
+    "refresh_quest_progress": _refresh_quest_progress,
+    "provision_user": _provision_user,
+    "rollup_daily_summaries": _rollup_daily_summaries,
+    "rollup_pending_days": _rollup_pending_days,
+    "purge_rollover_chunk": _purge_rollover_chunk,
+    "rollover_time_zones": _rollover_time_zones,
+}
+
+
+class _MemoryRpc:
+    def __init__(self, client, name, params):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        return self._execute()
+
+    def _execute(self):
+        with self._client.lock:
+            self._client.round_trips += 1
+            self._client.calls[("rpc", self._name)] += 1
+            try:
+                data = FUNCTIONS[self._name](self._client.tables, **self._params)
+            finally:
+                _bump_user_versions(self._client.tables)
+        return SimpleNamespace(data=data, count=None)
+
+
+class MemoryClient:
+    """Thay cho client Supabase: đếm round trip và có thể sleep ``latency`` giây mỗi lệnh gọi"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.tables: Dict[str, _MemoryTable] = _Tables()
+        self.round_trips = 0
+        self.calls = defaultdict(int)
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.calls = defaultdict(int)
+
+    def seed(self):
+        """Insert các dòng mà migration tạo (các quest), như database vừa migrate"""
+        self.table("quests").insert(SEED_QUESTS).execute()
+        return self
+
+    def _new_row(self, table_name, item):
+        row = dict(COLUMN_DEFAULTS.get(table_name, {}))
+        row.update(copy.deepcopy(item))
+        if table_name not in PRIMARY_KEYS:
+            row.setdefault("id", str(uuid.uuid4()))
+        if table_name in TIMESTAMP_DEFAULTS:
+            row.setdefault(TIMESTAMP_DEFAULTS[table_name], datetime.now(timezone.utc).isoformat())
+        for column, compute in GENERATED_COLUMNS.get(table_name, {}).items():
+            row[column] = compute(row)
+        return row
+
+    def table(self, table_name):
+        return _MemoryQuery(self, table_name)
+
+    def rpc(self, name, params=None):
+        return _MemoryRpc(self, name, params or {})
+
+
+class _AsyncMemoryBuilder:
+    """Bọc _MemoryQuery/_MemoryRpc để ``execute()`` được await, như builder của AsyncClient"""
+
+    def __init__(self, builder, client):
+        self._builder = builder
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return self if attr is self._builder else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._builder else result
+        return call
+
+    async def execute(self):
+        if self._client.latency:
+            await asyncio.sleep(self._client.latency)
+        return self._builder._execute()
+
+
+class AsyncMemoryClient:
+    """Phiên bản async của MemoryClient: cùng bảng và bộ đếm, latency được await"""
+
+    def __init__(self, client: MemoryClient):
+        self.sync = client
+
+    @property
+    def latency(self):
+        return self.sync.latency
+
+    def table(self, table_name):
+        return _AsyncMemoryBuilder(self.sync.table(table_name), self)
+
+    def rpc(self, name, params=None):
+        return _AsyncMemoryBuilder(self.sync.rpc(name, params), self)
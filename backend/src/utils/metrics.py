@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# Cận trên (giây) của các bucket histogram độ trễ, như mặc định của Prometheus client
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class _Shard:
+    """Metrics do 1 thread ghi. Chỉ thread đó ghi vào, nên ghi không cần lock"""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], int] = {}          # (route, method, status) -> số lượng
+        self.request_seconds: Dict[Tuple[str, str], list] = {}      # (route, method) -> histogram
+        self.in_progress: Dict[Tuple[str, str], int] = {}           # (route, method) -> số request đang chạy
+        self.queries: Dict[Tuple[str, str, str], int] = {}          # (table, operation, outcome) -> số lượng
+        self.query_seconds: Dict[Tuple[str, str], list] = {}        # (table, operation) -> histogram
+
+
+def _observe(histograms: Dict[tuple, list], key: tuple, seconds: float):
+    # [số lượng mỗi bucket..., số lượng trên bucket cuối, tổng các giá trị đo]
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+    histogram[bisect_left(BUCKETS, seconds)] += 1
+    histogram[-1] += seconds
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    """Metrics của request và truy vấn trong process, xuất theo định dạng text của Prometheus.
+
+    Mỗi thread ghi vào shard riêng; ``render()`` cộng các shard lại khi endpoint được scrape, nên đường
+    request không bao giờ chờ lock (chỉ lần ghi đầu của 1 thread lấy lock để đăng ký shard). Mỗi worker
+    gunicorn có số liệu riêng: mọi series có label ``worker`` (pid) để các worker tách biệt trong Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self.started_at = time.time()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def request_started(self, route: str, method: str):
+        in_progress = self._shard().in_progress
+        in_progress[(route, method)] = in_progress.get((route, method), 0) + 1
+
+    def request_finished(self, route: str, method: str, status: int, seconds: float):
+        shard = self._shard()
+        shard.in_progress[(route, method)] = shard.in_progress.get((route, method), 0) - 1
+        key = (route, method, str(status))
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        _observe(shard.request_seconds, (route, method), seconds)
+
+    def observe_query(self, table: str, operation: str, seconds: float, error: bool = False):
+        shard = self._shard()
+        key = (table, operation, "error" if error else "ok")
+        shard.queries[key] = shard.queries.get(key, 0) + 1
+        _observe(shard.query_seconds, (table, operation), seconds)
+
+    def reset(self):
+        """Xóa mọi thứ đã ghi (worker được fork không được báo số liệu của process cha)"""
+        self._lock = threading.Lock()  # Thread khác của process cha có thể đang giữ nó lúc fork
+        self._local = threading.local()
+        self._shards = []
+        self.started_at = time.time()
+
+    def _merged(self, attribute: str) -> dict:
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            # dict() sao chép trong 1 bước dưới GIL, kể cả khi thread sở hữu vẫn đang ghi
+            for key, value in dict(getattr(shard, attribute)).items():
+                if isinstance(value, list):
+                    total = merged.setdefault(key, [0] * len(value))
+                    for i, part in enumerate(value):
+                        total[i] += part
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        worker = f'worker="{os.getpid()}"'
+        lines = []
+
+        def series(name, help_text, kind, label_names, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_labels(label_names, key, worker)} {value}")
+
+        def histogram(name, help_text, label_names, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, parts in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), parts):
+                    cumulative += count
+                    bucket_labels = _labels(label_names + ("le",), key + (bound,), worker)
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_labels(label_names, key, worker)} {parts[-1]:.6f}")
+                lines.append(f"{name}_count{_labels(label_names, key, worker)} {cumulative}")
+
+        series("http_requests_total", "HTTP requests by route, method and status.", "counter",
+                ("route", "method", "status"), self._merged("requests"))
+        histogram("http_request_duration_seconds", "HTTP request latency by route and method.",
+                  ("route", "method"), self._merged("request_seconds"))
+        series("http_requests_in_progress", "HTTP requests being handled right now by route and method.", "gauge",
+                ("route", "method"), self._merged("in_progress"))
+        series("db_queries_total", "Data backend calls by table (or RPC function), operation and outcome.", "counter",
+                ("table", "operation", "outcome"), self._merged("queries"))
+        histogram("db_query_duration_seconds", "Data backend call latency by table (or RPC function) and operation.",
+                  ("table", "operation"), self._merged("query_seconds"))
+        lines.append("# HELP process_start_time_seconds Start time of the metrics of this worker (Unix time).")
+        lines.append("# TYPE process_start_time_seconds gauge")
+        lines.append(f"process_start_time_seconds{{{worker}}} {self.started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=metrics.reset)
+
+
+def track_requests(app):
+    """Ghi route, status và độ trễ của mọi request của app Flask"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        g._metrics_request = (route, request.method, time.perf_counter())
+        metrics.request_started(route, request.method)
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("_metrics_request", None)
+        if started:
+            route, method, started_at = started
+            metrics.request_finished(route, method, response.status_code, time.perf_counter() - started_at)
+        return response
+
+    return app
@@ -1,17 +1,74 @@
 import bcrypt
+import hmac
 import jwt
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
+from flask import jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt
 from datetime import datetime, timedelta, timezone
 from ..models import UserResponse
-from .config import JWT_SECRET_KEY
+from .config import JWT_SECRET_KEY, METRICS_TOKEN, BCRYPT_ROUNDS, BCRYPT_POOL_SIZE, BCRYPT_QUEUE_MAX
+from .exceptions import ServiceError
+
+# bcrypt chạy trên process pool riêng, giới hạn BCRYPT_POOL_SIZE process và BCRYPT_QUEUE_MAX việc chờ,
+# để một đợt đăng nhập dồn dập không chiếm hết CPU của các request khác.
+# Pool được tạo khi cần, mỗi worker process (sau fork) có pool riêng.
+_bcrypt_pool = None
+_bcrypt_pool_pid = None
+_bcrypt_slots = None
+_bcrypt_pool_lock = threading.Lock()
+
+def _get_bcrypt_pool():
+    global _bcrypt_pool, _bcrypt_pool_pid, _bcrypt_slots
+    if _bcrypt_pool_pid != os.getpid():
+        with _bcrypt_pool_lock:
+            if _bcrypt_pool_pid != os.getpid():
+                # spawn: process con chỉ cần import bcrypt, không kế thừa lock/thread của process cha
+                _bcrypt_pool = ProcessPoolExecutor(max_workers=BCRYPT_POOL_SIZE,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+                _bcrypt_slots = threading.BoundedSemaphore(BCRYPT_POOL_SIZE + BCRYPT_QUEUE_MAX)
+                _bcrypt_pool_pid = os.getpid()
+    return _bcrypt_pool, _bcrypt_slots
+
+def _run_bcrypt(fn, *args):
+    """Chạy fn (bcrypt.hashpw/checkpw) trên pool; hết chỗ trong hàng đợi thì trả 503 thay vì chờ."""
+    global _bcrypt_pool_pid
+    if BCRYPT_POOL_SIZE <= 0:
+        return fn(*args)
+    pool, slots = _get_bcrypt_pool()
+    if not slots.acquire(blocking=False):
+        raise ServiceError("Server is busy, please try again later", 503)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # Một process con bị kill: đóng pool hỏng (giải phóng các process còn lại), lần gọi sau tạo pool mới
+        with _bcrypt_pool_lock:
+            if _bcrypt_pool is pool:
+                _bcrypt_pool_pid = None
+                pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        slots.release()
 
 def generate_salt() -> str:
-    return bcrypt.gensalt().decode("utf-8")
+    return bcrypt.gensalt(rounds=BCRYPT_ROUNDS).decode("utf-8")
 
 def hash_password(password: str, salt: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), salt.encode("utf-8")).decode("utf-8")
+    return _run_bcrypt(bcrypt.hashpw, password.encode("utf-8"), salt.encode("utf-8")).decode("utf-8")
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+    return _run_bcrypt(bcrypt.checkpw, password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True khi hash được tạo với cost khác BCRYPT_ROUNDS (dạng $2b$<cost>$...)"""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
 
 def generate_jwt(user: UserResponse) -> str:
     payload = {
@@ -28,4 +85,24 @@ def verify_token(token):
     except jwt.ExpiredSignatureError:
         return None  # Token hết hạn
     except jwt.InvalidTokenError:
-        return None  # Token không hợp lệ
\ No newline at end of file
+        return None  # Token không hợp lệ
+
+def admin_required(fn):
+    """Giống jwt_required() nhưng chỉ cho phép token có role admin"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if get_jwt().get("role") != "admin":
+            return jsonify({"error": "Admin privileges required"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+def admin_or_metrics_token_required(fn):
+    """Như admin_required, hoặc header "Authorization: Bearer <METRICS_TOKEN>" (cho Prometheus scrape)"""
+    admin_fn = admin_required(fn)
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if METRICS_TOKEN and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+            return fn(*args, **kwargs)
+        return admin_fn(*args, **kwargs)
+    return wrapper
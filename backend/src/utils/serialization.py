@@ -0,0 +1,89 @@
+import json
+from functools import lru_cache
+from typing import Any, List, Tuple
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_jsonable_python
+
+try:
+    import orjson
+except ImportError:  # tùy chọn: không có thì dùng module json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # tùy chọn: không có thì mọi response là JSON
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: type) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def _model_list_type(payload: Any):
+    """Class model khi ``payload`` là list khác rỗng gồm các model cùng 1 kiểu, ngược lại None"""
+    if isinstance(payload, list) and payload and isinstance(payload[0], BaseModel):
+        model = type(payload[0])
+        if all(type(item) is model for item in payload):
+            return model
+    return None
+
+
+def encode_json(payload: Any) -> bytes:
+    """Bytes JSON của 1 model pydantic, 1 list model cùng kiểu, hoặc dữ liệu thường.
+
+    Model được ghi bằng serializer của chính pydantic, nên kết quả giống ``model_dump(mode="json")``
+    mà không phải tạo các dict trung gian. Dữ liệu thường đi qua orjson nếu đã cài"""
+    if isinstance(payload, BaseModel):
+        return payload.__pydantic_serializer__.to_json(payload)
+    model = _model_list_type(payload)
+    if model is not None:
+        return _list_adapter(model).dump_json(payload)
+    if orjson is not None:
+        return orjson.dumps(payload, default=to_jsonable_python)
+    return json.dumps(payload, default=to_jsonable_python, separators=(",", ":")).encode()
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    """Bytes MessagePack; model và ngày tháng được chuyển giống như với JSON"""
+    if isinstance(payload, BaseModel):
+        payload = payload.model_dump(mode="json")
+    else:
+        model = _model_list_type(payload)
+        if model is not None:
+            payload = _list_adapter(model).dump_python(payload, mode="json")
+    return msgpack.packb(payload, default=to_jsonable_python)
+
+
+def negotiate(accept_mimetypes) -> str:
+    """JSON, trừ khi client thích MessagePack hơn (``Accept: application/msgpack``) và đã cài msgpack"""
+    if msgpack is None:
+        return JSON
+    best = accept_mimetypes.best_match((JSON,) + MSGPACK_TYPES, default=JSON)
+    return MSGPACK if best in MSGPACK_TYPES else JSON
+
+
+def encode(payload: Any, mimetype: str) -> bytes:
+    return encode_msgpack(payload) if mimetype == MSGPACK else encode_json(payload)
+
+
+def respond(payload: Any, status: int = 200):
+    """Response Flask cho ``payload`` (xem encode_json), dạng JSON hoặc MessagePack theo Accept.
+
+    Thay ``jsonify(...)`` trong route: truyền model nguyên vẹn, không cần ``model_dump()``"""
+    from flask import current_app, request
+
+    mimetype = negotiate(request.accept_mimetypes)
+    response = current_app.response_class(encode(payload, mimetype), status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
+
+
+def encoded(payload: Any, accept_mimetypes) -> Tuple[bytes, str]:
+    """(body, mimetype) cho framework khác Flask (các route Quart)"""
+    mimetype = negotiate(accept_mimetypes)
+    return encode(payload, mimetype), mimetype
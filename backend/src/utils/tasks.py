@@ -0,0 +1,324 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+from .config import TASKS_ENABLED, TASK_WORKERS, TASK_QUEUE_MAX, TASK_MAX_RETRIES, TASK_RETRY_BACKOFF, TASK_SPOOL_DIR, TASK_DRAIN_TIMEOUT
+
+try:
+    import fcntl
+except ImportError:  # Windows: spool của process đã chết không được nhận lại, chỉ chạy lại bởi chính đường dẫn của nó
+    fcntl = None
+
+class _Spool:
+    """Bản ghi bền vững của các tác vụ process đã nhận nhưng chưa chạy xong.
+
+    Mỗi process 1 file SQLite, khóa bằng flock khi process còn sống. Dòng của tác vụ được ghi trước
+    khi đưa vào hàng đợi và chỉ xóa khi chạy thành công, nên process chết vẫn để lại nó trên đĩa;
+    process khởi động sau thấy file không bị khóa và chạy lại (giao ít nhất 1 lần)."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f"tasks-{uuid.uuid4().hex}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = self._open(self.path)
+        self._lock_file = open(self.path + ".lock", "w")
+        if fcntl:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            enqueued_at REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            dead INTEGER NOT NULL DEFAULT 0
+        )""")
+        return conn
+
+    def add(self, name: str, args: tuple, kwargs: dict, enqueued_at: float, attempts: int = 0) -> int:
+        payload = json.dumps({"args": list(args), "kwargs": kwargs})
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO tasks (name, payload, enqueued_at, attempts) VALUES (?, ?, ?, ?)",
+                (name, payload, enqueued_at, attempts))
+            return cursor.lastrowid
+
+    def done(self, task_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def failed(self, task_id: int, attempts: int, error: str, dead: bool):
+        with self._lock:
+            self._conn.execute("UPDATE tasks SET attempts = ?, last_error = ?, dead = ? WHERE id = ?",
+                               (attempts, error[:500], int(dead), task_id))
+
+    def pending(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, payload, enqueued_at, attempts FROM tasks WHERE dead = 0 ORDER BY id").fetchall()
+        return [(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            pending, dead, oldest = self._conn.execute(
+                "SELECT SUM(dead = 0), SUM(dead = 1), MIN(CASE WHEN dead = 0 THEN enqueued_at END) FROM tasks").fetchone()
+        return {"pending": pending or 0, "dead": dead or 0, "oldest_enqueued_at": oldest}
+
+    def adopt_orphans(self):
+        """Chuyển các tác vụ đang chờ của spool có process đã chết sang spool này và trả về chúng"""
+        if fcntl is None:
+            return []
+        adopted = []
+        for path in glob.glob(os.path.join(self.directory, "tasks-*.sqlite3")):
+            if path == self.path:
+                continue
+            with open(path + ".lock", "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # Process sở hữu vẫn còn sống
+                orphan = self._open(path)
+                rows = orphan.execute("SELECT name, payload, enqueued_at, attempts, dead, last_error FROM tasks").fetchall()
+                for name, payload, enqueued_at, attempts, dead, last_error in rows:
+                    data = json.loads(payload)
+                    task_id = self.add(name, tuple(data["args"]), data["kwargs"], enqueued_at, attempts)
+                    if dead:
+                        self.failed(task_id, attempts, last_error or "", dead=True)
+                    else:
+                        adopted.append((task_id, name, data, enqueued_at, attempts))
+                orphan.close()
+                for suffix in ("", "-wal", "-shm", ".lock"):
+                    try:
+                        os.remove(path + suffix)
+                    except FileNotFoundError:
+                        pass
+        return adopted
+
+    def close(self):
+        """Đóng spool; file bị xóa khi không còn tác vụ nào trong đó"""
+        empty = not any(self.counts()[key] for key in ("pending", "dead"))
+        with self._lock:
+            self._conn.close()
+        if empty:
+            for suffix in ("", "-wal", "-shm", ".lock"):
+                try:
+                    os.remove(self.path + suffix)
+                except FileNotFoundError:
+                    pass
+        self._lock_file.close()
+
+
+class TaskQueue:
+    """Chạy trong process các tác vụ phụ có thể làm sau khi đã trả response (cộng streak, tính lại
+    tiến độ quest, ...).
+
+    Tác vụ được gọi theo tên với tham số JSON được, nên ghi xuống spool trên đĩa được. Tác vụ được
+    giao ít nhất 1 lần, nên handler phải idempotent. Hàng đợi đầy thì người gọi tự chạy tác vụ thay vì
+    bỏ đi; lỗi khi tự chạy chỉ được ghi log, không bao giờ ném ra cho người gọi, và tác vụ vẫn nằm trong
+    spool như mọi tác vụ lỗi. Tác vụ lỗi được thử lại với thời gian chờ tăng gấp đôi, tối đa
+    TASK_MAX_RETRIES lần, sau đó giữ trong spool dưới dạng dead. Thread worker và spool được tạo ở lần
+    enqueue đầu tiên, nên server pre-fork tạo chúng trong từng worker."""
+
+    def __init__(self, enabled: bool, workers: int, max_queue: int, max_retries: int,
+                 retry_backoff: float, spool_dir: str, drain_timeout: float):
+        self.enabled = enabled
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spool_dir = spool_dir
+        self.drain_timeout = drain_timeout
+        self._handlers: Dict[str, Callable] = {}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._spool: Optional[_Spool] = None
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._accepting = True
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+        self.ran_inline = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def register(self, name: str, handler: Callable):
+        self._handlers[name] = handler
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._spool = _Spool(self.spool_dir)
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work, name="task-worker", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.drain)
+            # Chạy lại những gì process đã chết để lại
+            for task_id, name, data, enqueued_at, attempts in self._spool.adopt_orphans():
+                self._queue.put((task_id, name, tuple(data["args"]), data["kwargs"], enqueued_at, attempts))
+
+    def enqueue(self, name: str, *args, **kwargs):
+        """Lên lịch chạy handler ``name`` sau request hiện tại. Không bao giờ ném lỗi vì handler:
+        dữ liệu của người gọi đã được ghi xong"""
+        if not self.enabled:
+            self._run_inline(None, name, args, kwargs)
+            return
+        enqueued_at = time.time()
+        try:
+            self._ensure_started()
+            task_id = self._spool.add(name, args, kwargs, enqueued_at)
+        except Exception as e:
+            # Spool không dùng được (đầy đĩa, ...): chạy ngay tại đây, không có bản ghi bền vững
+            print(f"Could not spool task {name}{args}: {e}")
+            self._run_inline(None, name, args, kwargs)
+            return
+        if not self._accepting:
+            # Đang drain: chạy ngay tại đây; nếu lỗi dòng vẫn chờ trong spool và lần khởi động sau chạy lại
+            self._run_inline(task_id, name, args, kwargs)
+            return
+        try:
+            self._queue.put_nowait((task_id, name, args, kwargs, enqueued_at, 0))
+            with self._stats_lock:
+                self.enqueued += 1
+        except queue.Full:
+            # Back-pressure: chạy trên thread của request thay vì bỏ tác vụ
+            with self._stats_lock:
+                self.ran_inline += 1
+            self._run_inline(task_id, name, args, kwargs)
+
+    def _run_inline(self, task_id: Optional[int], name: str, args: tuple, kwargs: dict):
+        """Chạy tác vụ trên thread của người gọi. Dòng trong spool chỉ bị xóa khi handler chạy thành công;
+        lỗi được ghi log và thử lại như lỗi trên thread worker"""
+        try:
+            self._handlers[name](*args, **kwargs)
+        except Exception as e:
+            if task_id is None:
+                print(f"Task {name}{args} failed: {getattr(e, 'message', str(e))}")
+                return
+            self._retry_or_bury((task_id, name, args, kwargs, time.time(), 0), e)
+            return
+        if task_id is not None:
+            self._spool.done(task_id)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            task_id, name, args, kwargs, enqueued_at, attempts = item
+            lag = time.time() - enqueued_at
+            with self._stats_lock:
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+            try:
+                handler = self._handlers.get(name)
+                if handler is None:
+                    raise LookupError(f"No task handler registered for {name}")
+                handler(*args, **kwargs)
+                self._spool.done(task_id)
+                with self._stats_lock:
+                    self.completed += 1
+            except Exception as e:
+                self._retry_or_bury(item, e)
+            finally:
+                self._queue.task_done()
+
+    def _retry_or_bury(self, item, error: Exception):
+        task_id, name, args, kwargs, enqueued_at, attempts = item
+        attempts += 1
+        message = getattr(error, "message", str(error))
+        if attempts > self.max_retries or not self._accepting:
+            # Hết lượt thử (hoặc đang tắt): giữ trong spool, khi tắt thì để chờ lần khởi động sau chạy lại
+            dead = attempts > self.max_retries
+            self._spool.failed(task_id, attempts, message, dead=dead)
+            if dead:
+                print(f"Task {name}{args} failed {attempts} times, giving up: {message}")
+                with self._stats_lock:
+                    self.dead += 1
+            return
+        self._spool.failed(task_id, attempts, message, dead=False)
+        with self._stats_lock:
+            self.retried += 1
+        delay = self.retry_backoff * (2 ** (attempts - 1))
+        timer = threading.Timer(delay, self._requeue, args=((task_id, name, args, kwargs, enqueued_at, attempts),))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if not self._accepting:
+                return  # Đang tắt: vẫn chờ trong spool, lần khởi động sau chạy lại
+            # Vẫn chờ trong spool mà process này đang giữ: thử lại sau 1 khoảng chờ
+            timer = threading.Timer(self.retry_backoff, self._requeue, args=(item,))
+            timer.daemon = True
+            timer.start()
+
+    def drain(self, timeout: Optional[float] = None):
+        """Ngừng nhận tác vụ nền, chờ hàng đợi hết (tối đa ``timeout``) rồi dừng các worker. Tác vụ chưa
+        xong vẫn nằm trong spool và được chạy lại ở lần khởi động sau"""
+        if not self._threads or not self._accepting:
+            return
+        self._accepting = False
+        deadline = time.monotonic() + (self.drain_timeout if timeout is None else timeout)
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        if not self._queue.unfinished_tasks:
+            self._spool.close()
+
+    def stats(self) -> dict:
+        spool = self._spool.counts() if self._spool else {"pending": 0, "dead": 0, "oldest_enqueued_at": None}
+        oldest = spool.pop("oldest_enqueued_at")
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "queue_max": self._queue.maxsize,
+                "spool_pending": spool["pending"],
+                "spool_dead": spool["dead"],
+                "oldest_pending_age": round(time.time() - oldest, 3) if oldest else 0.0,
+                "last_lag": round(self.last_lag, 3),
+                "max_lag": round(self.max_lag, 3),
+                "enqueued": self.enqueued,
+                "completed": self.completed,
+                "retried": self.retried,
+                "dead": self.dead,
+                "ran_inline": self.ran_inline,
+            }
+
+task_queue = TaskQueue(
+    enabled=TASKS_ENABLED,
+    workers=TASK_WORKERS,
+    max_queue=TASK_QUEUE_MAX,
+    max_retries=TASK_MAX_RETRIES,
+    retry_backoff=TASK_RETRY_BACKOFF,
+    spool_dir=TASK_SPOOL_DIR,
+    drain_timeout=TASK_DRAIN_TIMEOUT,
+)
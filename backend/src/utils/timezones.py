@@ -0,0 +1,75 @@
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .config import supabase, DEFAULT_TIME_ZONE
+from .cache import time_zone_cache
+from .flow import Cached, run
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def is_valid_time_zone(name) -> bool:
+    """True nếu là tên múi giờ IANA mà zoneinfo biết (vd. ``"Asia/Ho_Chi_Minh"``)"""
+    if not isinstance(name, str) or not name:
+        return False
+    try:
+        get_zone(name)
+    except (ZoneInfoNotFoundError, ValueError, OSError):
+        return False
+    return True
+
+
+def local_today(time_zone: Optional[str] = None) -> date:
+    """Ngày hôm nay theo ``time_zone`` (mặc định DEFAULT_TIME_ZONE)"""
+    return datetime.now(get_zone(time_zone or DEFAULT_TIME_ZONE)).date()
+
+
+def period_starts(time_zone: Optional[str] = None) -> Tuple[date, date]:
+    """(hôm nay, ngày đầu tháng) theo ``time_zone``: ngày bắt đầu của kỳ quest ngày và kỳ quest tháng"""
+    return period_starts_of(local_today(time_zone))
+
+
+def period_starts_of(day: date) -> Tuple[date, date]:
+    """(day, ngày đầu tháng của nó): các kỳ quest chứa ``day``"""
+    return day, day.replace(day=1)
+
+
+def _zone_of(rows) -> str:
+    # Múi giờ không rõ hoặc không có (chưa tạo profile, múi giờ bị bỏ khỏi tzdata) dùng múi giờ mặc định
+    zone = rows[0].get("time_zone") if rows else None
+    return zone if is_valid_time_zone(zone) else DEFAULT_TIME_ZONE
+
+
+def user_time_zone_flow(client, user_id: str):
+    """Múi giờ của user (profiles.time_zone), cache trong mỗi worker TIME_ZONE_CACHE_TTL giây (xem flow.py).
+    Trúng cache không tốn truy vấn nào; cập nhật profile xóa entry ở worker của nó"""
+    return (yield Cached(time_zone_cache, user_id, lambda: _load_time_zone(client, user_id)))
+
+
+def _load_time_zone(client, user_id: str):
+    response = yield client.table("profiles").select("time_zone").eq("user_id", user_id)
+    return _zone_of(response.data)
+
+
+def user_today_flow(client, user_id: str):
+    return local_today((yield from user_time_zone_flow(client, user_id)))
+
+
+def user_period_starts_flow(client, user_id: str):
+    return period_starts((yield from user_time_zone_flow(client, user_id)))
+
+
+def user_time_zone(user_id: str) -> str:
+    return run(user_time_zone_flow(supabase, user_id))
+
+
+def user_today(user_id: str) -> date:
+    return run(user_today_flow(supabase, user_id))
+
+
+def user_period_starts(user_id: str) -> Tuple[date, date]:
+    return run(user_period_starts_flow(supabase, user_id))
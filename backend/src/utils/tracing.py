@@ -0,0 +1,109 @@
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from .metrics import UNMATCHED_ROUTE
+
+# Các method builder thu hẹp hoặc định dạng truy vấn; tên và cột của chúng (không có giá trị) tạo nên dạng truy vấn
+SHAPE_METHODS = frozenset(("eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_", "contains",
+                           "match", "or_", "order", "limit", "range", "single", "maybe_single", "not_"))
+
+_current: ContextVar[Optional["QueryTrace"]] = ContextVar("query_trace", default=None)
+
+
+def current_trace() -> Optional["QueryTrace"]:
+    """Trace của request đang xử lý, None khi request không được lấy mẫu"""
+    return _current.get()
+
+
+def shape_part(method: str, args: tuple) -> str:
+    """``eq("user_id", x)`` -> ``"eq:user_id"``: filter không kèm giá trị"""
+    if method == "match" and args and isinstance(args[0], dict):
+        return "match:" + ",".join(sorted(args[0]))
+    if args and isinstance(args[0], str) and method not in ("limit", "range", "or_"):
+        return f"{method}:{args[0]}"
+    return method
+
+
+class QueryTrace:
+    """Mọi lệnh gọi data backend của 1 request: (table, operation, shape, seconds, rows).
+
+    Dùng chung bởi các thread (gather) và task (agather) làm việc cho request; list.append là atomic,
+    nên chúng thêm vào mà không cần lock"""
+
+    __slots__ = ("route", "started", "spans")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, str, tuple, float, int]] = []
+
+    def add(self, table: str, operation: str, shape: tuple, seconds: float, rows: int):
+        self.spans.append((table, operation, shape, seconds, rows))
+
+    def repeated(self, threshold: int) -> List[Tuple[tuple, int]]:
+        """Các key (table, operation, shape) được gọi hơn ``threshold`` lần, lặp nhiều nhất trước"""
+        counts = Counter((table, operation, shape) for table, operation, shape, _, _ in self.spans)
+        return [(key, count) for key, count in counts.most_common() if count > threshold]
+
+    def server_timing(self) -> str:
+        """Giá trị Server-Timing: tổng thời gian, thời gian trong data backend và thời gian theo từng bảng"""
+        total = (time.perf_counter() - self.started) * 1000
+        per_table = {}
+        for table, _, _, seconds, _ in self.spans:
+            calls, spent = per_table.get(table, (0, 0.0))
+            per_table[table] = (calls + 1, spent + seconds * 1000)
+        rows = sum(span[4] for span in self.spans)
+        db = sum(spent for _, spent in per_table.values())
+        entries = [f"total;dur={total:.1f}", f'db;dur={db:.1f};desc="{len(self.spans)} queries, {rows} rows"']
+        entries += [f'db.{table};dur={spent:.1f};desc="{calls} calls"'
+                    for table, (calls, spent) in sorted(per_table.items(), key=lambda item: -item[1][1])]
+        return ", ".join(entries)
+
+
+def start_trace(route: str, sample_rate: float):
+    """Bắt đầu trace request hiện tại với xác suất ``sample_rate``; trả về token cho ``end_trace``"""
+    if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+        return None
+    return _current.set(QueryTrace(route))
+
+
+def end_trace(token):
+    if token is not None:
+        _current.reset(token)
+
+
+def warn_repeated(trace: QueryTrace, method: str, threshold: int):
+    """In các dạng truy vấn lặp lại hơn ``threshold`` lần trong request (có thể là N+1)"""
+    for (table, operation, shape), count in trace.repeated(threshold):
+        filters = " ".join(shape) or "no filters"
+        print(f"Possible N+1 in {method} {trace.route}: {operation} on {table} ({filters}) ran {count} times")
+
+
+def trace_requests(app, sample_rate: float, repeat_threshold: int, server_timing: bool = False):
+    """Trace 1 mẫu các request của app Flask (xem QueryTrace).
+
+    Cảnh báo các dạng truy vấn lặp lại, và với ``server_timing`` thêm header Server-Timing"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_query_trace():
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        g._query_trace_token = start_trace(route, sample_rate)
+
+    @app.after_request
+    def _report_query_trace(response):
+        trace = current_trace()
+        if trace is not None and g.get("_query_trace_token") is not None:
+            warn_repeated(trace, request.method, repeat_threshold)
+            if server_timing:
+                response.headers["Server-Timing"] = trace.server_timing()
+        return response
+
+    @app.teardown_request
+    def _end_query_trace(exc):
+        # Worker gthread dùng lại thread: request sau không được kế thừa trace này
+        end_trace(g.pop("_query_trace_token", None))
+
+    return app
@@ -0,0 +1,53 @@
+from contextvars import ContextVar
+from typing import Optional
+from .config import supabase
+from .flow import run
+
+# Phiên bản đã đọc trong request hiện tại: {user_id: data_version}.
+# None khi không ở trong request (tác vụ nền, script): khi đó mỗi lần đọc đều truy vấn database
+_request_versions: ContextVar[Optional[dict]] = ContextVar("request_versions", default=None)
+
+
+def start_version_memo():
+    """Bắt đầu nhớ các phiên bản request hiện tại đã đọc; trả về token cho ``end_version_memo``"""
+    return _request_versions.set({})
+
+
+def end_version_memo(token):
+    if token is not None:
+        _request_versions.reset(token)
+
+
+class DatabaseVersionStore:
+    """Phiên bản dữ liệu của từng user, lưu trong bảng user_versions (database/019_user_versions.sql),
+    là một phần của ETag (etag.py).
+
+    Trigger tăng phiên bản của user sau mỗi câu lệnh ghi vào dữ liệu của họ, dù từ process hay đường ghi
+    nào, nên mọi worker thấy cùng phiên bản và app không bao giờ tự tăng. Mỗi request chỉ đọc phiên bản
+    của 1 user 1 lần (xem start_version_memo). User chưa có dòng nào có phiên bản 0. Đọc lỗi thì phiên
+    bản là None: khi đó người gọi hash body của response"""
+    name = "database"
+
+    def __init__(self, client):
+        self.client = client
+
+    def data_version_flow(self, client, user_id: str):
+        """Phiên bản dữ liệu của ``user_id``, dạng flow (flow.py)"""
+        memo = _request_versions.get()
+        if memo is not None and user_id in memo:
+            return memo[user_id]
+        try:
+            response = yield client.table("user_versions").select("data_version").eq("user_id", user_id)
+        except Exception as e:
+            print(f"Could not read the data version of user {user_id}: {e}")
+            return None
+        version = str(response.data[0]["data_version"]) if response.data else "0"
+        if memo is not None:
+            memo[user_id] = version
+        return version
+
+    def get(self, user_id: str) -> Optional[str]:
+        return run(self.data_version_flow(self.client, user_id))
+
+
+user_versions = DatabaseVersionStore(supabase)
@@ -1,6 +1,21 @@
+import os
+import tempfile
 import pytest
-from app import app
-from src.utils import supabase  # Import Supabase để xóa dữ liệu test
+from dotenv import load_dotenv
+
+# Có Supabase (biến môi trường hoặc .env, như trên CI) thì test chạy với Supabase thật, để các migration SQL
+# cũng được kiểm tra; không có thì chạy offline trên backend "memory". DATA_BACKEND đặt sẵn thì giữ nguyên
+load_dotenv()
+os.environ.setdefault("DATA_BACKEND", "supabase" if os.getenv("SUPABASE_URL") else "memory")
+if os.environ["DATA_BACKEND"] == "memory":
+    os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")  # Hash nhanh, chỉ dùng cho dữ liệu test
+    os.environ.setdefault("TASK_SPOOL_DIR", tempfile.mkdtemp(prefix="test-spool-"))
+
+from app import create_app
+from src.utils import supabase, DATA_BACKEND  # Import Supabase để xóa dữ liệu test
+
+app = create_app()
 
 @pytest.fixture
 def client():
@@ -14,6 +29,14 @@ def cleanup():
     
 VALID_PERMANENT_USER = {"email": "test_permanent@example.com", "password": "password123"}
 
+@pytest.fixture(scope="session", autouse=True)
+def permanent_user():
+    """Backend memory bắt đầu rỗng (chỉ có quest): tạo user cố định mà Supabase test đã có sẵn"""
+    if DATA_BACKEND == "memory":
+        with app.test_client() as client:
+            response = client.post("/auth/register", json=VALID_PERMANENT_USER)
+            assert response.status_code == 201
+
 @pytest.fixture
 def auth_token(client):
     """Đăng nhập và lấy token"""
@@ -0,0 +1,21 @@
+import pytest
+
+DASHBOARD_KEYS = {"date", "sleep_logs", "hydrate_logs", "diet_logs", "focus_logs", "sleep_habit", "focus_habit", "xp_rewards", "quests", "errors"}
+
+@pytest.mark.dashboard
+@pytest.mark.order(60)
+def test_get_dashboard_today_success(client, auth_token):
+    """Lấy dữ liệu màn hình chính hôm nay trong 1 request"""
+    response = client.get("/dashboard/today", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 200
+    assert DASHBOARD_KEYS <= set(response.json)
+    assert isinstance(response.json["quests"], list)
+    assert response.json["errors"] == {}
+
+@pytest.mark.dashboard
+@pytest.mark.order(61)
+def test_get_dashboard_today_unauthorized(client):
+    """Lấy dữ liệu màn hình chính khi chưa đăng nhập"""
+    response = client.get("/dashboard/today")
+    assert response.status_code == 401
+    assert "Missing Authorization Header" in response.json["msg"]
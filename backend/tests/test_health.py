@@ -0,0 +1,48 @@
+import pytest
+
+@pytest.mark.health
+@pytest.mark.order(70)
+def test_health_metrics(client, auth_token):
+    """Số request theo route và số lần gọi theo bảng xuất hiện ở /health/metrics (chỉ admin)"""
+    from src.models import UserResponse
+    from src.utils import generate_jwt
+    client.get("/dashboard/today", headers={"Authorization": f"Bearer {auth_token}"})
+    assert client.get("/health/metrics").status_code == 401
+    assert client.get("/health/metrics", headers={"Authorization": f"Bearer {auth_token}"}).status_code == 403
+
+    admin_token = generate_jwt(UserResponse(id="00000000-0000-4000-8000-0000000000ad", email="admin@example.com", role="admin"))
+    response = client.get("/health/metrics", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{route="/dashboard/today",method="GET",status="200"' in body
+    assert 'http_request_duration_seconds_bucket{route="/dashboard/today",method="GET",le="+Inf"' in body
+    assert 'db_queries_total{table="users",operation="select",outcome="ok"' in body
+
+@pytest.mark.health
+@pytest.mark.order(71)
+def test_query_trace_detects_repeated_shape(capsys):
+    """Cùng một kiểu truy vấn (bảng, bộ lọc) lặp lại quá ngưỡng trong 1 request thì bị cảnh báo N+1"""
+    from src.utils import supabase, start_trace, end_trace, current_trace, warn_repeated
+    token = start_trace("/test", sample_rate=1.0)
+    try:
+        for quest_id in range(4):
+            supabase.table("quests").select("*").eq("id", str(quest_id)).execute()
+        supabase.table("quests").select("*").limit(1).execute()
+        trace = current_trace()
+        assert len(trace.spans) == 5
+        assert trace.repeated(3) == [(("quests", "select", ("eq:id",)), 4)]
+        assert 'db;dur=' in trace.server_timing()
+        warn_repeated(trace, "GET", 3)
+    finally:
+        end_trace(token)
+    assert current_trace() is None
+    assert "Possible N+1 in GET /test: select on quests (eq:id) ran 4 times" in capsys.readouterr().out
+
+@pytest.mark.health
+@pytest.mark.order(72)
+def test_health_tasks_requires_admin(client, auth_token):
+    """/health/tasks chỉ dành cho admin"""
+    assert client.get("/health/tasks").status_code == 401
+    response = client.get("/health/tasks", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 403
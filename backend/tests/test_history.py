@@ -0,0 +1,88 @@
+import pytest
+from datetime import timedelta
+from src.utils import supabase, local_today
+
+@pytest.mark.history
+@pytest.mark.order(80)
+def test_get_summary_history_after_rollup(client, auth_token):
+    """Log của hôm qua được tổng hợp vào daily_summaries (chạy lại không đổi kết quả) và đọc qua /history/summary"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    user_id = client.get("/hydrate/logs/today", headers=headers).json[0]["user_id"]
+    yesterday = (local_today() - timedelta(days=1)).isoformat()
+    supabase.table("hydrate_logs").delete().eq("user_id", user_id).eq("date", yesterday).execute()
+    supabase.table("hydrate_logs").insert({"user_id": user_id, "water_goal": 2000, "cup_size": 250,
+                                           "consumed_water": 2250, "date": yesterday, "completed": True}).execute()
+    for _ in range(2):
+        supabase.rpc("rollup_daily_summaries", {"p_day": yesterday}).execute()
+
+    response = client.get(f"/history/summary?from={yesterday}&to={yesterday}&fields=consumed_water,hydrate_completed",
+                          headers=headers)
+    assert response.status_code == 200
+    assert response.json["items"] == [{"date": yesterday, "consumed_water": 2250, "hydrate_completed": True}]
+    assert response.json["next_cursor"] is None
+
+@pytest.mark.history
+@pytest.mark.order(81)
+def test_get_history_stats(client, auth_token):
+    """Thống kê tính từ daily_summaries"""
+    yesterday = (local_today() - timedelta(days=1)).isoformat()
+    response = client.get(f"/history/stats?from={yesterday}&to={yesterday}",
+                          headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 200
+    assert response.json["hydrate"]["completed_days"] == 1
+    assert response.json["hydrate"]["average_consumed_water"] == 2250
+
+@pytest.mark.history
+@pytest.mark.order(82)
+def test_get_sleep_history_paginated(client, auth_token):
+    """Lịch sử sleep theo trang (limit=1) chỉ với các cột đã chọn"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/history/sleep?fields=task_type&limit=1", headers=headers)
+    assert response.status_code == 200
+    first = response.json
+    assert len(first["items"]) == 1
+    assert set(first["items"][0]) == {"task_type", "scheduled_time", "id"}
+    assert first["next_cursor"]
+
+    response = client.get(f"/history/sleep?fields=task_type&limit=1&cursor={first['next_cursor']}", headers=headers)
+    assert response.status_code == 200
+    second = response.json
+    assert len(second["items"]) == 1
+    assert second["items"][0]["id"] != first["items"][0]["id"]
+    assert second["items"][0]["scheduled_time"] >= first["items"][0]["scheduled_time"]
+
+@pytest.mark.history
+@pytest.mark.order(83)
+def test_get_sleep_history_invalid_fields(client, auth_token):
+    """Chọn cột không có trong sleep_logs"""
+    response = client.get("/history/sleep?fields=password", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 400
+    assert "error" in response.json
+
+@pytest.mark.history
+@pytest.mark.order(84)
+def test_get_hydrate_history_reads_summaries(client, auth_token):
+    """Ngày trước hôm nay đọc từ daily_summaries (kể cả khi log đã bị xóa), hôm nay từ log gốc, không trùng ngày"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    today = client.get("/hydrate/logs/today", headers=headers).json[0]
+    yesterday = (local_today() - timedelta(days=1)).isoformat()
+    summary = {"id": None, "date": yesterday, "consumed_water": 2250, "completed": True}
+
+    response = client.get(f"/history/hydrate?from={yesterday}&to={yesterday}&fields=consumed_water,completed",
+                          headers=headers)
+    assert response.json["items"] == [summary]
+
+    # Rollover xóa log của hôm qua
+    supabase.table("hydrate_logs").delete().eq("user_id", today["user_id"]).eq("date", yesterday).execute()
+    first = client.get(f"/history/hydrate?from={yesterday}&to={today['date']}&fields=consumed_water,completed&limit=1",
+                       headers=headers).json
+    assert first["items"] == [summary]
+    assert first["next_cursor"]
+
+    second = client.get(f"/history/hydrate?from={yesterday}&to={today['date']}&fields=consumed_water,completed"
+                        f"&limit=1&cursor={first['next_cursor']}", headers=headers).json
+    assert [item["id"] for item in second["items"]] == [today["id"]]
+    assert second["next_cursor"] is None
+
+    week = client.get("/hydrate/logs/week", headers=headers).json
+    assert [log["id"] for log in week if log["date"] == today["date"]] == [today["id"]]
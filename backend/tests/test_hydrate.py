@@ -1,4 +1,6 @@
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.utils import DATA_BACKEND
 
 # Dữ liệu test
 VALID_HYDRATE_HABIT = {"water_goal": 2000, "cup_size": 250, "reminder_time": ["08:00", "12:00", "18:00"]}
@@ -77,3 +79,88 @@ def test_update_hydrate_log_not_found(client, auth_token):
     response = client.put(f"/hydrate/logs/{log_id}/update", headers={"Authorization": f"Bearer {auth_token}"})
     assert response.status_code == 404
     assert "error" in response.json
+
+@pytest.mark.hydrate
+@pytest.mark.order(48)
+@pytest.mark.skipif(DATA_BACKEND != "supabase", reason="Tính nguyên tử của increment_hydrate_log chỉ kiểm tra được trên Supabase")
+def test_update_hydrate_log_concurrent_taps(client, auth_token):
+    """100 lần bấm song song phải cộng đúng 100 cốc nước (câu UPDATE nguyên tử trong increment_hydrate_log,
+    database/010_atomic_log_updates.sql)"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    # Đặt lại habit để log hôm nay bắt đầu từ 0
+    response = client.put("/hydrate/habit", json=VALID_HYDRATE_HABIT, headers=headers)
+    assert response.status_code == 200
+    log_id = client.get("/hydrate/logs/today", headers=headers).json[0]["id"]
+
+    def tap(_):
+        with client.application.test_client() as thread_client:
+            return thread_client.put(f"/hydrate/logs/{log_id}/update", headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(tap, range(100)))
+    assert statuses == [200] * 100
+
+    log = client.get("/hydrate/logs/today", headers=headers).json[0]
+    assert log["consumed_water"] == 100 * VALID_HYDRATE_HABIT["cup_size"]
+    assert log["completed"] is True
+
+@pytest.mark.hydrate
+@pytest.mark.order(49)
+def test_get_today_hydrate_logs_not_modified(client, auth_token):
+    """Gửi lại ETag thì nhận 304; sau khi cập nhật log thì ETag cũ hết khớp, kể cả khi ghi ngoài request"""
+    from src.utils import supabase
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/hydrate/logs/today", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    response = client.get("/hydrate/logs/today", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    log_id = client.get("/hydrate/logs/today", headers=headers).json[0]["id"]
+    assert client.put(f"/hydrate/logs/{log_id}/update", headers=headers).status_code == 200
+    response = client.get("/hydrate/logs/today", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # Tác vụ nền, worker khác hay cron ghi thẳng vào bảng: trigger của user_versions vẫn đổi phiên bản
+    etag = response.headers["ETag"]
+    supabase.table("hydrate_logs").update({"consumed_water": 0}).eq("id", log_id).execute()
+    response = client.get("/hydrate/logs/today", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+@pytest.mark.hydrate
+@pytest.mark.order(50)
+def test_get_today_hydrate_logs_created_on_first_use(client, auth_token):
+    """Chưa có log hôm nay (rollover không tạo trước): lần đọc đầu tiên tạo log từ habit, chỉ 1 dòng"""
+    from src.utils import supabase
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    log = client.get("/hydrate/logs/today", headers=headers).json[0]
+    supabase.table("hydrate_logs").delete().eq("user_id", log["user_id"]).eq("date", log["date"]).execute()
+
+    response = client.get("/hydrate/logs/today", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json) == 1
+    assert response.json[0]["consumed_water"] == 0
+    assert response.json[0]["water_goal"] == VALID_HYDRATE_HABIT["water_goal"]
+    assert len(client.get("/hydrate/logs/today", headers=headers).json) == 1
+
+@pytest.mark.hydrate
+@pytest.mark.order(58)
+def test_get_hydrate_habit_cached(client, auth_token):
+    """Đọc lại habit trúng cache (không truy vấn DB); cập nhật habit thì lần đọc sau thấy ngay giá trị mới"""
+    from src.utils import habit_cache
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    assert client.get("/hydrate/habit", headers=headers).status_code == 200
+    hits = habit_cache.stats()["hits"]
+    assert client.get("/hydrate/habit", headers=headers).json["water_goal"] == VALID_HYDRATE_HABIT["water_goal"]
+    assert habit_cache.stats()["hits"] == hits + 1
+
+    try:
+        assert client.put("/hydrate/habit", json={**VALID_HYDRATE_HABIT, "water_goal": 2500}, headers=headers).status_code == 200
+        assert client.get("/hydrate/habit", headers=headers).json["water_goal"] == 2500
+    finally:
+        client.put("/hydrate/habit", json=VALID_HYDRATE_HABIT, headers=headers)
@@ -1,4 +1,6 @@
 import pytest
+from flask_jwt_extended import decode_token
+from src.utils import local_today, user_today
 
 # Dữ liệu test
 VALID_USER = {"email": "test@example.com", "password": "password123"}
@@ -50,6 +52,27 @@ def test_update_profile_invalid_data(client, auth_token):
     assert response.status_code == 400  # Bad Request
     assert "error" in response.json
 
+@pytest.mark.profile
+@pytest.mark.order(9)
+def test_update_profile_time_zone(client, auth_token):
+    """Đổi múi giờ: "hôm nay" của user tính theo múi giờ mới; múi giờ không tồn tại bị từ chối"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    with client.application.app_context():
+        user_id = decode_token(auth_token)["sub"]
+    time_zone = client.get("/profile", headers=headers).json["time_zone"]
+
+    try:
+        response = client.put("/profile", json={**NEW_PROFILE, "time_zone": "Pacific/Kiritimati"}, headers=headers)
+        assert response.status_code == 200
+        assert response.json["time_zone"] == "Pacific/Kiritimati"
+        assert user_today(user_id) == local_today("Pacific/Kiritimati")
+
+        response = client.put("/profile", json={**NEW_PROFILE, "time_zone": "Mars/Olympus_Mons"}, headers=headers)
+        assert response.status_code == 400
+    finally:
+        # Trả lại múi giờ cũ cho các test sau
+        client.put("/profile", json={**NEW_PROFILE, "time_zone": time_zone}, headers=headers)
+
 @pytest.mark.profile
 @pytest.mark.order(14)
 def test_change_password_wrong_old_password(client, auth_token):
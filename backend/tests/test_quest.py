@@ -0,0 +1,43 @@
+import pytest
+from flask_jwt_extended import decode_token
+
+VALID_HYDRATE_HABIT = {"water_goal": 2000, "cup_size": 250, "reminder_time": ["08:00"]}
+
+def _hydrate_quest(client, headers):
+    quests = client.get("/quest", headers=headers).json
+    return next(quest for quest in quests if quest["trigger_type"] == "hydrate_goal")
+
+@pytest.mark.quest
+@pytest.mark.order(65)
+def test_quest_progress_follows_source_down(client, auth_token):
+    """Progress của quest chưa nhận thưởng được tính lại từ log: đặt lại habit thì progress về 0"""
+    from src.services.quest_services import quest_service
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    with client.application.app_context():
+        user_id = decode_token(auth_token)["sub"]
+
+    client.put("/hydrate/habit", json=VALID_HYDRATE_HABIT, headers=headers)
+    log_id = client.get("/hydrate/logs/today", headers=headers).json[0]["id"]
+    client.put(f"/hydrate/logs/{log_id}/update", headers=headers)
+    quest_service.refresh_quest_progress(user_id, "hydrate_goal")
+    assert _hydrate_quest(client, headers)["user_progress"]["current_progress"] == 250
+
+    client.put("/hydrate/habit", json=VALID_HYDRATE_HABIT, headers=headers)
+    quest_service.refresh_quest_progress(user_id, "hydrate_goal")
+    assert _hydrate_quest(client, headers)["user_progress"]["current_progress"] == 0
+
+@pytest.mark.quest
+@pytest.mark.order(66)
+def test_get_quests_msgpack(client, auth_token):
+    """Accept: application/msgpack trả về cùng dữ liệu với JSON, mã hóa MessagePack"""
+    msgpack = pytest.importorskip("msgpack")
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    as_json = client.get("/quest", headers=headers)
+    assert as_json.status_code == 200
+    assert as_json.mimetype == "application/json"
+
+    as_msgpack = client.get("/quest", headers={**headers, "Accept": "application/msgpack"})
+    assert as_msgpack.status_code == 200
+    assert as_msgpack.mimetype == "application/msgpack"
+    assert as_msgpack.headers["ETag"] != as_json.headers["ETag"]
+    assert msgpack.unpackb(as_msgpack.data) == as_json.json
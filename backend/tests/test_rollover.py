@@ -0,0 +1,60 @@
+import pytest
+from datetime import timedelta
+from flask_jwt_extended import decode_token
+from src.services import rollover_service
+from src.utils import supabase, local_today
+
+@pytest.mark.rollover
+@pytest.mark.order(90)
+def test_rollover_run_is_resumable_and_idempotent(client, auth_token):
+    """Rollover chạy theo chunk; chạy lại từ đầu không tạo thêm dòng nào, log hôm nay vẫn còn"""
+    first = rollover_service.run(chunk_size=1, parallelism=2, restart=True)
+    assert first["finished_at"] and first["users_done"] >= 1
+    assert first["chunks_done"] == first["users_done"]
+
+    again = rollover_service.run(chunk_size=2, parallelism=2, restart=True)
+    assert again["rows_written"] == 0
+    assert rollover_service.run()["users_done"] == again["users_done"]  # đã xong: không chạy lại
+
+    response = client.get("/hydrate/logs/today", headers={"Authorization": f"Bearer {auth_token}"})
+    assert response.status_code == 200
+    assert len(response.json) == 1
+
+@pytest.mark.rollover
+@pytest.mark.order(91)
+def test_rollover_due_runs_each_time_zone_once(client, auth_token):
+    """--due: mỗi múi giờ có user được rollover 1 lần cho ngày địa phương của nó, không đụng tới log
+    của user ở múi giờ khác"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    log_id = client.get("/hydrate/logs/today", headers=headers).json[0]["id"]
+
+    rollover_service.run_due(chunk_size=1)
+    zones = {row["time_zone"] for row in supabase.rpc("rollover_time_zones", {}).execute().data}
+    finished = {(row["time_zone"], row["day"]) for row in supabase.table("rollover_runs").select("*").execute().data
+                if row["finished_at"]}
+    assert {(zone, local_today(zone).isoformat()) for zone in zones} <= finished
+    assert rollover_service.run_due() == []  # chưa sang ngày mới ở múi giờ nào
+
+    assert client.get("/hydrate/logs/today", headers=headers).json[0]["id"] == log_id
+
+@pytest.mark.rollover
+@pytest.mark.order(92)
+def test_rollover_summarizes_logs_before_purging(client, auth_token):
+    """Log của ngày trước được tổng hợp vào daily_summaries ngay khi bị xóa, kể cả khi checkpoint của múi giờ
+    đã qua ngày đó (user vừa chuyển từ múi giờ khác sang)"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    with client.application.app_context():
+        user_id = decode_token(auth_token)["sub"]
+    time_zone = client.get("/profile", headers=headers).json["time_zone"]
+    today = local_today(time_zone)
+    yesterday = (today - timedelta(days=1)).isoformat()
+    supabase.table("daily_summaries").delete().eq("user_id", user_id).eq("date", yesterday).execute()
+    supabase.table("hydrate_logs").insert({"user_id": user_id, "water_goal": 2000, "cup_size": 250,
+                                           "consumed_water": 1500, "date": yesterday, "completed": False}).execute()
+    supabase.table("rollup_checkpoints").upsert({"name": f"daily_summaries:{time_zone}", "last_date": today.isoformat()},
+                                                on_conflict="name").execute()
+
+    rollover_service.run(today, chunk_size=1, restart=True, time_zone=time_zone)
+    assert supabase.table("hydrate_logs").select("*").eq("user_id", user_id).eq("date", yesterday).execute().data == []
+    summary = supabase.table("daily_summaries").select("*").eq("user_id", user_id).eq("date", yesterday).execute().data
+    assert summary[0]["consumed_water"] == 1500